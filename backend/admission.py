@@ -0,0 +1,189 @@
+from collections import deque
+from fastapi.routing import APIRoute
+from starlette.responses import JSONResponse
+import asyncio
+import logging
+import os
+
+from database import env_flag
+
+logger = logging.getLogger(__name__)
+
+# "false" admits every request straight away
+ADMISSION = env_flag("ADMISSION", "true")
+# Seconds a shed client is told to wait before retrying
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Cost classes, cheapest first: (concurrency limit, queue length, queue deadline in seconds).
+# Each class has its own limit, so list scans never hold the slots point reads and writes
+# need, and exports and bulk uploads, which hold theirs for as long as their body streams,
+# never hold the slots list scans need. Keep bulk + stream well below DB_POOL_SIZE + DB_MAX_OVERFLOW.
+COST_CLASSES = {
+    "point": (32, 128, 0.5),
+    "write": (16, 64, 2.0),
+    "bulk": (2, 8, 1.0),
+    "stream": (2, 4, 5.0),
+}
+
+READ_METHODS = ("GET", "HEAD")
+
+
+def _lane_settings(cost, defaults):
+    limit, queue, deadline = defaults
+    prefix = f"ADMISSION_{cost.upper()}_"
+    return (
+        int(os.getenv(prefix + "LIMIT", str(limit))),
+        int(os.getenv(prefix + "QUEUE", str(queue))),
+        float(os.getenv(prefix + "DEADLINE", str(deadline))),
+    )
+
+
+def cost_class(cost):
+    """Put a route in cost class `cost`, or exempt it from admission control with None.
+
+    Without it, writes are "write", GETs of one resource (a path parameter)
+    are "point" and other GETs (lists, searches) are "bulk". Exports and
+    bulk uploads opt into "stream". Apply it below the route decorator.
+    """
+    if cost is not None and cost not in COST_CLASSES:
+        raise ValueError(f"Unknown cost class {cost!r}")
+
+    def decorate(endpoint):
+        endpoint.cost_class = cost
+        return endpoint
+    return decorate
+
+
+def classify(route, method):
+    """The cost class of `route` for `method`, or None when it is not admission controlled"""
+    if hasattr(route.endpoint, "cost_class"):
+        return route.endpoint.cost_class
+    if method not in READ_METHODS:
+        return "write"
+    return "point" if "{" in route.path else "bulk"
+
+
+class Lane:
+    """Concurrency limit and bounded FIFO queue for one cost class"""
+
+    def __init__(self, cost, limit, queue_size, deadline):
+        self.cost = cost
+        self.limit = limit
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "deadline": 0}
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        """Take a slot; returns the reason when the request is shed instead"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            self.shed["queue_full"] += 1
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=self.deadline)
+        except BaseException:
+            # The client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._drop(waiter)
+            raise
+        if waiter.done():
+            # release() handed its slot over, active already counts it
+            self.admitted += 1
+            return None
+        self._drop(waiter)
+        self.shed["deadline"] += 1
+        return "deadline"
+
+    def _drop(self, waiter):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def status(self):
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "deadline": self.deadline,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+
+class AdmissionController:
+    """One Lane per cost class, shared by every request in this process's event loop"""
+
+    def __init__(self):
+        self.lanes = {cost: Lane(cost, *_lane_settings(cost, defaults)) for cost, defaults in COST_CLASSES.items()}
+
+    def status(self):
+        return {"enabled": ADMISSION, "classes": {cost: lane.status() for cost, lane in self.lanes.items()}}
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionRoute(APIRoute):
+    """APIRoute admitting each request through the route's cost class.
+
+    A request waits in its class's queue while the class is at its limit
+    and gets a 503 with Retry-After as soon as the queue is full or once
+    it has waited the class's deadline, instead of piling up in the
+    threadpool and the connection pool. The slot is held until the
+    response, streamed or not, has been sent. Use it as the route_class
+    of each service's APIRouter.
+    """
+
+    async def handle(self, scope, receive, send):
+        cost = classify(self, scope["method"]) if ADMISSION else None
+        if cost is None:
+            await super().handle(scope, receive, send)
+            return
+        lane = admission_controller.lanes[cost]
+        reason = await lane.acquire()
+        if reason is not None:
+            if lane.shed[reason] == 1:
+                logger.warning(f"Shedding {cost} requests ({reason}): {lane.queued} queued, {lane.active} running")
+            response = JSONResponse(
+                {"detail": "Service overloaded, retry later"}, status_code=503,
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            lane.release()
+
+
+def setup_admission(app):
+    """Serve GET /admission/status; the routes themselves are admitted by AdmissionRoute"""
+
+    @app.get("/admission/status", include_in_schema=False)
+    def admission_status():
+        return admission_controller.status()
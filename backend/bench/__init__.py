@@ -0,0 +1,8 @@
+"""Load-test benchmarks that drive the service apps in-process.
+
+    python -m bench seed --students 5000
+    python -m bench run read-heavy --requests 5000 --output report.json
+    python -m bench compare report.json baseline.json
+
+See bench/scenarios.py for the scenarios and bench/runner.py for the report format.
+"""
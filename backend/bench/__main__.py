@@ -0,0 +1,112 @@
+# bench/__main__.py
+import argparse
+import json
+import os
+import sys
+
+from bench.scenarios import SCENARIOS
+
+
+def _configure(args):
+    # Must happen before anything imports database or cache
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["CACHE_BACKEND"] = args.cache
+    os.environ["DB_ASYNC"] = "true" if args.use_async else "false"
+    os.environ["COMPRESSION"] = args.compression
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _print_comparison(regressions, notes):
+    for note in notes:
+        print(f"note: {note}")
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    print(f"{len(regressions)} regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Service load benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def database_options(command):
+        command.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///bench.db"),
+                             help="defaults to $DATABASE_URL, else sqlite:///bench.db")
+        command.add_argument("--cache", choices=["off", "memory", "redis"], default=os.getenv("CACHE_BACKEND", "off"))
+        command.add_argument("--async", dest="use_async", action="store_true", help="serve with DB_ASYNC=true")
+        command.add_argument("--compression", choices=["on", "off"], default=os.getenv("COMPRESSION", "on"),
+                             help="compress responses the client accepts compressed (gzip, or br with brotli)")
+
+    seed = commands.add_parser("seed", help="replace all data with a generated data set")
+    database_options(seed)
+    seed.add_argument("--students", type=int, default=2000)
+    seed.add_argument("--courses", type=int, default=100)
+    seed.add_argument("--grades-per-student", type=int, default=8)
+    seed.add_argument("--seed", type=int, default=42)
+
+    run = commands.add_parser("run", help="run a scenario and write its report")
+    database_options(run)
+    run.add_argument("scenario", choices=sorted(SCENARIOS))
+    run.add_argument("--requests", type=int, default=2000)
+    run.add_argument("--concurrency", type=int, default=8, help="concurrent clients in total")
+    run.add_argument("--gateway", type=int, default=0, metavar="WORKERS",
+                     help="serve from the combined gateway app in this many processes instead of one per service")
+    run.add_argument("--warmup", type=int, default=100, help="unmeasured requests in total")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--output", help="write the JSON report here")
+    run.add_argument("--baseline", help="compare with this report; exit 1 on regressions")
+    run.add_argument("--tolerance", type=float, default=0.2)
+    run.add_argument("--min-ms", type=float, default=1.0)
+
+    compare = commands.add_parser("compare", help="compare a report with a baseline; exit 1 on regressions")
+    compare.add_argument("report")
+    compare.add_argument("baseline")
+    compare.add_argument("--tolerance", type=float, default=0.2)
+    compare.add_argument("--min-ms", type=float, default=1.0)
+
+    commands.add_parser("list", help="list the scenarios")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, (description, _) in sorted(SCENARIOS.items()):
+            print(f"{name:18s} {description}")
+        return 0
+
+    if args.command == "compare":
+        from bench.runner import compare as compare_reports
+        regressions, notes = compare_reports(_load(args.report), _load(args.baseline), args.tolerance, args.min_ms)
+        _print_comparison(regressions, notes)
+        return 1 if regressions else 0
+
+    _configure(args)
+    if args.command == "seed":
+        import database
+        from bench.seed import seed as seed_data, data_size
+        database.Base.metadata.create_all(bind=database.engine)
+        session = database.SessionLocal()
+        try:
+            seed_data(session, args.students, args.courses, args.grades_per_student, args.seed)
+            print(f"Seeded {data_size(session)}")
+        finally:
+            session.close()
+        return 0
+
+    from bench.runner import run as run_scenario, compare as compare_reports, format_report
+    report = run_scenario(args.scenario, args.requests, args.concurrency, args.warmup, args.seed, args.gateway)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        regressions, notes = compare_reports(report, _load(args.baseline), args.tolerance, args.min_ms)
+        _print_comparison(regressions, notes)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+# bench/runner.py
+"""Run a scenario against the service apps and build the JSON report.
+
+Requests go through httpx.ASGITransport with no HTTP server in between.
+By default each service app runs in its own worker process, like the split
+deployment; with `gateway=N` the combined gateway app (gateway/main.py)
+runs in N worker processes that share the plan round-robin, like uvicorn
+--workers N. Workers warm up, wait for each other at a barrier, then replay
+their part of the plan with their share of `concurrency` concurrent clients.
+
+Report layout:
+
+    {"scenario", "description", "created_at", "config", "data", "environment",
+     "totals": {requests, errors, rps, p50_ms, p95_ms, p99_ms, mean_ms, queries_per_request, query_ms_per_request,
+                bytes_per_response},
+     "operations": {"<service>.<operation>": {same fields}},
+     "processes": {"<worker>": {max_rss_mb, db_connections}}}
+"""
+from contextvars import ContextVar
+import asyncio
+import datetime
+import importlib
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import string
+import time
+import traceback
+
+from bench.scenarios import SCENARIOS
+
+# Keys sampled from the database for operations to pick from
+POOL_LIMIT = 10000
+BARRIER_TIMEOUT = 600
+
+_request_queries = ContextVar("bench_request_queries", default=None)
+
+
+def plan(scenario, requests, seed):
+    """{service: [(seq, mix index, request seed)]}, identical for identical arguments"""
+    _, mix = SCENARIOS[scenario]
+    rng = random.Random(f"{scenario}:{seed}")
+    picks = rng.choices(range(len(mix)), [weight for weight, _, _ in mix], k=requests)
+    per_service = {}
+    for seq, index in enumerate(picks):
+        per_service.setdefault(mix[index][1], []).append((seq, index, rng.getrandbits(32)))
+    return per_service
+
+
+def load_pools(session):
+    from sqlalchemy import text
+
+    def column(sql):
+        return [value for value, in session.execute(text(sql), {"limit": POOL_LIMIT})]
+
+    low, high = session.execute(text("SELECT MIN(id), MAX(id) FROM grades")).one()
+    return {
+        # Seeded students only; rows created by earlier runs start with "B"
+        "students": column("SELECT student_id FROM students WHERE student_id NOT LIKE 'B%' "
+                           "ORDER BY student_id LIMIT :limit"),
+        "last_names": column("SELECT DISTINCT last_name FROM students ORDER BY last_name LIMIT :limit"),
+        "courses": column("SELECT course_code FROM courses ORDER BY course_code LIMIT :limit"),
+        "departments": column("SELECT DISTINCT department FROM courses ORDER BY department LIMIT :limit"),
+        "grade_ids": (low or 1, high or 1),
+    }
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("bench_query_start", []).append(time.perf_counter())
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["bench_query_start"].pop()
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+        counter[1] += time.perf_counter() - started
+
+
+def _prefix(target, service):
+    if target.startswith("gateway"):
+        from gateway.main import SERVICE_PREFIXES
+        return SERVICE_PREFIXES[service]
+    return ""
+
+
+async def _drive(target, scenario, items, concurrency, warmup, barrier, run_tag):
+    import httpx
+    import logging
+    from sqlalchemy import event
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app = importlib.import_module(f"{target.split('#')[0]}.main").app
+    import database
+
+    for engine in (database.engine, database.async_engine and database.async_engine.sync_engine):
+        if engine is not None:
+            event.listen(engine, "before_cursor_execute", _start_query)
+            event.listen(engine, "after_cursor_execute", _count_query)
+    session = database.SessionLocal()
+    try:
+        data = load_pools(session)
+    finally:
+        session.close()
+    data["run_tag"] = run_tag
+    mix = SCENARIOS[scenario][1]
+
+    transport = httpx.ASGITransport(app=app)
+    clients = {
+        service: httpx.AsyncClient(transport=transport, base_url=f"http://bench{_prefix(target, service)}", timeout=None)
+        for service in {service for _, service, _ in mix}
+    }
+    try:
+        async def call(item):
+            seq, index, request_seed = item
+            _, service, operation = mix[index]
+            # [statements, seconds spent in them]
+            counter = [0, 0.0]
+            token = _request_queries.set(counter)
+            start = time.perf_counter()
+            try:
+                response = await operation(clients[service], data, random.Random(request_seed), seq)
+                status = response.status_code
+                # Body bytes as sent, i.e. after compression
+                received = response.num_bytes_downloaded
+            except Exception:
+                status = 599
+                received = 0
+            finally:
+                _request_queries.reset(token)
+            return f"{service}.{operation.__name__}", time.perf_counter() - start, status, counter, received
+
+        for item in items[:warmup]:
+            await call(item)
+        barrier.wait(BARRIER_TIMEOUT)
+
+        samples = {}
+        remaining = iter(items[warmup:])
+
+        async def user():
+            for item in remaining:
+                name, elapsed, status, queries, received = await call(item)
+                entry = samples.setdefault(name, {
+                    "latencies": [], "errors": 0, "queries": 0, "query_seconds": 0.0, "bytes": 0,
+                })
+                entry["latencies"].append(elapsed)
+                entry["errors"] += status >= 400
+                entry["queries"] += queries[0]
+                entry["query_seconds"] += queries[1]
+                entry["bytes"] += received
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+    pool = database.pool_status()
+    # Close pooled connections inside this event loop: a live aiosqlite connection
+    # keeps its worker thread running and the process never exits
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+    database.engine.dispose()
+    return {
+        "elapsed": elapsed,
+        "operations": samples,
+        "process": {
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "db_connections": pool.get("checked_in", 0) + pool.get("checked_out", 0),
+        },
+    }
+
+
+def _worker(target, scenario, items, concurrency, warmup, barrier, run_tag, results):
+    try:
+        results.put((target, asyncio.run(_drive(target, scenario, items, concurrency, warmup, barrier, run_tag)), None))
+    except Exception:
+        barrier.abort()
+        results.put((target, None, traceback.format_exc()))
+
+
+def percentile(sorted_values, q):
+    """Linearly interpolated q-th percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, errors, queries, query_seconds, received, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / count) if count else None,
+        "queries_per_request": round(queries / count, 2) if count else None,
+        "query_ms_per_request": ms(query_seconds / count) if count else None,
+        "bytes_per_response": round(received / count) if count else None,
+    }
+
+
+def run(scenario, requests=2000, concurrency=8, warmup=100, seed=42, gateway=0):
+    """Replay `scenario` and return the report; raises RuntimeError if a worker fails.
+
+    `concurrency` (concurrent clients) and `warmup` (unmeasured requests) are
+    totals, split across workers by their share of the plan, so split and
+    gateway runs measure the same requests.
+    """
+    per_service = plan(scenario, requests, seed)
+    if gateway:
+        items = sorted(item for service_items in per_service.values() for item in service_items)
+        targets = {f"gateway#{i}": items[i::gateway] for i in range(gateway)}
+    else:
+        targets = per_service
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(len(targets))
+    results = context.Queue()
+    run_tag = "".join(random.choices(string.ascii_uppercase + string.digits, k=3))
+    workers = [
+        context.Process(target=_worker, args=(
+            target, scenario, items, max(1, round(concurrency * len(items) / requests)),
+            min(round(warmup * len(items) / requests), len(items) // 2), barrier, run_tag, results,
+        ))
+        for target, items in sorted(targets.items())
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    failures = [f"{target}:\n{error}" for target, _, error in outcomes if error]
+    if failures:
+        raise RuntimeError("Benchmark worker failed\n" + "\n".join(failures))
+
+    merged = {}
+    for _, outcome, _ in outcomes:
+        for name, entry in outcome["operations"].items():
+            into = merged.setdefault(name, {"latencies": [], "errors": 0, "queries": 0, "query_seconds": 0.0, "bytes": 0})
+            into["latencies"].extend(entry["latencies"])
+            into["errors"] += entry["errors"]
+            into["queries"] += entry["queries"]
+            into["query_seconds"] += entry["query_seconds"]
+            into["bytes"] += entry["bytes"]
+    # Workers run side by side, so the run lasts as long as the slowest one
+    elapsed = max(outcome["elapsed"] for _, outcome, _ in outcomes)
+    operations = {
+        name: summarize(entry["latencies"], entry["errors"], entry["queries"], entry["query_seconds"], entry["bytes"],
+                        elapsed)
+        for name, entry in sorted(merged.items())
+    }
+    totals = summarize(
+        [latency for entry in merged.values() for latency in entry["latencies"]],
+        sum(entry["errors"] for entry in merged.values()),
+        sum(entry["queries"] for entry in merged.values()),
+        sum(entry["query_seconds"] for entry in merged.values()),
+        sum(entry["bytes"] for entry in merged.values()),
+        elapsed,
+    )
+
+    import database
+    from bench.seed import data_size
+    session = database.SessionLocal()
+    try:
+        data = data_size(session)
+    finally:
+        session.close()
+
+    return {
+        "scenario": scenario,
+        "description": SCENARIOS[scenario][0],
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "seed": seed,
+            "deployment": f"gateway x{gateway}" if gateway else "split",
+            "database": database.engine.dialect.name,
+            "db_async": database.DB_ASYNC,
+            "cache_backend": os.getenv("CACHE_BACKEND", "redis"),
+            "compression": os.getenv("COMPRESSION", "on"),
+        },
+        "data": data,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "totals": totals,
+        "operations": operations,
+        "processes": {target: outcome["process"] for target, outcome, _ in sorted(outcomes, key=lambda o: o[0])},
+    }
+
+
+# Latency and throughput may move by `tolerance` (relative) before they count as a regression
+LATENCY_FIELDS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(report, baseline, tolerance=0.2, min_ms=1.0):
+    """Return (regressions, notes) comparing `report` with `baseline`.
+
+    Latency must rise by more than `tolerance` and by at least `min_ms` to
+    count, so sub-millisecond noise on fast routes is ignored. Any increase
+    in queries per request is a regression: the plan is deterministic, so
+    the count only moves when the code does. Response size, as sent after
+    compression, may grow by `tolerance`.
+    """
+    notes = []
+    for key in ("scenario",):
+        if report.get(key) != baseline.get(key):
+            notes.append(f"{key} differs: {baseline.get(key)} -> {report.get(key)}")
+    for key in ("config", "data"):
+        for field in sorted(set(report.get(key, {})) | set(baseline.get(key, {}))):
+            old, new = baseline.get(key, {}).get(field), report.get(key, {}).get(field)
+            if old != new:
+                notes.append(f"{key}.{field} differs: {old} -> {new}")
+
+    regressions = []
+
+    def check(name, old, new):
+        for field in LATENCY_FIELDS:
+            before, after = old.get(field), new.get(field)
+            if before is not None and after is not None and after > before * (1 + tolerance) and after - before >= min_ms:
+                regressions.append(f"{name} {field}: {before} -> {after} ms")
+        before, after = old.get("rps"), new.get("rps")
+        if before and after is not None and after < before * (1 - tolerance):
+            regressions.append(f"{name} rps: {before} -> {after}")
+        before, after = old.get("queries_per_request"), new.get("queries_per_request")
+        if before is not None and after is not None and after > before + 0.01:
+            regressions.append(f"{name} queries_per_request: {before} -> {after}")
+        before, after = old.get("bytes_per_response"), new.get("bytes_per_response")
+        if before and after is not None and after > before * (1 + tolerance):
+            regressions.append(f"{name} bytes_per_response: {before} -> {after}")
+        old_rate = old["errors"] / old["requests"] if old.get("requests") else 0
+        new_rate = new["errors"] / new["requests"] if new.get("requests") else 0
+        if new_rate > old_rate + 0.01:
+            regressions.append(f"{name} error rate: {old_rate:.2%} -> {new_rate:.2%}")
+
+    check("totals", baseline["totals"], report["totals"])
+    for name in sorted(set(baseline["operations"]) | set(report["operations"])):
+        if name not in report["operations"]:
+            notes.append(f"{name} missing from report")
+        elif name not in baseline["operations"]:
+            notes.append(f"{name} not in baseline")
+        else:
+            check(name, baseline["operations"][name], report["operations"][name])
+    return regressions, notes
+
+
+def format_report(report):
+    rows = [("operation", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "queries", "query_ms", "bytes")]
+    for name, stats in [*report["operations"].items(), ("TOTAL", report["totals"])]:
+        rows.append((name, stats["requests"], stats["errors"], stats["rps"], stats["p50_ms"],
+                     stats["p95_ms"], stats["p99_ms"], stats["queries_per_request"],
+                     stats.get("query_ms_per_request"), stats.get("bytes_per_response")))
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    lines = [f"{report['scenario']}: {report['description']}"]
+    lines.extend("  ".join(str(v).ljust(w) if i == 0 else str(v).rjust(w) for i, (v, w) in enumerate(zip(row, widths)))
+                 for row in rows)
+    for target, process in report["processes"].items():
+        lines.append(f"{target}: max RSS {process['max_rss_mb']} MB, {process['db_connections']} DB connections")
+    return "\n".join(lines)
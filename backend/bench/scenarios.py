@@ -0,0 +1,159 @@
+# bench/scenarios.py
+"""Named request mixes.
+
+Each operation is `op(client, data, rng, seq)`: it sends one request to its
+service's app and returns the response. `data` holds key pools read from
+the database when the worker starts (see runner.load_pools) and a per-run
+tag; `rng` is seeded per request and `seq` is the request's position in the
+plan, so a scenario issues the same requests on every run and rows it
+creates get unique keys.
+"""
+from datetime import date
+
+STUDENT = "student_service"
+COURSE = "course_service"
+GRADE = "grade_service"
+
+# The term that end-of-term grading writes into
+GRADING_TERM = "Spring 2025"
+BULK_ROWS = 200
+
+
+def _new_id(data, seq):
+    # "B" + 3-char run tag + request number fits VARCHAR(10) and never repeats across runs
+    return f"B{data['run_tag']}{seq:06d}"
+
+
+# Student service
+
+async def list_students(client, data, rng, seq):
+    return await client.get("/", params={"limit": 50, "after": rng.choice(data["students"])})
+
+async def get_student(client, data, rng, seq):
+    return await client.get(f"/{rng.choice(data['students'])}")
+
+async def batch_students(client, data, rng, seq):
+    return await client.post("/batch", json={"ids": rng.sample(data["students"], min(20, len(data["students"])))})
+
+async def search_students(client, data, rng, seq):
+    return await client.get("/search", params={"q": rng.choice(data["last_names"])[:3], "mode": "prefix"})
+
+async def create_student(client, data, rng, seq):
+    student_id = _new_id(data, seq)
+    return await client.post("/", json={
+        "student_id": student_id, "first_name": "Bench", "last_name": f"User{rng.randrange(1000)}",
+        "email": f"{student_id.lower()}@bench.example.edu", "date_of_birth": "2001-01-01",
+        "enrollment_date": "2024-09-01",
+    })
+
+async def update_student(client, data, rng, seq):
+    return await client.put(f"/{rng.choice(data['students'])}",
+                            json={"phone": f"555-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}"})
+
+
+# Course service
+
+async def list_courses(client, data, rng, seq):
+    return await client.get("/", params={"limit": 100})
+
+async def get_course(client, data, rng, seq):
+    return await client.get(f"/{rng.choice(data['courses'])}")
+
+async def course_stats(client, data, rng, seq):
+    return await client.get(f"/{rng.choice(data['courses'])}/stats")
+
+async def department_stats(client, data, rng, seq):
+    return await client.get(f"/departments/{rng.choice(data['departments'])}/stats")
+
+
+# Grade service
+
+async def list_student_grades(client, data, rng, seq):
+    return await client.get("/", params={"student_id": rng.choice(data["students"])})
+
+async def list_course_grades(client, data, rng, seq):
+    return await client.get("/", params={"course_code": rng.choice(data["courses"]), "limit": 500})
+
+async def list_course_grades_compact(client, data, rng, seq):
+    return await client.get("/", params={"course_code": rng.choice(data["courses"]), "limit": 500, "compact": "true"})
+
+async def list_course_grades_sparse(client, data, rng, seq):
+    """The same page as list_course_grades with just what a grade sheet shows"""
+    return await client.get("/", params={
+        "course_code": rng.choice(data["courses"]), "limit": 500,
+        "fields": "grade,semester,student.first_name,student.last_name",
+    })
+
+async def list_course_grades_bare(client, data, rng, seq):
+    """The same page with no embedded objects, so no join"""
+    return await client.get("/", params={
+        "course_code": rng.choice(data["courses"]), "limit": 500, "fields": "student_id,grade,semester",
+    })
+
+async def get_grade(client, data, rng, seq):
+    return await client.get(f"/{rng.randint(*data['grade_ids'])}")
+
+async def transcript(client, data, rng, seq):
+    return await client.get(f"/student/{rng.choice(data['students'])}/transcript")
+
+async def create_grade(client, data, rng, seq):
+    return await client.post("/", json={
+        "student_id": rng.choice(data["students"]), "course_code": rng.choice(data["courses"]),
+        "grade": rng.randint(40, 100), "semester": f"Bench {_new_id(data, seq)}", "date": str(date.today()),
+    })
+
+async def update_grade(client, data, rng, seq):
+    return await client.put(f"/{rng.randint(*data['grade_ids'])}", json={"grade": rng.randint(40, 100)})
+
+async def grade_changes(client, data, rng, seq):
+    """A dashboard following the grade feed: the first call takes the head, later ones read from the cursor"""
+    params = {} if data.get("grade_changes_next") is None else {"since": data["grade_changes_next"]}
+    response = await client.get("/changes", params=params)
+    if response.status_code == 200:
+        data["grade_changes_next"] = response.json()["next"]
+    return response
+
+async def bulk_grade_course(client, data, rng, seq):
+    """Post one course's end-of-term grades; reruns update the same rows"""
+    course = rng.choice(data["courses"])
+    students = rng.sample(data["students"], min(BULK_ROWS, len(data["students"])))
+    return await client.post("/bulk", json=[
+        {"student_id": s, "course_code": course, "grade": rng.randint(40, 100),
+         "semester": GRADING_TERM, "date": "2025-05-30"}
+        for s in students
+    ])
+
+
+# name: (description, [(weight, service, operation)])
+SCENARIOS = {
+    "read-heavy": ("Browsing: lists, lookups and search, about 2% writes", [
+        (10, STUDENT, list_students), (15, STUDENT, get_student), (5, STUDENT, batch_students),
+        (8, STUDENT, search_students), (1, STUDENT, update_student),
+        (8, COURSE, list_courses), (10, COURSE, get_course), (4, COURSE, course_stats),
+        (2, COURSE, department_stats),
+        (15, GRADE, list_student_grades), (12, GRADE, get_grade), (8, GRADE, transcript),
+        (1, GRADE, update_grade),
+    ]),
+    "write-heavy": ("Registration and grading traffic, about 70% writes", [
+        (10, STUDENT, create_student), (15, STUDENT, update_student), (5, STUDENT, get_student),
+        (5, COURSE, get_course),
+        (20, GRADE, create_grade), (25, GRADE, update_grade), (10, GRADE, list_student_grades),
+        (10, GRADE, get_grade),
+    ]),
+    "end-of-term": ("Bulk grade uploads per course while instructors check course statistics", [
+        (10, GRADE, bulk_grade_course), (20, GRADE, update_grade), (10, GRADE, list_student_grades),
+        (25, COURSE, course_stats), (10, COURSE, department_stats), (5, COURSE, get_course),
+    ]),
+    "grade-pages": ("Instructors paging through a course's grades, with and without compact=true", [
+        (50, GRADE, list_course_grades), (50, GRADE, list_course_grades_compact),
+    ]),
+    "grade-fields": ("A course's grade pages in full, with ?fields= for a grade sheet, and with no embedding", [
+        (34, GRADE, list_course_grades), (33, GRADE, list_course_grades_sparse), (33, GRADE, list_course_grades_bare),
+    ]),
+    "dashboard-sync": ("Grading while dashboards keep up by re-reading course grade lists or following the change feed", [
+        (40, GRADE, update_grade), (30, GRADE, list_course_grades), (30, GRADE, grade_changes),
+    ]),
+    "transcript-storm": ("Everyone downloads transcripts right after grades are released", [
+        (85, GRADE, transcript), (10, GRADE, update_grade), (5, STUDENT, get_student),
+    ]),
+}
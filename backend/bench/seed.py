@@ -0,0 +1,96 @@
+# bench/seed.py
+"""Deterministic benchmark data: the same arguments always produce the same rows."""
+from datetime import date, timedelta
+import random
+
+from sqlalchemy import func
+
+from grade_service.models import Grade, Student, Course, StudentTranscript, CourseGradeRollup
+from grade_service.rollups import rebuild_rollups
+
+DEPARTMENTS = ["Computer Science", "Mathematics", "Physics", "Chemistry", "Biology",
+               "Engineering", "Business", "Economics", "Psychology", "History"]
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Edsger", "Barbara", "Donald", "Frances", "John", "Margaret", "Niklaus",
+               "Radia", "Ken", "Shafi", "Tim", "Leslie", "Katherine", "Dennis", "Sophie", "Linus", "Hedy"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Dijkstra", "Liskov", "Knuth", "Allen", "McCarthy", "Hamilton",
+              "Wirth", "Perlman", "Thompson", "Goldwasser", "Berners-Lee", "Lamport", "Johnson", "Ritchie",
+              "Wilson", "Torvalds", "Lamarr"]
+SEMESTERS = [f"{term} {year}" for year in range(2021, 2025) for term in ("Spring", "Fall")]
+WORDS = ["introduction", "advanced", "theory", "systems", "analysis", "methods", "applied", "design",
+         "foundations", "modern", "networks", "algorithms", "statistics", "markets", "structures", "laboratory"]
+
+INSERT_BATCH = 5000
+
+
+def student_rows(rng, count):
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            "student_id": f"S{i:06d}",
+            "first_name": first,
+            "last_name": last,
+            "email": f"{first}.{last}.{i}@example.edu".lower(),
+            "date_of_birth": date(1995, 1, 1) + timedelta(days=rng.randrange(3650)),
+            "address": f"{rng.randrange(1, 999)} College Ave",
+            "phone": f"555-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}",
+            "enrollment_date": date(2020, 9, 1) + timedelta(days=rng.randrange(1460)),
+        }
+
+
+def course_rows(rng, count):
+    for i in range(count):
+        department = DEPARTMENTS[i % len(DEPARTMENTS)]
+        yield {
+            "course_code": f"{department[:3].upper()}{i:04d}",
+            "name": " ".join(rng.sample(WORDS, 3)).capitalize(),
+            "department": department,
+            "credits": rng.randint(3, 6),
+            "description": " ".join(rng.choices(WORDS, k=20)),
+        }
+
+
+def grade_rows(rng, students, courses, per_student):
+    for student_id in students:
+        for course_code in rng.sample(courses, min(per_student, len(courses))):
+            yield {
+                "student_id": student_id,
+                "course_code": course_code,
+                "grade_value": max(0, min(100, round(rng.gauss(74, 12)))),
+                "semester": rng.choice(SEMESTERS),
+                "grade_date": date(2024, 12, 15),
+            }
+
+
+def _insert(session, model, rows):
+    # Grade's attribute names differ from its column names, so go through the mapper
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            session.bulk_insert_mappings(model, batch)
+            batch = []
+    if batch:
+        session.bulk_insert_mappings(model, batch)
+
+
+def seed(session, students=2000, courses=100, grades_per_student=8, seed=42):
+    """Replace all data with a generated data set and rebuild the rollups"""
+    rng = random.Random(seed)
+    for model in (StudentTranscript, CourseGradeRollup, Grade, Student, Course):
+        session.query(model).delete(synchronize_session=False)
+    _insert(session, Course, course_rows(rng, courses))
+    _insert(session, Student, student_rows(rng, students))
+    student_ids = [f"S{i:06d}" for i in range(students)]
+    course_codes = [code for code, in session.query(Course.course_code).order_by(Course.course_code)]
+    _insert(session, Grade, grade_rows(rng, student_ids, course_codes, grades_per_student))
+    rebuild_rollups(session)
+    session.commit()
+
+
+def data_size(session):
+    """Row counts recorded in every report, so results are only compared like for like"""
+    return {
+        "students": session.query(func.count(Student.student_id)).scalar(),
+        "courses": session.query(func.count(Course.course_code)).scalar(),
+        "grades": session.query(func.count(Grade.grade_id)).scalar(),
+    }
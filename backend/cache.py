@@ -0,0 +1,428 @@
+from contextvars import ContextVar
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from serialization import dumps
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # optional: without redis only the in-process fake or no cache is used
+    class WatchError(Exception):
+        pass
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+# "redis" (default), "memory" for an in-process fake, or "off" to disable caching
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis")
+# Keep Redis round trips from ever dominating a request
+CACHE_SOCKET_TIMEOUT = float(os.getenv("CACHE_SOCKET_TIMEOUT", "0.1"))
+# After a Redis error, go straight to the database for this many seconds
+CACHE_RETRY_INTERVAL = float(os.getenv("CACHE_RETRY_INTERVAL", "5"))
+
+DEFAULT_TTL = int(os.getenv("REDIS_TTL", "3600"))
+CACHE_TTLS = {
+    "students": int(os.getenv("CACHE_TTL_STUDENTS", "300")),
+    "courses": int(os.getenv("CACHE_TTL_COURSES", str(DEFAULT_TTL))),
+    "grades": int(os.getenv("CACHE_TTL_GRADES", "60")),
+    "transcripts": int(os.getenv("CACHE_TTL_TRANSCRIPTS", "120")),
+    "stats": int(os.getenv("CACHE_TTL_STATS", "120")),
+}
+
+
+# (table, version token) pairs the current request's response is built from, read before its load
+_response_versions = ContextVar("response_versions", default=None)
+
+
+def note_response_versions(tables, tokens):
+    """Record the version tokens of the tables this request reads (see conditional.check_not_modified).
+
+    ResponseCache.store then skips the write if any of them has been bumped
+    since, and coalesce.coalesced never shares a load across versions.
+    """
+    _response_versions.set(None if tokens is None else tuple(zip(tables, tokens)))
+
+
+def response_versions():
+    return _response_versions.get()
+
+
+class InMemoryRedis:
+    """Minimal in-process stand-in for the subset of redis-py the cache uses"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key) if self._alive(key) else None
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._data.get(key) if self._alive(key) else None for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = value.encode() if isinstance(value, str) else value
+            if ex:
+                self._expires[key] = time.monotonic() + ex
+            else:
+                self._expires.pop(key, None)
+        return True
+
+    def sadd(self, key, *members):
+        with self._lock:
+            current = self._data.get(key) if self._alive(key) else None
+            if not isinstance(current, set):
+                current = set()
+                self._data[key] = current
+            current.update(m.encode() if isinstance(m, str) else m for m in members)
+        return len(members)
+
+    def smembers(self, key):
+        with self._lock:
+            value = self._data.get(key) if self._alive(key) else None
+            return set(value) if isinstance(value, set) else set()
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                key = key.decode() if isinstance(key, bytes) else key
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+                self._expires.pop(key, None)
+        return removed
+
+    def pipeline(self):
+        # Commands apply immediately, so the "pipeline" is just the client itself
+        return self
+
+    def execute(self):
+        return []
+
+    # Callers run inline on the event loop, so a watched read and the writes after it are already atomic
+    def watch(self, *keys):
+        pass
+
+    def multi(self):
+        pass
+
+    def reset(self):
+        pass
+
+    def ping(self):
+        return True
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+
+class ResponseCache:
+    """Read-through cache for JSON responses with tag-based invalidation.
+
+    Each entry is stored under a key derived from the route and query string
+    and registered in one Redis set per tag; invalidating a tag deletes every
+    entry registered under it. Any Redis failure is logged, counted, and
+    treated as a miss so requests fall back to the database.
+
+    Methods that reach the backend are coroutines: redis-py blocks on the
+    socket for up to CACHE_SOCKET_TIMEOUT, so its calls run in the
+    threadpool and never stall the event loop.
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def configure(self, client):
+        """Swap the backing client, e.g. for an InMemoryRedis in tests"""
+        self._client = client
+        self._down_until = 0.0
+        self.reset_stats()
+
+    def _get_client(self):
+        if self._client is not None or CACHE_BACKEND == "off":
+            return self._client
+        if CACHE_BACKEND == "memory":
+            self._client = InMemoryRedis()
+            return self._client
+        try:
+            import redis
+        except ImportError:
+            logger.warning("redis package not installed, response cache disabled")
+            return None
+        self._client = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            socket_timeout=CACHE_SOCKET_TIMEOUT,
+            socket_connect_timeout=CACHE_SOCKET_TIMEOUT,
+        )
+        return self._client
+
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking client call off the event loop; the in-process fake answers inline"""
+        if isinstance(self._client, InMemoryRedis):
+            return fn(*args, **kwargs)
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, action, error):
+        with self._lock:
+            self.errors += 1
+        self._down_until = time.monotonic() + CACHE_RETRY_INTERVAL
+        logger.warning(f"Cache {action} failed, bypassing cache for {CACHE_RETRY_INTERVAL}s: {error}")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def key_for(resource, request: Request):
+        """Build a cache key from the resource name, route path and sorted query string"""
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        return f"cache:{resource}:{request.url.path}?{query}"
+
+    async def lookup(self, key):
+        """Return the cached Response for `key`, or None on a miss"""
+        client = self._get_client()
+        if client is None or not self._available():
+            self._count(hit=False)
+            return None
+        try:
+            raw = await self._run(client.get, key)
+        except Exception as e:
+            self._failed("lookup", e)
+            self._count(hit=False)
+            return None
+        if raw is None:
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        header_line, _, body = raw.partition(b"\n")
+        headers = json.loads(header_line)
+        headers["X-Cache"] = "HIT"
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def store(self, key, body, resource, tags=(), headers=None):
+        """Cache `body` (data, or already-encoded JSON str/bytes) under `key` and register it under `tags`.
+
+        Nothing is written if a table version noted by note_response_versions
+        has changed since: the body may predate that write, and the write's
+        invalidation has already run, so it would be served until its TTL.
+        """
+        client = self._get_client()
+        if client is None or not self._available():
+            return
+        ttl = CACHE_TTLS.get(resource, DEFAULT_TTL)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        elif not isinstance(body, bytes):
+            # Encode exactly like FastAPI's JSONResponse so hits and misses match byte for byte
+            body = dumps(body)
+        payload = json.dumps(headers or {}).encode("utf-8") + b"\n" + body
+
+        versions = _response_versions.get()
+
+        def write():
+            pipe = client.pipeline()
+            try:
+                if versions:
+                    # A bump after the WATCH fails the EXEC below
+                    version_keys = [f"version:{table}" for table, _ in versions]
+                    pipe.watch(*version_keys)
+                    current = [t.decode() if isinstance(t, bytes) else t for t in pipe.mget(version_keys)]
+                    if current != [token for _, token in versions]:
+                        return
+                    pipe.multi()
+                pipe.set(key, payload, ex=ttl)
+                for tag in tags:
+                    tag_key = f"tag:{tag}"
+                    pipe.sadd(tag_key, key)
+                    # Tag sets must outlive the longest entry they point at
+                    pipe.expire(tag_key, max(CACHE_TTLS.values()))
+                pipe.execute()
+            except WatchError:
+                pass
+            finally:
+                pipe.reset()
+
+        try:
+            await self._run(write)
+        except Exception as e:
+            self._failed("store", e)
+
+    async def invalidate(self, *tags):
+        """Drop every cached entry registered under any of `tags`"""
+        client = self._get_client()
+        if client is None or not tags or not self._available():
+            # Entries we cannot delete while Redis is down expire on their own TTL
+            return
+
+        def delete():
+            keys = []
+            for tag in tags:
+                tag_key = f"tag:{tag}"
+                keys.extend(client.smembers(tag_key))
+                keys.append(tag_key)
+            client.delete(*keys)
+
+        try:
+            await self._run(delete)
+        except Exception as e:
+            self._failed("invalidation", e)
+
+    async def versions(self, *tables):
+        """Current version token of each table, or None if the cache backend is unavailable.
+
+        Tokens are random rather than counters, so a Redis restart can never
+        hand out a token that an old ETag still carries. Each starts with the
+        wall-clock time of the write that set it; see `written_at`.
+        """
+        client = self._get_client()
+        if client is None or not self._available():
+            return None
+        keys = [f"version:{table}" for table in tables]
+
+        def read():
+            tokens = client.mget(keys)
+            if None in tokens:
+                for key, token in zip(keys, tokens):
+                    if token is None:
+                        # Write time unknown: 0 reads as "long ago"
+                        client.set(key, f"0:{uuid.uuid4().hex}", ex=max(CACHE_TTLS.values()), nx=True)
+                tokens = client.mget(keys)
+            return tokens
+
+        try:
+            tokens = await self._run(read)
+        except Exception as e:
+            self._failed("version lookup", e)
+            return None
+        if None in tokens:
+            return None
+        return [t.decode() if isinstance(t, bytes) else t for t in tokens]
+
+    async def bump(self, *tables):
+        """Give each table a new version token after a committed write"""
+        client = self._get_client()
+        if client is None or not tables or not self._available():
+            # Tokens we cannot replace while Redis is down expire on their own TTL
+            return
+
+        def write():
+            pipe = client.pipeline()
+            for table in tables:
+                token = f"{time.time():.3f}:{uuid.uuid4().hex}"
+                pipe.set(f"version:{table}", token, ex=max(CACHE_TTLS.values()))
+            pipe.execute()
+
+        try:
+            await self._run(write)
+        except Exception as e:
+            self._failed("version bump", e)
+
+    async def claim(self, key, value, ttl):
+        """Set `key` only if it is absent: True if set, False if taken, None if the cache is unavailable"""
+        client = self._get_client()
+        if client is None or not self._available():
+            return None
+        try:
+            return bool(await self._run(client.set, key, value, ex=ttl, nx=True))
+        except Exception as e:
+            self._failed("claim", e)
+            return None
+
+    async def read(self, key):
+        """Raw value under `key` (not a cached response), or None when absent or unavailable"""
+        client = self._get_client()
+        if client is None or not self._available():
+            return None
+        try:
+            return await self._run(client.get, key)
+        except Exception as e:
+            self._failed("read", e)
+            return None
+
+    async def write(self, key, value, ttl):
+        client = self._get_client()
+        if client is None or not self._available():
+            return
+        try:
+            await self._run(client.set, key, value, ex=ttl)
+        except Exception as e:
+            self._failed("write", e)
+
+    async def forget(self, key):
+        client = self._get_client()
+        if client is None or not self._available():
+            return
+        try:
+            await self._run(client.delete, key)
+        except Exception as e:
+            self._failed("delete", e)
+
+    @staticmethod
+    def written_at(tokens):
+        """Wall-clock time of the newest write among version `tokens`, 0.0 if unknown"""
+        latest = 0.0
+        for token in tokens or ():
+            try:
+                latest = max(latest, float(token.partition(":")[0]))
+            except ValueError:
+                # Plain random tokens from before write times were recorded
+                pass
+        return latest
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.errors = 0
+
+
+cache = ResponseCache()
@@ -0,0 +1,175 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+import logging
+import math
+import os
+import select
+import threading
+import time
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# "false" sends every course read to the database
+CATALOG_CACHE = database.env_flag("CATALOG_CACHE", "true")
+# The listener needs a session-level connection: point it past PgBouncer's transaction pooling
+CATALOG_LISTEN_URL = os.getenv("CATALOG_LISTEN_URL", database.DATABASE_URL)
+# Full reload this often, in case a change was missed; without a listener, the longest a copy is trusted
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "300"))
+CATALOG_RECONNECT_DELAY = float(os.getenv("CATALOG_RECONNECT_DELAY", "1"))
+COURSE_CHANNEL = "course_changes"
+
+# Course schema field order
+COURSE_FIELDS = ("course_code", "name", "department", "credits", "description")
+COURSES_SQL = "SELECT course_code, name, department, credits, description FROM courses"
+
+
+def notify_course_changed(session, course_code):
+    """Tell every pod's catalog to reload `course_code` once the caller's transaction commits"""
+    if session.bind.dialect.name == "postgresql":
+        session.execute(text("SELECT pg_notify(:channel, :course_code)"),
+                        {"channel": COURSE_CHANNEL, "course_code": course_code})
+
+
+class CourseCatalog:
+    """Every course, held in memory so catalog reads and course enrichment skip the database.
+
+    On PostgreSQL a background thread LISTENs for the NOTIFY that course
+    writes send on commit and reloads just the courses named, so other pods
+    see a change within milliseconds. While that thread is not connected the
+    copy is not used. Elsewhere (SQLite) the copy is loaded by the first read
+    and trusted for CATALOG_REFRESH_INTERVAL, with this process's own writes
+    applied straight away.
+
+    Each change installs new immutable snapshots, so readers never lock.
+    """
+
+    def __init__(self):
+        # ({course_code: row}, rows ordered by course_code), rows in COURSE_FIELDS order
+        self._state = None
+        self._trusted_until = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.version = 0
+        self.notifications = 0
+        self.reloads = 0
+
+    def snapshot(self):
+        """(by_code, ordered) for every course, or None when reads must go to the database"""
+        state = self._state
+        if state is None or time.monotonic() >= self._trusted_until:
+            return None
+        return state
+
+    def _install(self, by_code, trusted_until=None):
+        """Swap in a new snapshot; callers hold self._lock"""
+        self._state = (by_code, tuple(by_code[code] for code in sorted(by_code)))
+        self.version += 1
+        if trusted_until is not None:
+            self._trusted_until = trusted_until
+
+    def _replace(self, rows, course_codes):
+        """Install the current `rows` for `course_codes`; a code without a row was deleted"""
+        with self._lock:
+            if self._state is None:
+                return
+            by_code = dict(self._state[0])
+            for course_code in course_codes:
+                by_code.pop(course_code, None)
+            by_code.update((row[0], tuple(row)) for row in rows)
+            self._install(by_code)
+
+    def load(self, session):
+        """Load every course through `session` and return the snapshot; None while a listener owns the copy"""
+        if not CATALOG_CACHE or self._thread is not None:
+            return None
+        version = self.version
+        rows = session.execute(text(COURSES_SQL)).all()
+        with self._lock:
+            if self.version != version:
+                # A write was applied meanwhile and these rows may predate it; the next read loads again
+                return None
+            self.reloads += 1
+            self._install({row[0]: tuple(row) for row in rows}, time.monotonic() + CATALOG_REFRESH_INTERVAL)
+            return self._state
+
+    def put(self, course):
+        """Apply this process's own committed create or update, given as a course dict"""
+        self._replace([tuple(course[field] for field in COURSE_FIELDS)], [course["course_code"]])
+
+    def discard(self, course_code):
+        """Apply this process's own committed delete"""
+        self._replace([], [course_code])
+
+    def start(self):
+        """Start the LISTEN thread on PostgreSQL; a no-op elsewhere or when already running"""
+        if not CATALOG_CACHE or self._thread is not None or not CATALOG_LISTEN_URL.startswith("postgresql"):
+            return
+        self._thread = threading.Thread(target=self._listen_forever, name="course-catalog", daemon=True)
+        self._thread.start()
+
+    def _listen_forever(self):
+        # Keepalives notice a silently dropped connection within about 30 s
+        engine = create_engine(CATALOG_LISTEN_URL, poolclass=NullPool, connect_args={
+            "keepalives": 1, "keepalives_idle": 10, "keepalives_interval": 5, "keepalives_count": 3,
+        })
+        while True:
+            try:
+                self._listen(engine)
+            except Exception as e:
+                logger.warning(f"Course catalog listener disconnected, reading courses from the database: {e}")
+            with self._lock:
+                self._trusted_until = 0.0
+            time.sleep(CATALOG_RECONNECT_DELAY)
+
+    def _listen(self, engine):
+        connection = engine.raw_connection()
+        try:
+            listener = connection.connection
+            listener.autocommit = True
+            cursor = listener.cursor()
+            cursor.execute(f"LISTEN {COURSE_CHANNEL}")
+            while True:
+                # Changes committed from LISTEN on arrive as notifications, so nothing falls in between
+                cursor.execute(COURSES_SQL)
+                rows = cursor.fetchall()
+                with self._lock:
+                    self.reloads += 1
+                    self._install({row[0]: tuple(row) for row in rows}, math.inf)
+                reload_at = time.monotonic() + CATALOG_REFRESH_INTERVAL
+                while time.monotonic() < reload_at:
+                    if select.select([listener], [], [], reload_at - time.monotonic()) == ([], [], []):
+                        continue
+                    listener.poll()
+                    # One query for a burst of changes, duplicates included
+                    course_codes = {notification.payload for notification in listener.notifies}
+                    self.notifications += len(listener.notifies)
+                    listener.notifies.clear()
+                    if course_codes:
+                        cursor.execute(COURSES_SQL + " WHERE course_code = ANY(%s)", (list(course_codes),))
+                        self._replace(cursor.fetchall(), course_codes)
+        finally:
+            connection.close()
+
+    def status(self):
+        return {
+            "enabled": CATALOG_CACHE,
+            "listening": self._thread is not None and self._trusted_until == math.inf,
+            "courses": len(self._state[0]) if self._state else None,
+            "version": self.version,
+            "notifications": self.notifications,
+            "reloads": self.reloads,
+        }
+
+
+course_catalog = CourseCatalog()
+
+
+def setup_catalog(app):
+    """Start the course catalog listener when `app` starts and serve GET /catalog/status"""
+    app.router.add_event_handler("startup", course_catalog.start)
+
+    @app.get("/catalog/status", include_in_schema=False)
+    def catalog_status():
+        return course_catalog.status()
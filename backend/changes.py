@@ -0,0 +1,386 @@
+"""Change feed: every create, update and delete, served in commit order from GET /changes.
+
+Write paths call append_change before they commit, so an event exists if
+and only if its change does (a transactional outbox). Events are numbered
+when they are read rather than when they are written: the first reader to
+see committed events without a `seq` gives them the next numbers, in insert
+order, under a lock. A transaction that commits late therefore gets a
+higher number instead of one below a cursor a consumer has already passed,
+and consumers can follow the feed by `seq` alone without missing events.
+
+Consumers sync in O(changes): take `next` from GET /changes (no `since`)
+as the starting cursor, read the resource's list endpoints once, then
+apply GET /changes?since=<cursor> pages, long-polls (`wait`) or the
+text/event-stream variant, saving each page's `next`. Events older than
+CHANGES_COMPACT_AFTER are compacted to the latest one per key and events
+older than CHANGES_RETENTION are removed; a cursor from before the removed
+range gets a 410 and starts over.
+"""
+from datetime import datetime, timedelta
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import Session
+import asyncio
+import json
+import logging
+import os
+import time
+
+from database import run_on_primary
+from metrics import background_queries
+from models import ChangeEvent, ChangeFeed
+from serialization import dumps, json_response
+
+logger = logging.getLogger(__name__)
+
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "500"))
+CHANGES_MAX_PAGE_SIZE = int(os.getenv("CHANGES_MAX_PAGE_SIZE", "5000"))
+# Longest ?wait= a long-poll may ask for, in seconds; keep it below the ingress read timeout
+CHANGES_MAX_WAIT = float(os.getenv("CHANGES_MAX_WAIT", "30"))
+# How often a waiting long-poll or event stream looks for events committed by other pods
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "1"))
+# An idle event stream sends a comment this often so proxies do not close it
+CHANGES_SSE_KEEPALIVE = float(os.getenv("CHANGES_SSE_KEEPALIVE", "15"))
+# Events numbered per statement by a reader
+CHANGES_SEQUENCE_BATCH = int(os.getenv("CHANGES_SEQUENCE_BATCH", "10000"))
+# Seconds after which only the latest event per resource and key is kept
+CHANGES_COMPACT_AFTER = float(os.getenv("CHANGES_COMPACT_AFTER", "3600"))
+# Seconds an event is kept at all; consumers offline for longer resync from the list endpoints
+CHANGES_RETENTION = float(os.getenv("CHANGES_RETENTION", str(7 * 24 * 3600)))
+CHANGES_PRUNE_INTERVAL = float(os.getenv("CHANGES_PRUNE_INTERVAL", "300"))
+
+OPS = ("create", "update", "delete")
+
+# pg_advisory_xact_lock keys: one numbering reader at a time, one pod pruning at a time
+SEQUENCE_LOCK = 7301
+PRUNE_LOCK = 7302
+
+# Session.info flag: the transaction appended events, wake local waiters once it commits
+_APPENDED = "changes_appended"
+
+# Remaining events are always above the horizon, so the highest seq given out is MAX(seq) if any are left
+SEQUENCE_SQL = text("""
+    UPDATE change_events SET seq = numbered.n + COALESCE(
+        (SELECT MAX(seq) FROM change_events), (SELECT MAX(horizon) FROM change_feed), 0
+    )
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY id) AS n
+        FROM change_events WHERE seq IS NULL
+        ORDER BY id LIMIT :batch
+    ) AS numbered
+    WHERE change_events.id = numbered.id AND change_events.seq IS NULL
+    RETURNING change_events.seq
+""")
+
+# Sequenced events with a newer event for the same resource and key
+COMPACT_SQL = text("""
+    DELETE FROM change_events
+    WHERE seq IS NOT NULL AND created_at < :cutoff AND EXISTS (
+        SELECT 1 FROM change_events newer
+        WHERE newer.resource = change_events.resource AND newer.key = change_events.key
+          AND newer.seq > change_events.seq
+    )
+""")
+
+events = ChangeEvent.__table__
+
+# The highest seq given out and whether a committed event still has none, in one round trip
+POSITION = select(
+    select(func.max(events.c.seq)).scalar_subquery(),
+    select(events.c.id).where(events.c.seq.is_(None)).limit(1).scalar_subquery(),
+)
+
+
+def append_change(session, resource, key, op, data=None):
+    """Record one change to `resource` in the caller's transaction; call before it commits"""
+    append_changes(session, resource, [(key, op, data)])
+
+
+def append_changes(session, resource, changes):
+    """Record (key, op, data) changes in one statement; `data` is the document after the change"""
+    if not changes:
+        return
+    now = datetime.utcnow()
+    rows = []
+    for key, op, data in changes:
+        if op not in OPS:
+            raise ValueError(f"Unknown change op {op!r}")
+        rows.append({
+            "resource": resource, "key": str(key), "op": op,
+            "data": None if data is None else dumps(data).decode(), "created_at": now,
+        })
+    session.execute(events.insert(), rows)
+    session.info[_APPENDED] = True
+
+
+class ChangeNotifier:
+    """Wakes this process's long-polls and event streams when one of its transactions commits events.
+
+    Events committed by other pods are picked up by the CHANGES_POLL_INTERVAL re-check.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._waiters = set()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def wait(self, timeout):
+        """Return after `timeout` seconds or as soon as notify() is called"""
+        self._loop = asyncio.get_running_loop()
+        waiter = self._loop.create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        finally:
+            self._waiters.discard(waiter)
+
+    def notify(self):
+        """Wake every waiter; safe to call from the threadpool"""
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # The loop has closed, nothing is waiting on it
+            pass
+
+    def _wake(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+change_notifier = ChangeNotifier()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_waiters(session):
+    if session.info.pop(_APPENDED, False):
+        change_notifier.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_appended(session):
+    session.info.pop(_APPENDED, None)
+
+
+def _horizon(session):
+    return session.execute(select(func.max(ChangeFeed.horizon))).scalar() or 0
+
+
+def sequence_pending(session):
+    """Number the committed events that have no seq yet, in insert order; returns the highest seq given out.
+
+    On PostgreSQL readers take turns under an advisory lock; SQLite runs one
+    writing transaction at a time anyway. Up to CHANGES_SEQUENCE_BATCH
+    events are numbered per call.
+    """
+    last_seq, pending = session.execute(POSITION).one()
+    if pending is None:
+        session.rollback()
+        return last_seq or 0
+    if session.bind.dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:lock)"), {"lock": SEQUENCE_LOCK})
+    numbered = session.execute(SEQUENCE_SQL, {"batch": CHANGES_SEQUENCE_BATCH}).scalars().all()
+    session.commit()
+    return max(numbered, default=last_seq or 0)
+
+
+class FeedGone(Exception):
+    """The cursor points into events retention has removed, or was never given out"""
+
+    def __init__(self, detail, horizon):
+        super().__init__(detail)
+        self.detail = detail
+        self.horizon = horizon
+
+
+def read_page(session, resources, since, limit):
+    """(events, next, more): events of `resources` after `since` in seq order, at most `limit` of them.
+
+    `next` is the cursor for the following call: the last event's seq when
+    the page is full, otherwise the feed's head, so a consumer of one
+    resource skips past the others' events. `since=None` returns no events
+    and the head, the starting point for a new consumer.
+    """
+    # Before the page: events numbered after this are above it and come in a later page
+    last_seq = sequence_pending(session)
+    if since is None:
+        head = max(last_seq, _horizon(session))
+        session.rollback()
+        return [], head, False
+    rows = session.execute(
+        select(events.c.seq, events.c.resource, events.c.key, events.c.op, events.c.data, events.c.created_at)
+        .where(events.c.seq > since, events.c.seq <= last_seq, events.c.resource.in_(resources))
+        .order_by(events.c.seq)
+        .limit(limit + 1)
+    ).all()
+    # Read after the page: retention that removed events the page should have held has raised it
+    horizon = _horizon(session)
+    session.rollback()
+    head = max(last_seq, horizon)
+    if since < horizon:
+        raise FeedGone(f"Events up to {horizon} have been removed; resync and continue from the new head", horizon)
+    if since > head:
+        raise FeedGone(f"Cursor {since} is ahead of the feed's head {head}; resync and continue from the new head", horizon)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return [
+        {
+            "seq": seq, "resource": resource, "key": key, "op": op,
+            "data": None if data is None else json.loads(data), "at": created_at,
+        }
+        for seq, resource, key, op, data, created_at in rows
+    ], rows[-1].seq if more else head, more
+
+
+async def wait_for_page(resources, since, limit, wait):
+    """read_page, waiting up to `wait` seconds for an event when there is none yet.
+
+    No connection is held while waiting: each check runs on a short-lived session.
+    """
+    deadline = time.monotonic() + wait
+    page = await run_on_primary(read_page, resources, since, limit)
+    while not page[0] and since is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # Nothing for this resource yet, but there may be newer events of others to skip
+        since = page[1]
+        await change_notifier.wait(min(remaining, CHANGES_POLL_INTERVAL))
+        with background_queries():
+            page = await run_on_primary(read_page, resources, since, limit)
+    return page
+
+
+def _sse(event_name, data, event_id=None):
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event_name}", "data: " + dumps(data).decode()]
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def _event_stream(resources, cursor, limit):
+    yield f"retry: {int(CHANGES_POLL_INTERVAL * 1000)}\n\n".encode()
+    sent_at = time.monotonic()
+    while True:
+        try:
+            with background_queries():
+                changes, cursor, more = await run_on_primary(read_page, resources, cursor, limit)
+        except FeedGone as e:
+            yield _sse("reset", {"detail": e.detail, "horizon": e.horizon})
+            return
+        for change in changes:
+            yield _sse(change["op"], change, change["seq"])
+        if changes:
+            sent_at = time.monotonic()
+        if more:
+            continue
+        if time.monotonic() - sent_at >= CHANGES_SSE_KEEPALIVE:
+            yield b": keepalive\n\n"
+            sent_at = time.monotonic()
+        await change_notifier.wait(CHANGES_POLL_INTERVAL)
+
+
+def _wants_event_stream(request):
+    return "text/event-stream" in request.headers.get("accept", "").lower()
+
+
+async def changes_response(request, resources, since, limit, wait):
+    """Serve GET /changes for `resources` as a JSON page, a long-poll or Server-Sent Events.
+
+    With Accept: text/event-stream the response streams each event as it is
+    numbered, its seq as the SSE id, resuming from Last-Event-ID on reconnect.
+    """
+    if _wants_event_stream(request):
+        last_event_id = request.headers.get("last-event-id", "")
+        cursor = int(last_event_id) if last_event_id.isdigit() else since
+        try:
+            # Checked up front so a stale cursor gets a 410 rather than an empty stream
+            _, head, _ = await run_on_primary(read_page, resources, cursor, 1)
+        except FeedGone as e:
+            return json_response({"detail": e.detail, "horizon": e.horizon}, status_code=410)
+        return StreamingResponse(
+            _event_stream(resources, head if cursor is None else cursor, limit),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+        )
+    try:
+        changes, next_cursor, more = await wait_for_page(resources, since, limit, wait)
+    except FeedGone as e:
+        return json_response({"detail": e.detail, "horizon": e.horizon}, status_code=410)
+    return json_response(
+        {"events": changes, "next": next_cursor, "more": more}, headers={"Cache-Control": "no-store"},
+    )
+
+
+def prune(session, now):
+    """Compact and expire old events on one pod at a time; returns (compacted, expired), or None if skipped"""
+    sequence_pending(session)
+    if session.bind.dialect.name == "postgresql":
+        if not session.execute(text("SELECT pg_try_advisory_xact_lock(:lock)"), {"lock": PRUNE_LOCK}).scalar():
+            session.rollback()
+            return None
+    compacted = session.execute(COMPACT_SQL, {"cutoff": now - timedelta(seconds=CHANGES_COMPACT_AFTER)}).rowcount
+    expired = 0
+    horizon = session.execute(
+        select(func.max(events.c.seq)).where(events.c.created_at < now - timedelta(seconds=CHANGES_RETENTION))
+    ).scalar()
+    if horizon is not None:
+        expired = session.execute(events.delete().where(events.c.seq <= horizon)).rowcount
+        feed = session.query(ChangeFeed).filter(ChangeFeed.id == 1).with_for_update().first()
+        if feed is None:
+            session.add(ChangeFeed(id=1, horizon=horizon))
+        elif feed.horizon < horizon:
+            feed.horizon = horizon
+    session.commit()
+    return compacted, expired
+
+
+_prune_state = {"last_run": None, "compacted": 0, "expired": 0, "error": None}
+
+
+async def _prune_forever():
+    while True:
+        await asyncio.sleep(CHANGES_PRUNE_INTERVAL)
+        try:
+            result = await run_on_primary(prune, datetime.utcnow())
+        except Exception as e:
+            _prune_state["error"] = f"{type(e).__name__}: {e}"
+            logger.warning(f"Change feed pruning failed: {e}")
+            continue
+        _prune_state["last_run"] = datetime.utcnow().isoformat()
+        _prune_state["error"] = None
+        if result is not None:
+            _prune_state["compacted"] += result[0]
+            _prune_state["expired"] += result[1]
+
+
+def _feed_status(session):
+    last_seq, horizon, pending = session.execute(select(
+        select(func.max(events.c.seq)).scalar_subquery(),
+        select(func.max(ChangeFeed.horizon)).scalar_subquery(),
+        select(func.count()).select_from(events).where(events.c.seq.is_(None)).scalar_subquery(),
+    )).one()
+    session.rollback()
+    return {"head": max(last_seq or 0, horizon or 0), "horizon": horizon or 0, "pending": pending}
+
+
+def setup_changes(app):
+    """Prune the change feed every CHANGES_PRUNE_INTERVAL and serve GET /changes/status.
+
+    Each service's router serves its own resources' GET /changes.
+    """
+    tasks = []
+
+    async def start_pruning():
+        tasks.append(asyncio.get_running_loop().create_task(_prune_forever()))
+
+    app.router.add_event_handler("startup", start_pruning)
+
+    @app.get("/changes/status", include_in_schema=False)
+    async def changes_status():
+        status = await run_on_primary(_feed_status)
+        return {**status, "waiting": change_notifier.waiting, "prune": dict(_prune_state)}
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import os
+
+from cache import response_versions
+from database import env_flag
+from metrics import count_coalesced
+
+logger = logging.getLogger(__name__)
+
+# "false" runs every request's load on its own
+COALESCE = env_flag("COALESCE", "true")
+# Resources (response cache names) whose identical concurrent reads share one load
+COALESCE_RESOURCES = {
+    name.strip() for name in os.getenv("COALESCE_RESOURCES", "students,courses,grades,transcripts,stats").split(",")
+}
+# Seconds a follower waits for the shared load before running its own
+COALESCE_WAIT_TIMEOUT = float(os.getenv("COALESCE_WAIT_TIMEOUT", "5"))
+
+# Flight key -> Task running the shared load, in this process's event loop
+_flights = {}
+
+
+def _landed(key, task):
+    if _flights.get(key) is task:
+        del _flights[key]
+    if not task.cancelled():
+        # Marks the exception retrieved when every waiter has gone away
+        task.exception()
+
+
+async def _fly(db, build):
+    own_db = db.fork()
+    try:
+        return await build(own_db)
+    finally:
+        await own_db.close()
+
+
+async def coalesced(resource, key, db, build):
+    """Return `await build(db)`, sharing one call among concurrent requests with the same `key`.
+
+    `key` must identify the response, e.g. cache.key_for(...); requests that
+    must read the primary (read-your-writes) never share with ones that may
+    read a replica, and requests that saw different table versions (see
+    conditional.check_not_modified) never share, so a read sent after a
+    write never joins a load that started before it. `build` loads, serializes and caches the response and
+    returns what the route needs to send it, so only the first request
+    (the leader) does that work; the rest (followers) wait for its result or
+    exception. The shared call runs as its own task on a session of its own,
+    so it completes even if the leader's client disconnects.
+
+    Routes are `async def` and reach the database through `db.run`, so this
+    works the same with the threadpool and the asyncio database stack.
+    """
+    if not COALESCE or resource not in COALESCE_RESOURCES:
+        return await build(db)
+    key = (key, getattr(db, "prefer_primary", True), response_versions())
+    task = _flights.get(key)
+    if task is None:
+        task = asyncio.get_running_loop().create_task(_fly(db, build))
+        _flights[key] = task
+        task.add_done_callback(lambda done: _landed(key, done))
+        count_coalesced(resource, "leader")
+        return await asyncio.shield(task)
+    outcome = "follower"
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), COALESCE_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        logger.warning(f"Shared {resource} load still running after {COALESCE_WAIT_TIMEOUT}s, loading again")
+    finally:
+        count_coalesced(resource, outcome)
+    return await build(db)
@@ -0,0 +1,156 @@
+import logging
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: without it clients get gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent as they are; compressing them saves less than it costs
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# 1-9; on an 84 KB grade page level 1 takes 0.17 ms for 3.2 KB, level 6 0.7 ms for 3.0 KB
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "1"))
+# 0-11; 4 compresses JSON better than gzip at little more CPU
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# "off" disables compression, e.g. when the ingress compresses instead
+COMPRESSION = os.getenv("COMPRESSION", "on")
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Events must reach the client as soon as they are sent, not when a compressor block fills
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding):
+    """"br" or "gzip" per the client's Accept-Encoding header, or None to send the body as is"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name.strip()] = quality
+    fallback = weights.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(offered, key=lambda name: weights.get(name, fallback))
+    return best if weights.get(best, fallback) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits=31: gzip container rather than raw zlib
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        """Compressed `data`, flushed so the client can decode everything sent so far"""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON, NDJSON and CSV response bodies with brotli or gzip.
+
+    Complete bodies under `minimum_size` are left alone. Streamed bodies
+    (exports) are compressed chunk by chunk and flushed after each one, so a
+    client sees rows as soon as they would have arrived uncompressed.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not self._compressible(start, body, more_body):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(k, v) for k, v in start["headers"] if k not in (b"content-length", b"vary")]
+                vary = [v for k, v in start["headers"] if k == b"vary"]
+                headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send(dict(start, headers=headers))
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(dict(start, headers=headers))
+            body = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, start, body, more_body):
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        content_type = b""
+        for name, value in start["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        content_type = content_type.decode("latin-1").lower()
+        if content_type.startswith(UNCOMPRESSED_TYPES) or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+
+def setup_compression(app):
+    """Compress `app`'s responses; add it last so it also covers what other middleware sends"""
+    if COMPRESSION == "off":
+        return
+    if brotli is None:
+        logger.info("brotli package not installed, compressing responses with gzip only")
+    app.add_middleware(CompressionMiddleware)
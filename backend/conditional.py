@@ -0,0 +1,71 @@
+from fastapi import Request, Response
+import hashlib
+import os
+
+from cache import cache, note_response_versions
+from database import note_tables_written_at
+
+# Seconds clients and proxies may reuse a response without revalidating; 0 means always revalidate
+HTTP_MAX_AGE = {
+    "students": int(os.getenv("HTTP_MAX_AGE_STUDENTS", "0")),
+    "courses": int(os.getenv("HTTP_MAX_AGE_COURSES", "60")),
+    "grades": int(os.getenv("HTTP_MAX_AGE_GRADES", "0")),
+    "transcripts": int(os.getenv("HTTP_MAX_AGE_TRANSCRIPTS", "0")),
+    "stats": int(os.getenv("HTTP_MAX_AGE_STATS", "60")),
+}
+
+
+def cache_control(resource):
+    max_age = HTTP_MAX_AGE.get(resource, 0)
+    return f"public, max-age={max_age}" if max_age else "no-cache"
+
+
+def etag_for(tokens):
+    """Weak ETag for a response built from tables with version `tokens`, or None when unavailable.
+
+    Derived only from the tables' version tokens, which every committed write
+    replaces, so it can be checked without touching the database. Read it
+    before loading the data: a write landing in between then yields a stale
+    tag, which only costs the client one extra full response.
+    """
+    if tokens is None:
+        return None
+    digest = hashlib.blake2b(".".join(tokens).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against `etag`"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def validators(resource, etag):
+    """ETag and Cache-Control headers for a 200 or 304 response"""
+    headers = {"Cache-Control": cache_control(resource)}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+async def check_not_modified(request: Request, resource, *tables):
+    """Return (etag, 304 response or None) for a GET built from `tables`; call it before the load"""
+    tokens = await cache.versions(*tables)
+    # Keeps a load that started before a write from being cached or shared after it
+    note_response_versions(tables, tokens)
+    # Lets a read session keep tables that just changed off lagging replicas
+    note_tables_written_at(cache.written_at(tokens))
+    etag = etag_for(tokens)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return etag, Response(status_code=304, headers=validators(resource, etag))
+    return etag, None
@@ -1,62 +1,352 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Depends
-from typing import List
-from sqlalchemy.orm import Session
-from course_service.schemas import Course as CourseSchema, CourseCreate, CourseUpdate
+from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Query, Request
+from typing import List, Literal, Optional
+from sqlalchemy import select, text
+from course_service.schemas import (
+    Course as CourseSchema, CourseCreate, CourseUpdate, CourseBatchRequest, CourseBatch,
+    CourseStats, DepartmentStats,
+)
 from course_service.models import Course
-from database import get_db
+from course_service.stats import load_course_stats, load_department_stats
+from course_service import search
+from database import (
+    DBSession, ReadDBSession, ReadYourWritesMiddleware, get_db_session, get_read_db_session, pool_status,
+)
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE,
+    MAX_BATCH_SIZE, keyset_paginate, count_rows, page_headers, fetch_batch, parse_offset_cursor, next_offset_cursor,
+)
+from cache import cache
+from serialization import dumps, json_response
+from conditional import check_not_modified, validators
+from coalesce import coalesced
+from admission import AdmissionRoute, cost_class, setup_admission
+from metrics import setup_metrics
+from health import setup_health
+from compression import setup_compression
+from catalog import course_catalog, notify_course_changed, setup_catalog
+from changes import (
+    CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE, CHANGES_MAX_WAIT, append_change, changes_response, setup_changes,
+)
 
 app = FastAPI()
-router = APIRouter(tags=["courses"])
+setup_metrics(app, "course-service")
+setup_health(app, "course-service")
+setup_changes(app)
+setup_catalog(app)
+setup_admission(app)
+app.add_middleware(ReadYourWritesMiddleware)
+setup_compression(app)
+router = APIRouter(tags=["courses"], route_class=AdmissionRoute)
+
+# Columns in Course schema field order; read paths select these instead of hydrating ORM objects
+COURSE_COLUMNS = [Course.course_code, Course.name, Course.department, Course.credits, Course.description]
+COURSE_FIELDS = [c.key for c in COURSE_COLUMNS]
+
+def course_to_dict(course):
+    """Convert Course SQLAlchemy object to a response dictionary"""
+    return {
+        "course_code": course.course_code,
+        "name": course.name,
+        "department": course.department,
+        "credits": course.credits,
+        "description": course.description,
+    }
+
+def catalog_page(snapshot, department, after, limit, include_total):
+    """keyset_paginate over the in-memory catalog: (courses, next_cursor, total)"""
+    rows = [row for row in snapshot[1] if row[2] == department] if department else snapshot[1]
+    total = len(rows) if include_total else None
+    if after is not None:
+        rows = [row for row in rows if row[0] > after]
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return [dict(zip(COURSE_FIELDS, row)) for row in rows[:limit]], next_cursor, total
+
+async def invalidate_course(course_code=None):
+    """Drop cached course lists and, if given, the entry for one course"""
+    tags = ["courses:list"]
+    if course_code:
+        tags.append(f"courses:{course_code}")
+    # Bumped first: a read that loaded before the write then fails to store, see cache.store
+    await cache.bump("courses")
+    await cache.invalidate(*tags)
+    search.fallback_index.invalidate()
 
 @router.get("/", response_model=List[CourseSchema])
-def list_courses(db: Session = Depends(get_db)):
-    courses = db.query(Course).all()
-    # Explicitly convert SQLAlchemy models to dictionaries
-    courses_data = []
-    for course in courses:
-        courses_data.append({
-            "course_code": course.course_code,
-            "name": course.name,
-            "description": course.description,
-            "credits": course.credits,
-            "department": course.department,
+# Served from the in-memory catalog; the database fallback is one keyset page
+@cost_class("point")
+async def list_courses(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Return courses with course_code after this cursor"),
+    department: Optional[str] = Query(None),
+    include_total: bool = Query(False),
+    db: ReadDBSession = Depends(get_read_db_session),
+):
+    etag, not_modified = await check_not_modified(request, "courses", "courses")
+    if not_modified is not None:
+        return not_modified
+    snapshot = course_catalog.snapshot()
+    if snapshot is not None:
+        # Cheaper than a response cache round trip
+        courses_data, next_cursor, total = catalog_page(snapshot, department, after, limit, include_total)
+        headers = page_headers(next_cursor, total)
+        return json_response(courses_data, headers={**headers, **validators("courses", etag)})
+    cache_key = cache.key_for("courses", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("courses", etag))
+        return cached
+
+    def load(session):
+        snapshot = course_catalog.load(session)
+        if snapshot is not None:
+            return catalog_page(snapshot, department, after, limit, include_total)
+        q = session.query(*COURSE_COLUMNS)
+        if department:
+            q = q.filter(Course.department == department)
+
+        total = None
+        if include_total:
+            total = count_rows(session, q, Course.__tablename__, filtered=bool(department))
+        rows, next_cursor = keyset_paginate(q, Course.course_code, after, limit)
+        return [dict(zip(COURSE_FIELDS, row)) for row in rows], next_cursor, total
+
+    async def build(db):
+        courses_data, next_cursor, total = await db.run(load)
+        headers = page_headers(next_cursor, total)
+        body = dumps(courses_data)
+        await cache.store(cache_key, body, "courses", tags=["courses:list"], headers=headers)
+        return body, headers
+
+    body, headers = await coalesced("courses", cache_key, db, build)
+    return json_response(body, headers={**headers, **validators("courses", etag)})
+
+@router.get("/export")
+@cost_class("stream")
+async def export_courses(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    department: Optional[str] = Query(None),
+):
+    """Stream every matching course as NDJSON or CSV"""
+    statement = select(Course.__table__).order_by(Course.course_code)
+    if department:
+        statement = statement.where(Course.department == department)
+    from export import export_response  # rarely used; kept out of startup
+
+    return export_response(statement, fmt, "courses")
+
+@router.get("/search", response_model=List[CourseSchema])
+async def search_courses(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    mode: Literal["match", "prefix"] = Query("match", description="prefix for autocomplete as the user types"),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: ReadDBSession = Depends(get_read_db_session),
+):
+    """Match course names, descriptions and codes, best matches first"""
+    offset = parse_offset_cursor(cursor)
+    etag, not_modified = await check_not_modified(request, "courses", "courses")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("courses", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("courses", etag))
+        return cached
+
+    def load(session):
+        rows, has_more = search.search_courses(session, COURSE_COLUMNS, q, mode, limit, offset)
+        return [dict(zip(COURSE_FIELDS, row)) for row in rows], next_offset_cursor(offset, limit, has_more)
+
+    async def build(db):
+        courses_data, next_cursor = await db.run(load)
+        headers = page_headers(next_cursor)
+        body = dumps(courses_data)
+        await cache.store(cache_key, body, "courses", tags=["courses:list"], headers=headers)
+        return body, headers
+
+    body, headers = await coalesced("courses", cache_key, db, build)
+    return json_response(body, headers={**headers, **validators("courses", etag)})
+
+@router.get("/changes")
+@cost_class(None)
+async def course_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="`next` from the previous call; omit to get the current head"),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=CHANGES_MAX_WAIT, description="Seconds to wait for an event when there is none yet"),
+):
+    """Course creates, updates and deletes after `since`, as a JSON page, a long-poll or Server-Sent Events"""
+    return await changes_response(request, ["courses"], since, limit, wait)
+
+@router.post("/batch", response_model=CourseBatch)
+@cost_class("point")
+async def get_courses_batch(batch: CourseBatchRequest, db: ReadDBSession = Depends(get_read_db_session)):
+    """Fetch many courses in one query, in request order, listing the codes that do not exist"""
+    snapshot = course_catalog.snapshot()
+    if snapshot is not None:
+        if len(batch.ids) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per batch")
+        wanted = list(dict.fromkeys(batch.ids))
+        return json_response({
+            "items": [dict(zip(COURSE_FIELDS, snapshot[0][code])) for code in wanted if code in snapshot[0]],
+            "missing": [code for code in wanted if code not in snapshot[0]],
         })
-    return courses_data
+
+    def load(session):
+        rows, missing = fetch_batch(session, session.query(*COURSE_COLUMNS), Course.course_code, batch.ids)
+        return {"items": [dict(zip(COURSE_FIELDS, row)) for row in rows], "missing": missing}
+
+    return json_response(await db.run(load))
 
 @router.post("/", response_model=CourseSchema, status_code=status.HTTP_201_CREATED)
-def create_course(course: CourseCreate, db: Session = Depends(get_db)):
-    db_course = Course(**course.model_dump())
-    db.add(db_course)
-    db.commit()
-    db.refresh(db_course)
-    return db_course
+async def create_course(course: CourseCreate, db: DBSession = Depends(get_db_session)):
+    def create(session):
+        db_course = Course(**course.model_dump())
+        session.add(db_course)
+        session.flush()
+        course_data = course_to_dict(db_course)
+        append_change(session, "courses", db_course.course_code, "create", course_data)
+        notify_course_changed(session, db_course.course_code)
+        session.commit()
+        return course_data
+
+    course_data = await db.run(create)
+    await invalidate_course()
+    course_catalog.put(course_data)
+    return course_data
 
 @router.get("/{course_code}", response_model=CourseSchema)
-def get_course(course_code: str, db: Session = Depends(get_db)):
-    course = db.query(Course).filter(Course.course_code == course_code).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    return course
+async def get_course(course_code: str, request: Request, db: ReadDBSession = Depends(get_read_db_session)):
+    etag, not_modified = await check_not_modified(request, "courses", "courses")
+    if not_modified is not None:
+        return not_modified
+    snapshot = course_catalog.snapshot()
+    if snapshot is not None:
+        row = snapshot[0].get(course_code)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Course not found")
+        return json_response(dict(zip(COURSE_FIELDS, row)), headers=validators("courses", etag))
+    cache_key = cache.key_for("courses", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("courses", etag))
+        return cached
+
+    def load(session):
+        row = session.query(*COURSE_COLUMNS).filter(Course.course_code == course_code).first()
+        return dict(zip(COURSE_FIELDS, row)) if row else None
+
+    async def build(db):
+        course_data = await db.run(load)
+        if not course_data:
+            raise HTTPException(status_code=404, detail="Course not found")
+        body = dumps(course_data)
+        await cache.store(cache_key, body, "courses", tags=[f"courses:{course_code}"])
+        return body
+
+    body = await coalesced("courses", cache_key, db, build)
+    return json_response(body, headers=validators("courses", etag))
+
+@router.get("/{course_code}/stats", response_model=CourseStats)
+async def get_course_stats(
+    course_code: str, request: Request, db: ReadDBSession = Depends(get_read_db_session),
+):
+    """Grade distribution, percentiles, pass rate and enrollments, overall and per semester"""
+    etag, not_modified = await check_not_modified(request, "stats", "grades", "courses")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("stats", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("stats", etag))
+        return cached
+
+    async def build(db):
+        stats = await db.run(load_course_stats, course_code)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Course not found")
+        body = dumps(stats)
+        await cache.store(cache_key, body, "stats", tags=[f"stats:{course_code}", f"courses:{course_code}"])
+        return body
+
+    body = await coalesced("stats", cache_key, db, build)
+    return json_response(body, headers=validators("stats", etag))
+
+@router.get("/departments/{department}/stats", response_model=DepartmentStats)
+async def get_department_stats(
+    department: str, request: Request, db: ReadDBSession = Depends(get_read_db_session),
+):
+    """The same statistics across every course in a department"""
+    etag, not_modified = await check_not_modified(request, "stats", "grades", "courses")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("stats", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("stats", etag))
+        return cached
+
+    async def build(db):
+        stats = await db.run(load_department_stats, department)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Department not found")
+        body = dumps(stats)
+        # Course moves between departments invalidate courses:list
+        await cache.store(cache_key, body, "stats", tags=["stats:departments", "courses:list"])
+        return body
+
+    body = await coalesced("stats", cache_key, db, build)
+    return json_response(body, headers=validators("stats", etag))
 
 @router.put("/{course_code}", response_model=CourseSchema)
-def update_course(course_code: str, course: CourseUpdate, db: Session = Depends(get_db)):
-    db_course = db.query(Course).filter(Course.course_code == course_code).first()
-    if not db_course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    for key, value in course.model_dump(exclude_unset=True).items():
-        setattr(db_course, key, value)
-    db.commit()
-    db.refresh(db_course)
-    return db_course
+async def update_course(course_code: str, course: CourseUpdate, db: DBSession = Depends(get_db_session)):
+    def update(session):
+        db_course = session.query(Course).filter(Course.course_code == course_code).first()
+        if not db_course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        for key, value in course.model_dump(exclude_unset=True).items():
+            setattr(db_course, key, value)
+        # Transcripts embed course names and credits; the grade service builds them per read until rebuilt
+        session.execute(text(
+            "DELETE FROM student_transcripts WHERE student_id IN "
+            "(SELECT student_id FROM grades WHERE course_code = :course_code)"
+        ), {"course_code": course_code})
+        course_data = course_to_dict(db_course)
+        append_change(session, "courses", course_code, "update", course_data)
+        notify_course_changed(session, course_code)
+        session.commit()
+        return course_data
+
+    course_data = await db.run(update)
+    await invalidate_course(course_code)
+    course_catalog.put(course_data)
+    return course_data
 
 @router.delete("/{course_code}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_course(course_code: str, db: Session = Depends(get_db)):
-    course = db.query(Course).filter(Course.course_code == course_code).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    db.delete(course)
-    db.commit()
+async def delete_course(course_code: str, db: DBSession = Depends(get_db_session)):
+    def delete(session):
+        course = session.query(Course).filter(Course.course_code == course_code).first()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        session.delete(course)
+        append_change(session, "courses", course_code, "delete")
+        notify_course_changed(session, course_code)
+        session.commit()
+
+    await db.run(delete)
+    await invalidate_course(course_code)
+    course_catalog.discard(course_code)
     return
 
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+@app.get("/db/pool")
+def db_pool():
+    return pool_status()
+
 # Mount the router
 app.include_router(router)
\ No newline at end of file
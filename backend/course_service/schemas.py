@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class CourseBase(BaseModel):
     course_code: str
@@ -19,4 +19,39 @@ class CourseUpdate(BaseModel):
 
 class Course(CourseBase):
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class CourseBatchRequest(BaseModel):
+    ids: List[str]
+
+class CourseBatch(BaseModel):
+    items: List[Course]
+    missing: List[str]
+
+# Grade distribution statistics served from the course_grade_rollups table
+class HistogramBucket(BaseModel):
+    min: int
+    max: int
+    count: int
+
+class GradeStats(BaseModel):
+    enrollments: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    percentiles: Dict[str, float]
+    pass_rate: Optional[float] = None
+    histogram: List[HistogramBucket]
+
+class SemesterStats(GradeStats):
+    semester: str
+
+class CourseStats(BaseModel):
+    course_code: str
+    overall: GradeStats
+    semesters: List[SemesterStats]
+
+class DepartmentStats(BaseModel):
+    department: str
+    course_count: int
+    overall: GradeStats
+    semesters: List[SemesterStats]
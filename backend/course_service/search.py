@@ -0,0 +1,51 @@
+# course_service/search.py
+"""Full-text search over course names and descriptions.
+
+On PostgreSQL this matches against the weighted tsvector expression index
+from scripts.sql (idx_course_search_tsv), names ranking above descriptions;
+DOCUMENT must stay identical to the indexed expression. Course codes are
+matched by prefix. Other databases (SQLite in tests) use an in-process
+TrigramIndex instead.
+"""
+from sqlalchemy import func, literal_column, or_
+
+from course_service.models import Course
+from pagination import fetch_batch
+from trigram_index import TrigramIndex, like_prefix, words
+
+# Inlined constants: the index only matches an immutable regconfig, not a bound parameter
+CONFIG = literal_column("'english'::regconfig")
+DOCUMENT = func.setweight(func.to_tsvector(CONFIG, Course.name), literal_column("'A'")).op("||")(
+    func.setweight(func.to_tsvector(CONFIG, func.coalesce(Course.description, literal_column("''"))), literal_column("'B'"))
+)
+
+def _load_entries(session):
+    rows = session.query(Course.course_code, Course.name, Course.description).order_by(Course.course_code)
+    return [(code, [code, name, description]) for code, name, description in rows]
+
+fallback_index = TrigramIndex(_load_entries)
+
+def search_courses(session, columns, q, mode, limit, offset):
+    """One page of matching course rows, best first, and whether more follow"""
+    if session.bind.dialect.name != "postgresql":
+        codes, has_more = fallback_index.search(session, q, mode, limit, offset)
+        rows, _ = fetch_batch(session, session.query(*columns), Course.course_code, codes)
+        return rows, has_more
+
+    if mode == "prefix":
+        terms = words(q)
+        if not terms:
+            return [], False
+        # Every word must start a word in the document, so "intro comp" finds "Introduction to Computing"
+        ts_query = func.to_tsquery(CONFIG, " & ".join(f"{term}:*" for term in terms))
+    else:
+        ts_query = func.websearch_to_tsquery(CONFIG, q)
+    code_match = func.lower(Course.course_code).like(like_prefix(q), escape="\\")
+    rows = (
+        session.query(*columns)
+        .filter(or_(DOCUMENT.op("@@")(ts_query), code_match))
+        .order_by(code_match.desc(), func.ts_rank(DOCUMENT, ts_query).desc(), Course.course_code)
+        .offset(offset).limit(limit + 1)
+        .all()
+    )
+    return rows[:limit], len(rows) > limit
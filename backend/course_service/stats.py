@@ -0,0 +1,99 @@
+# course_service/stats.py
+from sqlalchemy import column, select, table
+
+from course_service.models import Course
+from grading import PASS_MARK, semester_sort_key
+
+# Maintained by the grade service on every grade write (see grade_service/rollups.py)
+course_grade_rollups = table(
+    "course_grade_rollups",
+    column("course_code"),
+    column("semester"),
+    column("grade"),
+    column("count"),
+)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_WIDTH = 10
+
+def _score_at(counts, rank):
+    """Score of the rank-th (0-based) grade in a sorted [(score, count)] distribution"""
+    seen = 0
+    for score, count in counts:
+        seen += count
+        if rank < seen:
+            return score
+    return counts[-1][0]
+
+def percentile(counts, total, q):
+    """Linearly interpolated q-th percentile, matching numpy's default method"""
+    position = (total - 1) * q / 100
+    rank = int(position)
+    lower = _score_at(counts, rank)
+    upper = _score_at(counts, min(rank + 1, total - 1))
+    return round(lower + (upper - lower) * (position - rank), 2)
+
+def summarize(distribution):
+    """Grade statistics for a {score: count} distribution"""
+    counts = sorted((score, count) for score, count in distribution.items() if count > 0)
+    total = sum(count for _, count in counts)
+    histogram = [
+        # The top band also holds perfect scores
+        {"min": low, "max": low + HISTOGRAM_WIDTH - 1 if low + HISTOGRAM_WIDTH < 100 else 100, "count": 0}
+        for low in range(0, 100, HISTOGRAM_WIDTH)
+    ]
+    for score, count in counts:
+        histogram[min(score // HISTOGRAM_WIDTH, len(histogram) - 1)]["count"] += count
+    if not total:
+        return {"enrollments": 0, "mean": None, "median": None, "percentiles": {},
+                "pass_rate": None, "histogram": histogram}
+
+    passed = sum(count for score, count in counts if score >= PASS_MARK)
+    return {
+        "enrollments": total,
+        "mean": round(sum(score * count for score, count in counts) / total, 2),
+        "median": percentile(counts, total, 50),
+        "percentiles": {f"p{q}": percentile(counts, total, q) for q in PERCENTILES},
+        "pass_rate": round(passed / total, 4),
+        "histogram": histogram,
+    }
+
+def build_stats(rows):
+    """Overall and per-semester statistics from (semester, score, count) rollup rows"""
+    overall = {}
+    by_semester = {}
+    for semester, score, count in rows:
+        overall[score] = overall.get(score, 0) + count
+        semester_counts = by_semester.setdefault(semester, {})
+        semester_counts[score] = semester_counts.get(score, 0) + count
+    return {
+        "overall": summarize(overall),
+        "semesters": [
+            {"semester": semester, **summarize(by_semester[semester])}
+            for semester in sorted(by_semester, key=semester_sort_key)
+        ],
+    }
+
+def load_course_stats(session, course_code):
+    """Statistics for one course, or None if the course does not exist"""
+    exists = session.query(Course.course_code).filter(Course.course_code == course_code).first()
+    if not exists:
+        return None
+    r = course_grade_rollups
+    rows = session.execute(
+        select(r.c.semester, r.c.grade, r.c.count).where(r.c.course_code == course_code, r.c.count > 0)
+    ).all()
+    return {"course_code": course_code, **build_stats(rows)}
+
+def load_department_stats(session, department):
+    """Statistics across every course in a department, or None if it has no courses"""
+    course_count = session.query(Course).filter(Course.department == department).count()
+    if not course_count:
+        return None
+    r = course_grade_rollups
+    rows = session.execute(
+        select(r.c.semester, r.c.grade, r.c.count)
+        .join(Course.__table__, Course.course_code == r.c.course_code)
+        .where(Course.department == department, r.c.count > 0)
+    ).all()
+    return {"department": department, "course_count": course_count, **build_stats(rows)}
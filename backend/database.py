@@ -1,7 +1,18 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+import itertools
+import logging
+import math
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 # Get database credentials from environment variables
 DB_HOST = os.getenv("DB_HOST", "10.128.0.6")
@@ -10,15 +21,536 @@ DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "12345678")
 DB_NAME = "student_management"
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL overrides the DB_* settings, e.g. sqlite:///bench.db for local benchmarks
+DATABASE_URL = os.getenv("DATABASE_URL", f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+def async_url(url):
+    return (
+        url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        .replace("sqlite://", "sqlite+aiosqlite://", 1)
+    )
+
+ASYNC_DATABASE_URL = async_url(DATABASE_URL)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+def env_flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+# Comma-separated streaming replicas of DATABASE_URL; read-only routes are balanced across them
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+# Replicas further behind than this many seconds are skipped; also how long after a write
+# to a table its reads stay on the primary
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "2"))
+# How often each replica's lag is measured, and how long a failed replica is left alone
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+# A client that wrote reads from the primary for this long (read-your-writes)
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+
+# Serve requests through asyncpg + AsyncSession instead of blocking sessions in the threadpool
+DB_ASYNC = env_flag("DB_ASYNC", "false")
+
+# Connection pool sizing, per pod. Size these so that
+# max pods * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below Postgres max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before Postgres or a load balancer drops them as idle
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test connections on checkout so pods survive database restarts and failovers
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")
+# Behind PgBouncer in transaction mode: no local pooling and no server-side prepared statements
+DB_PGBOUNCER = env_flag("DB_PGBOUNCER", "false")
+
+
+class PoolStats:
+    """Checkout wait-time counters shared by the instrumented pools"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self):
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / waits * 1000, 3) if waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class _TimedCheckout:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(is_async=False):
+    """Keyword arguments for create_engine/create_async_engine from the DB_POOL_* settings"""
+    if DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+        if is_async:
+            # asyncpg prepares statements server-side, which transaction pooling cannot route
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if IS_SQLITE:
+        # Threadpool sessions hand connections between threads; wait on locks held by other processes
+        options["connect_args"] = {"check_same_thread": False, "timeout": 30}
+    return options
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Created on first use (see __getattr__): importing the services does not load the DB driver or build a pool
+LAZY_ATTRIBUTES = ("engine", "SessionLocal", "async_engine", "AsyncSessionLocal", "replicas")
+_engine_lock = threading.Lock()
+
+
+def _create_engines():
+    engine = create_engine(DATABASE_URL, **engine_options())
+    created = {
+        "engine": engine,
+        "SessionLocal": sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        "async_engine": None,
+        "AsyncSessionLocal": None,
+        "replicas": [Replica(url) for url in DB_REPLICA_URLS],
+    }
+    if DB_ASYNC:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(is_async=True))
+        created["async_engine"] = async_engine
+        # Objects stay readable after commit without another round trip
+        created["AsyncSessionLocal"] = sessionmaker(
+            async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return created
+
+
+def _lazy(name):
+    if name not in globals():
+        with _engine_lock:
+            if name not in globals():
+                globals().update(_create_engines())
+    return globals()[name]
+
+
+def __getattr__(name):
+    """`database.engine` and `from database import SessionLocal` create the engines on first access"""
+    if name in LAZY_ATTRIBUTES:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def pool_status():
+    """Current state of the connection pool serving requests, for sizing from real data"""
+    pool = _lazy("async_engine").sync_engine.pool if DB_ASYNC else _lazy("engine").pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+            "pgbouncer": DB_PGBOUNCER,
+        },
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # Negative while the pool has not yet opened all of its base connections
+            "overflow": pool.overflow(),
+        })
+    status.update(pool_stats.snapshot())
+    if DB_REPLICA_URLS:
+        status["replicas"] = [replica.status() for replica in _lazy("replicas")]
+    return status
+
+def _open_connections(engine, count):
+    opened = []
+    try:
+        for _ in range(count):
+            opened.append(engine.connect())
+            opened[-1].execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+async def warm_pool(connections):
+    """Open up to `connections` pooled connections at once and check each with SELECT 1.
+
+    Held together so the pool really grows to that size, then returned to
+    it, so a new replica's first requests do not pay for connecting. Never
+    more than DB_POOL_SIZE, which is all the pool keeps; behind PgBouncer
+    there is no local pool and one connection just checks the database.
+    """
+    count = 1 if DB_PGBOUNCER else max(1, min(connections, DB_POOL_SIZE))
+    if not DB_ASYNC:
+        await run_in_threadpool(_open_connections, _lazy("engine"), count)
+        return
+    opened = []
+    try:
+        for _ in range(count):
+            opened.append(await _lazy("async_engine").connect())
+            await opened[-1].execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            await conn.close()
+
 def get_db():
-    db = SessionLocal()
+    db = _lazy("SessionLocal")()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class DBSession:
+    """Awaitable wrapper around either a blocking Session or an AsyncSession.
+
+    Route code hands `run` a plain function that takes a sync Session. With
+    DB_ASYNC enabled it executes on the AsyncSession's greenlet via run_sync,
+    otherwise in the threadpool, so the same query code serves both modes.
+    Anything that touches the database, including reading relationships,
+    must happen inside that function.
+    """
+
+    def __init__(self, session, is_async):
+        self.session = session
+        self.is_async = is_async
+
+    async def run(self, fn, *args, **kwargs):
+        if self.is_async:
+            return await self.session.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def rollback(self):
+        if self.is_async:
+            await self.session.rollback()
+        else:
+            await run_in_threadpool(self.session.rollback)
+
+    async def close(self):
+        if self.is_async:
+            await self.session.close()
+        else:
+            await run_in_threadpool(self.session.close)
+
+    def fork(self):
+        """A new session of the same kind, for work that may outlive this request's"""
+        return _new_db_session()
+
+
+def _new_db_session():
+    if DB_ASYNC:
+        return DBSession(_lazy("AsyncSessionLocal")(), is_async=True)
+    return DBSession(_lazy("SessionLocal")(), is_async=False)
+
+
+async def get_db_session():
+    db = _new_db_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def run_on_primary(fn, *args, **kwargs):
+    """Run `fn` as DBSession.run does, on a primary session of its own that is closed right after.
+
+    For work outside a request's dependency-managed session: streamed
+    response bodies and background tasks that must not hold a pooled
+    connection between steps.
+    """
+    db = _new_db_session()
+    try:
+        return await db.run(fn, *args, **kwargs)
+    finally:
+        await db.close()
+
+
+# Postgres replay lag in seconds; 0 on a primary and on a replica that has replayed all it received
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaUnusable(Exception):
+    pass
+
+
+class Replica:
+    """One read replica: its engine and session factory, and its last measured lag"""
+
+    def __init__(self, url):
+        if DB_ASYNC:
+            from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+            async_engine = create_async_engine(async_url(url), **engine_options(is_async=True))
+            self.engine = async_engine.sync_engine
+            self.sessionmaker = sessionmaker(
+                async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+        else:
+            self.engine = create_engine(url, **engine_options())
+            self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.lag = None
+        self.checked_at = float("-inf")
+        self.down_until = 0.0
+        self.error = None
+
+    def check_due(self):
+        return time.monotonic() - self.checked_at >= DB_REPLICA_CHECK_INTERVAL
+
+    def usable(self):
+        if time.monotonic() < self.down_until:
+            return False
+        # A lagging replica gets another chance once its lag is due to be measured again
+        return self.check_due() or self.lag <= DB_REPLICA_MAX_LAG
+
+    def measure_lag(self, session):
+        lag = 0.0
+        if session.bind.dialect.name == "postgresql":
+            lag = float(session.execute(REPLICA_LAG_SQL).scalar())
+        self.lag, self.checked_at, self.error = lag, time.monotonic(), None
+        return lag
+
+    def mark_down(self, error):
+        self.down_until = time.monotonic() + DB_REPLICA_CHECK_INTERVAL
+        self.error = f"{type(error).__name__}: {error}"
+        logger.warning(f"Read replica {self.engine.url!r} failed, reading from the primary "
+                       f"for {DB_REPLICA_CHECK_INTERVAL}s: {error}")
+
+    def status(self):
+        pool = self.engine.pool
+        status = {"url": repr(self.engine.url), "usable": self.usable(), "lag_s": self.lag, "error": self.error}
+        if isinstance(pool, QueuePool):
+            status.update({"size": pool.size(), "checked_out": pool.checkedout()})
+        return status
+
+
+_next_replica = itertools.count()
+
+
+def pick_replica():
+    """The next usable replica in round-robin order, or None to use the primary"""
+    replicas = _lazy("replicas")
+    for _ in range(len(replicas)):
+        replica = replicas[next(_next_replica) % len(replicas)]
+        if replica.usable():
+            return replica
+    return None
+
+
+def _run_on_replica(session, replica, fn, *args, **kwargs):
+    if replica.check_due() and replica.measure_lag(session) > DB_REPLICA_MAX_LAG:
+        raise ReplicaUnusable()
+    return fn(session, *args, **kwargs)
+
+
+# Wall-clock time of the newest write to the tables the current request reads, when known
+_tables_written_at = ContextVar("tables_written_at", default=0.0)
+
+
+def note_tables_written_at(timestamp):
+    """Record when the tables this request reads last changed (see conditional.check_not_modified)"""
+    _tables_written_at.set(timestamp)
+
+
+class ReadDBSession:
+    """DBSession for read-only routes, served by a read replica when one is usable.
+
+    Uses the primary when no replica is configured or usable, when the
+    client wrote within DB_READ_YOUR_WRITES_SECONDS (`prefer_primary`), and
+    when the tables the request reads changed within DB_REPLICA_MAX_LAG, so
+    replica lag never reaches the shared response cache or an ETag. A
+    replica that errors is skipped for DB_REPLICA_CHECK_INTERVAL and the
+    function is run again on the primary, which is safe because it only
+    reads. `replica` is the replica that served the last run, None for the
+    primary.
+    """
+
+    def __init__(self, prefer_primary=False):
+        self.prefer_primary = prefer_primary
+        self.replica = None
+        self._sessions = {}
+
+    def _session(self, replica):
+        db = self._sessions.get(replica)
+        if db is None:
+            if replica is None:
+                db = _new_db_session()
+            else:
+                db = DBSession(replica.sessionmaker(), is_async=DB_ASYNC)
+            self._sessions[replica] = db
+        return db
+
+    async def _discard(self, replica):
+        try:
+            await self._sessions.pop(replica).close()
+        except exc.SQLAlchemyError:
+            pass
+
+    def _wants_primary(self):
+        return self.prefer_primary or time.time() - _tables_written_at.get() < DB_REPLICA_MAX_LAG
+
+    async def run(self, fn, *args, **kwargs):
+        replica = None if self._wants_primary() else pick_replica()
+        if replica is not None:
+            try:
+                result = await self._session(replica).run(_run_on_replica, replica, fn, *args, **kwargs)
+                self.replica = replica
+                return result
+            except ReplicaUnusable:
+                await self._discard(replica)
+            except (exc.OperationalError, exc.InterfaceError) as e:
+                replica.mark_down(e)
+                await self._discard(replica)
+        self.replica = None
+        return await self._session(None).run(fn, *args, **kwargs)
+
+    async def rollback(self):
+        for db in self._sessions.values():
+            await db.rollback()
+
+    async def close(self):
+        for db in self._sessions.values():
+            await db.close()
+
+    def fork(self):
+        """A new ReadDBSession routed the same way, for work that may outlive this request's"""
+        return ReadDBSession(prefer_primary=self.prefer_primary)
+
+
+def wrote_recently(request: Request):
+    """True while the client's read-your-writes cookie is live"""
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_db_session(request: Request):
+    """Session dependency for routes that only read; see ReadDBSession"""
+    db = ReadDBSession(prefer_primary=wrote_recently(request))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
+
+
+# Set per request by ReadYourWritesMiddleware; any commit in that request appends to it
+_request_commits = ContextVar("request_commits", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _record_commit(session):
+    commits = _request_commits.get()
+    if commits is not None:
+        commits.append(True)
+
+
+class ReadYourWritesMiddleware:
+    """Send a client's reads to the primary for DB_READ_YOUR_WRITES_SECONDS after it writes.
+
+    A successful response to a request that committed sets a cookie with the
+    time until which get_read_db_session prefers the primary for that client.
+    The cookie's path is "/", so every service behind the ingress honours it.
+    Does nothing without DB_REPLICA_URLS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not DB_REPLICA_URLS:
+            await self.app(scope, receive, send)
+            return
+        commits = []
+        token = _request_commits.set(commits)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and commits and message["status"] < 400:
+                cookie = (f"{READ_YOUR_WRITES_COOKIE}={time.time() + DB_READ_YOUR_WRITES_SECONDS:.3f}; "
+                          f"Max-Age={math.ceil(DB_READ_YOUR_WRITES_SECONDS)}; Path=/; HttpOnly; SameSite=Lax")
+                message = dict(message, headers=[*message.get("headers", []), (b"set-cookie", cookie.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_commits.reset(token)
+
+
+async def stream_rows(statement, batch_size=1000):
+    """Yield lists of up to `batch_size` rows for a Core select without buffering the result.
+
+    Runs on its own session so it can outlive the request handler, as a
+    StreamingResponse body does. Uses a server-side (named) cursor with
+    psycopg2 and AsyncSession.stream with asyncpg.
+    """
+    if DB_ASYNC:
+        async with _lazy("AsyncSessionLocal")() as session:
+            result = await session.stream(statement.execution_options(stream_results=True))
+            async for partition in result.partitions(batch_size):
+                yield partition
+        return
+
+    session = _lazy("SessionLocal")()
+    try:
+        result = await run_in_threadpool(
+            session.execute, statement.execution_options(stream_results=True)
+        )
+        partitions = result.partitions(batch_size)
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                break
+            yield partition
+    finally:
+        await run_in_threadpool(session.close)
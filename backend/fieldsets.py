@@ -0,0 +1,24 @@
+from fastapi import HTTPException
+
+
+def schema_fields(schema):
+    """Field names of the pydantic model `schema`, in declaration order"""
+    return list(getattr(schema, "model_fields", None) or schema.__fields__)
+
+
+def parse_fieldset(value, allowed, param="fields"):
+    """Names listed in the comma-separated query parameter `value`, in `allowed` order.
+
+    None when the parameter was not given; 400 for an empty list or a name
+    not in `allowed`, so a typo fails loudly instead of dropping the field.
+    """
+    if value is None:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = sorted(requested.difference(allowed))
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=(
+            f"Unknown {param}: {', '.join(unknown)}; choose from {', '.join(allowed)}" if unknown
+            else f"{param} must name at least one of {', '.join(allowed)}"
+        ))
+    return [name for name in allowed if name in requested]
@@ -0,0 +1,68 @@
+# gateway/main.py
+"""All three APIs in one ASGI app, for small deployments and local benchmarks.
+
+Serves the student, course and grade routers under the same /api/... paths
+the ingress exposes, from one process with one engine, one connection pool
+and one response cache. Scale with uvicorn --workers (WEB_CONCURRENCY): each
+worker holds its own pool, so size DB_POOL_SIZE for workers * replicas.
+"""
+from fastapi import FastAPI
+
+from database import ReadYourWritesMiddleware, pool_status
+from cache import cache
+from admission import setup_admission
+from metrics import setup_metrics
+from health import setup_health
+from compression import setup_compression
+from catalog import setup_catalog
+from changes import setup_changes
+from student_service.main import router as student_router
+from course_service.main import router as course_router
+from grade_service.main import router as grade_router
+
+# URL prefix for each service, as routed by k8s/base/ingress-api.yaml
+SERVICE_PREFIXES = {
+    "student_service": "/api/students",
+    "course_service": "/api/courses",
+    "grade_service": "/api/grades",
+}
+
+
+class PrefixRootMiddleware:
+    """Serve "/api/students" as "/api/students/" instead of redirecting.
+
+    Behind the ingress the services see "/" for both spellings; clients
+    that call the bare prefix should not pay a 307 round trip here either.
+    """
+
+    def __init__(self, app, prefixes):
+        self.app = app
+        self.prefixes = set(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.prefixes:
+            scope = dict(scope, path=scope["path"] + "/", raw_path=scope["path"].encode() + b"/")
+        await self.app(scope, receive, send)
+
+
+app = FastAPI(title="Student Management API")
+setup_metrics(app, "gateway")
+setup_health(app, "gateway")
+setup_changes(app)
+setup_catalog(app)
+setup_admission(app)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(PrefixRootMiddleware, prefixes=SERVICE_PREFIXES.values())
+setup_compression(app)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+@app.get("/db/pool")
+def db_pool():
+    return pool_status()
+
+app.include_router(student_router, prefix=SERVICE_PREFIXES["student_service"])
+app.include_router(course_router, prefix=SERVICE_PREFIXES["course_service"])
+app.include_router(grade_router, prefix=SERVICE_PREFIXES["grade_service"])
@@ -0,0 +1,307 @@
+# grade_service/bulk.py
+from collections import Counter
+from pydantic import ValidationError
+from sqlalchemy import text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+import codecs
+import csv
+import io
+import json
+import os
+
+from grade_service.models import Grade, Course
+from grade_service.rollups import apply_deltas
+from grade_service.transcripts import lock_students, refresh_transcripts
+from grade_service.upsert import record_grade_changes
+from grade_service.schemas import GradeCreate
+
+# Rows validated and written per transaction; bounds memory for arbitrarily large uploads
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+# Per-row errors beyond this are counted but not listed in the response
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("BULK_MAX_REPORTED_ERRORS", "1000"))
+# A single JSON value larger than this is rejected instead of buffered
+BULK_MAX_ROW_BYTES = int(os.getenv("BULK_MAX_ROW_BYTES", "65536"))
+
+CSV_COLUMNS = ["student_id", "course_code", "grade", "semester", "date"]
+
+
+class BulkFormatError(ValueError):
+    """The upload cannot be parsed any further"""
+
+
+async def _text_chunks(stream):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in stream:
+        text_chunk = decoder.decode(chunk)
+        if text_chunk:
+            yield text_chunk
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _lines(stream):
+    buffer = ""
+    async for text_chunk in _text_chunks(stream):
+        buffer += text_chunk
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            yield line.rstrip("\r")
+        if len(buffer) > BULK_MAX_ROW_BYTES:
+            raise BulkFormatError("Line exceeds maximum row size")
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson(stream):
+    async for line in _lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield e
+
+
+async def iter_csv(stream):
+    header = None
+    async for line in _lines(stream):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [h.strip() for h in values]
+            missing = set(CSV_COLUMNS) - set(header)
+            if missing:
+                raise BulkFormatError(f"CSV header missing columns: {', '.join(sorted(missing))}")
+            continue
+        yield dict(zip(header, values))
+
+
+async def iter_json_array(stream):
+    """Yield the elements of a top-level JSON array without holding the whole document"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    exhausted = False
+    chunks = _text_chunks(stream)
+
+    while True:
+        stripped = buffer.lstrip()
+        if not started:
+            if stripped:
+                if stripped[0] != "[":
+                    raise BulkFormatError("Expected a JSON array")
+                buffer = stripped[1:]
+                started = True
+                continue
+        elif stripped.startswith(","):
+            buffer = stripped[1:]
+            continue
+        elif stripped.startswith("]"):
+            return
+        elif stripped:
+            try:
+                value, end = decoder.raw_decode(stripped)
+            except json.JSONDecodeError:
+                # Either the element is split across chunks or it is malformed
+                if exhausted or len(stripped) > BULK_MAX_ROW_BYTES:
+                    raise BulkFormatError("Malformed JSON array element")
+            else:
+                # A number at the buffer edge may continue in the next chunk
+                if end < len(stripped) or exhausted:
+                    yield value
+                    buffer = stripped[end:]
+                    continue
+
+        if exhausted:
+            raise BulkFormatError("Unterminated JSON array")
+        try:
+            buffer = stripped + await chunks.__anext__()
+        except StopAsyncIteration:
+            exhausted = True
+            buffer = stripped
+
+
+def parser_for(content_type):
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return iter_ndjson
+    if media_type in ("text/csv", "application/csv"):
+        return iter_csv
+    if media_type in ("application/json", ""):
+        return iter_json_array
+    return None
+
+
+def validate_row(raw):
+    """Return (grade_values, None) for a valid row or (None, error message)"""
+    if isinstance(raw, Exception):
+        return None, f"Invalid JSON: {raw}"
+    if not isinstance(raw, dict):
+        return None, "Row must be an object"
+    try:
+        grade_in = GradeCreate(**raw)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+    if not 0 <= grade_in.grade <= 100:
+        return None, "grade: must be between 0 and 100"
+    return {
+        "student_id": grade_in.student_id,
+        "course_code": grade_in.course_code,
+        "grade": grade_in.grade,
+        "semester": grade_in.semester,
+        "date": grade_in.date,
+    }, None
+
+
+def _copy_to_staging(session, rows):
+    """Stream rows into a temp table with COPY FROM STDIN (psycopg2 only)"""
+    dbapi_conn = session.connection().connection
+    cursor = dbapi_conn.cursor()
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS grades_staging "
+        "(student_id VARCHAR(10), course_code VARCHAR(10), grade INTEGER, semester VARCHAR(20), date DATE) "
+        "ON COMMIT DELETE ROWS"
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[c] for c in CSV_COLUMNS])
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY grades_staging (student_id, course_code, grade, semester, date) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    result = session.execute(text(
+        "INSERT INTO grades (student_id, course_code, grade, semester, date) "
+        "SELECT student_id, course_code, grade, semester, date FROM grades_staging "
+        "ON CONFLICT (student_id, course_code, semester) "
+        "DO UPDATE SET grade = EXCLUDED.grade, date = EXCLUDED.date "
+        "RETURNING student_id, course_code, grade, semester, date, id, (xmax = 0) AS inserted"
+    ))
+    return result.all()
+
+
+def _multirow_upsert(session, rows):
+    dialect = session.bind.dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = Grade.__table__
+    stmt = insert(table).values([
+        {"student_id": r["student_id"], "course_code": r["course_code"], "grade": r["grade"],
+         "semester": r["semester"], "date": r["date"]}
+        for r in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.student_id, table.c.course_code, table.c.semester],
+        set_={"grade": stmt.excluded.grade, "date": stmt.excluded.date},
+    )
+    if dialect == "postgresql":
+        return session.execute(stmt.returning(
+            table.c.student_id, table.c.course_code, table.c.grade, table.c.semester, table.c.date, table.c.id,
+            text("(xmax = 0) AS inserted"),
+        )).all()
+    session.execute(stmt)
+    return None
+
+
+def _write_chunk(session, by_key, valid):
+    """Upsert the valid rows and move their rollup counts; returns (written rows, inserted flags).
+
+    Returns None, with the transaction rolled back, when a row this chunk
+    updated was created by another writer after the scores below were read:
+    the score it replaced is unknown, so the caller runs the chunk again.
+    """
+    # Scores being overwritten leave their rollup buckets; locked so they cannot change underneath us,
+    # in key order so concurrent uploads take them in the same order
+    existing = {
+        (s, c, sem): score
+        for s, c, sem, score in session.query(
+            Grade.student_id, Grade.course_code, Grade.semester, Grade.grade_value
+        ).filter(
+            tuple_(Grade.student_id, Grade.course_code, Grade.semester).in_(list(by_key))
+        ).order_by(Grade.student_id, Grade.course_code, Grade.semester).with_for_update()
+    }
+    deltas = Counter()
+    for key, values in by_key.items():
+        if key in existing:
+            deltas[(values["course_code"], values["semester"], existing[key])] -= 1
+        deltas[(values["course_code"], values["semester"], values["grade"])] += 1
+
+    # Written rows in GRADE_EVENT_FIELDS order, then whether each was inserted; None on SQLite
+    if session.bind.dialect.driver == "psycopg2":
+        written = _copy_to_staging(session, valid)
+    else:
+        written = _multirow_upsert(session, valid)
+    flags = None if written is None else [row.inserted for row in written]
+    if flags is not None and any(
+        not row.inserted and (row.student_id, row.course_code, row.semester) not in existing for row in written
+    ):
+        session.rollback()
+        return None
+
+    apply_deltas(session, deltas)
+
+    if written is None:
+        # No RETURNING here: read the rows back for their ids, telling inserts apart by the rows locked above
+        written = [
+            (*row, (row[0], row[1], row[3]) not in existing)
+            for row in session.query(
+                Grade.student_id, Grade.course_code, Grade.grade_value, Grade.semester, Grade.grade_date,
+                Grade.grade_id,
+            ).filter(tuple_(Grade.student_id, Grade.course_code, Grade.semester).in_(list(by_key)))
+        ]
+    return written, flags
+
+
+def load_chunk(session, rows):
+    """Upsert one chunk of validated (row_number, values) pairs.
+
+    Rows referencing unknown students or courses are rejected up front so one
+    bad reference cannot fail the whole chunk. Returns (inserted, updated,
+    written, errors, affected student ids, affected course codes);
+    inserted/updated are None when the database cannot tell them apart.
+    """
+    errors = []
+    student_ids = {v["student_id"] for _, v in rows}
+    course_codes = {v["course_code"] for _, v in rows}
+    # Locked before any grade row, as every grade writer does; their transcripts are rebuilt below
+    known_students = lock_students(session, student_ids)
+    known_courses = {c for (c,) in session.query(Course.course_code).filter(Course.course_code.in_(course_codes))}
+
+    # ON CONFLICT cannot touch the same row twice in one statement: last occurrence wins
+    by_key = {}
+    for row_number, values in rows:
+        if values["student_id"] not in known_students:
+            errors.append({"row": row_number, "error": f"Unknown student_id {values['student_id']}"})
+        elif values["course_code"] not in known_courses:
+            errors.append({"row": row_number, "error": f"Unknown course_code {values['course_code']}"})
+        else:
+            by_key[(values["student_id"], values["course_code"], values["semester"])] = values
+    # Written in key order too, as the rows locked below are
+    valid = [by_key[key] for key in sorted(by_key)]
+    if not valid:
+        return 0, 0, 0, errors, [], []
+
+    for _ in range(2):
+        result = _write_chunk(session, by_key, valid)
+        if result is not None:
+            break
+        # The rollback released the student locks
+        known_students = lock_students(session, known_students)
+    else:
+        raise RuntimeError("Grades were rewritten concurrently twice; retry the chunk")
+    written, flags = result
+    record_grade_changes(session, [("create" if row[6] else "update", tuple(row[:6])) for row in written])
+
+    affected = sorted({v["student_id"] for v in valid})
+    refresh_transcripts(session, {student_id: known_students[student_id] for student_id in affected})
+    session.commit()
+
+    courses = list({v["course_code"] for v in valid})
+    if flags is None:
+        return None, None, len(valid), errors, affected, courses
+    inserted = sum(1 for f in flags if f)
+    return inserted, len(flags) - inserted, len(valid), errors, affected, courses
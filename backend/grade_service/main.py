@@ -1,28 +1,59 @@
 # grade_service/main.py
-from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
+from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Header, Query, Request, Response
+from typing import List, Literal, Optional
+from sqlalchemy import select
 import logging
 
-from grade_service.models import Grade
-from grade_service.schemas import GradeSchema, GradeCreate, GradeUpdate
-from database import get_db
+from grade_service.models import Grade, Student, Course
+from grade_service.schemas import (
+    GradeSchema, GradeCreate, GradeUpdate, GradeBatchRequest, GradeBatch, Transcript, StudentDetails, CourseDetails,
+)
+from grade_service.transcripts import read_transcript
+from grade_service.upsert import DuplicateGrade, UnknownReference, delete_grade_by_id, update_grade_by_id, upsert_grade
+from database import (
+    DBSession, ReadDBSession, ReadYourWritesMiddleware, get_db_session, get_read_db_session, pool_status,
+)
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_paginate, count_rows, page_headers, fetch_batch
+from cache import cache
+from serialization import dumps, json_response
+from conditional import check_not_modified, validators
+from coalesce import coalesced
+from admission import AdmissionRoute, cost_class, setup_admission
+from metrics import setup_metrics
+from health import setup_health
+from compression import setup_compression
+from catalog import COURSE_FIELDS, course_catalog, setup_catalog
+from fieldsets import parse_fieldset, schema_fields
+from changes import (
+    CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE, CHANGES_MAX_WAIT, changes_response, setup_changes,
+)
+import idempotency
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
-router = APIRouter(tags=["grades"])
+setup_metrics(app, "grade-service")
+setup_health(app, "grade-service")
+setup_changes(app)
+setup_catalog(app)
+setup_admission(app)
+app.add_middleware(ReadYourWritesMiddleware)
+setup_compression(app)
+router = APIRouter(tags=["grades"], route_class=AdmissionRoute)
 
 def grade_to_dict(grade_obj):
     """Convert Grade SQLAlchemy object to dictionary with proper field names"""
+    # Keys follow GradeSchema's field order so cached bodies match validated responses byte for byte
     result = {
-        "id": grade_obj.grade_id,        # Map grade_id to id for frontend compatibility
         "student_id": grade_obj.student_id,
         "course_code": grade_obj.course_code,
         "grade": grade_obj.grade_value,  # Map grade_value to grade
         "semester": grade_obj.semester,
         "date": grade_obj.grade_date,    # Map grade_date to date
+        "id": grade_obj.grade_id,        # Map grade_id to id for frontend compatibility
+        "student": None,
+        "course": None,
     }
     
     # Add student details if available
@@ -46,66 +77,493 @@ def grade_to_dict(grade_obj):
     
     return result
 
+# Flat column set for read paths: the grade plus its embedded student details,
+# fetched as plain rows through an outer join instead of hydrating ORM objects per grade
+GRADE_ROW_COLUMNS = [
+    Grade.student_id, Grade.course_code, Grade.grade_value, Grade.semester, Grade.grade_date, Grade.grade_id,
+    Student.student_id.label("embedded_student_id"), Student.first_name, Student.last_name, Student.email,
+]
+# Embedded course details, in course_catalog row order; joined only while the catalog is not current
+COURSE_ROW_COLUMNS = [
+    Course.course_code.label("embedded_course_code"), Course.name, Course.department, Course.credits,
+    Course.description,
+]
+
+def grade_rows_query(session):
+    q = session.query(*GRADE_ROW_COLUMNS).outerjoin(Student, Grade.student_id == Student.student_id)
+    if (course_catalog.snapshot() or course_catalog.load(session)) is not None:
+        return q
+    return q.add_columns(*COURSE_ROW_COLUMNS).outerjoin(Course, Grade.course_code == Course.course_code)
+
+def grade_row_to_dict(row, courses=None):
+    """Same output as grade_to_dict, built from a grade_rows_query row.
+
+    Rows without the course columns take their course from `courses`
+    ({course_code: COURSE_ROW_COLUMNS row}); see grade_rows_to_dicts.
+    """
+    (student_id, course_code, grade, semester, grade_date, grade_id,
+     embedded_student_id, first_name, last_name, email) = row[:len(GRADE_ROW_COLUMNS)]
+    course = row[len(GRADE_ROW_COLUMNS):] or (courses or {}).get(course_code)
+    return {
+        "student_id": student_id,
+        "course_code": course_code,
+        "grade": grade,
+        "semester": semester,
+        "date": grade_date,
+        "id": grade_id,
+        "student": {
+            "student_id": embedded_student_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+        } if embedded_student_id is not None else None,
+        "course": {
+            "course_code": course[0],
+            "name": course[1],
+            "credits": course[3],
+            "department": course[2],
+            "description": course[4],
+        } if course and course[0] is not None else None,
+    }
+
+def course_rows(session, course_codes):
+    """{course_code: COURSE_ROW_COLUMNS row} covering `course_codes`, from the in-memory catalog where it can"""
+    snapshot = course_catalog.snapshot()
+    courses = snapshot[0] if snapshot is not None else {}
+    missing = set(course_codes).difference(courses)
+    if missing:
+        # Created on another pod moments ago, or the catalog went stale after the query was built
+        courses = dict(courses)
+        courses.update(
+            (row[0], tuple(row))
+            for row in session.query(*COURSE_ROW_COLUMNS).filter(Course.course_code.in_(missing))
+        )
+    return courses
+
+def grade_rows_to_dicts(session, rows):
+    """grade_row_to_dict for each of `rows`, with course details from the in-memory catalog"""
+    courses = course_rows(session, {row[1] for row in rows if len(row) == len(GRADE_ROW_COLUMNS)})
+    return [grade_row_to_dict(row, courses) for row in rows]
+
+# What ?fields= and ?include= may name, validated against the response schemas
+EMBEDDED_OBJECTS = {"student": schema_fields(StudentDetails), "course": schema_fields(CourseDetails)}
+GRADE_FIELDS = [name for name in schema_fields(GradeSchema) if name not in EMBEDDED_OBJECTS]
+SPARSE_GRADE_FIELDS = GRADE_FIELDS + [
+    f"{name}.{field}" for name, fields in EMBEDDED_OBJECTS.items() for field in fields
+]
+GRADE_FIELD_COLUMNS = {
+    "student_id": Grade.student_id, "course_code": Grade.course_code, "grade": Grade.grade_value,
+    "semester": Grade.semester, "date": Grade.grade_date, "id": Grade.grade_id,
+}
+STUDENT_DETAIL_COLUMNS = {
+    "student_id": Student.student_id.label("embedded_student_id"), "first_name": Student.first_name,
+    "last_name": Student.last_name, "email": Student.email,
+}
+COURSE_DETAIL_COLUMNS = dict(zip(COURSE_FIELDS, COURSE_ROW_COLUMNS))
+# Always read: the pagination key and what cache tags and course lookups need
+GRADE_KEY_FIELDS = ["id", "student_id", "course_code"]
+
+class GradeFieldset:
+    """The grade fields and embedded objects a read asked for with ?fields= and ?include=.
+
+    `fields` lists GradeSchema fields and "student.<field>"/"course.<field>"
+    for embedded ones; naming an embedded field embeds its object. `include`
+    embeds whole objects. Only the columns these need are selected, students
+    are joined only when embedded, and courses come from the catalog or,
+    while it is not current, a join made only when embedded.
+    """
+
+    def __init__(self, fields, include):
+        names = parse_fieldset(fields, SPARSE_GRADE_FIELDS, "fields")
+        included = parse_fieldset(include, list(EMBEDDED_OBJECTS), "include") or []
+        self.fields = GRADE_FIELDS if names is None else [name for name in names if "." not in name]
+        self.embedded = {}
+        for name, all_fields in EMBEDDED_OBJECTS.items():
+            chosen = [field for field in all_fields if f"{name}.{field}" in (names or ())]
+            if chosen or name in included:
+                self.embedded[name] = chosen or all_fields
+        self._grade_keys = GRADE_KEY_FIELDS + [name for name in self.fields if name not in GRADE_KEY_FIELDS]
+        # The embedded key column comes first: NULL there means the outer join found nothing
+        self._student_keys = ["student_id"] + [
+            field for field in self.embedded.get("student", ()) if field != "student_id"
+        ] if "student" in self.embedded else []
+        self._course_keys = ["course_code"] + [
+            field for field in self.embedded.get("course", ()) if field != "course_code"
+        ] if "course" in self.embedded else []
+
+    @classmethod
+    def from_query(cls, fields, include):
+        """A GradeFieldset, or None when neither parameter was given and the full GradeSchema shape applies"""
+        if fields is None and include is None:
+            return None
+        return cls(fields, include)
+
+    def query(self, session):
+        q = session.query(*(GRADE_FIELD_COLUMNS[name] for name in self._grade_keys))
+        if self._student_keys:
+            q = q.add_columns(*(STUDENT_DETAIL_COLUMNS[field] for field in self._student_keys))
+            q = q.outerjoin(Student, Grade.student_id == Student.student_id)
+        if self._course_keys and (course_catalog.snapshot() or course_catalog.load(session)) is None:
+            q = q.add_columns(*(COURSE_DETAIL_COLUMNS[field] for field in self._course_keys))
+            q = q.outerjoin(Course, Grade.course_code == Course.course_code)
+        return q
+
+    def rows_to_dicts(self, session, rows):
+        """Response dicts for rows of query(), in schema field order"""
+        student_start = len(self._grade_keys)
+        course_start = student_start + len(self._student_keys)
+        courses = {}
+        if self._course_keys:
+            courses = course_rows(session, {row[2] for row in rows if len(row) == course_start})
+        result = []
+        for row in rows:
+            values = dict(zip(self._grade_keys, row))
+            grade = {name: values[name] for name in self.fields}
+            if self._student_keys:
+                student = dict(zip(self._student_keys, row[student_start:course_start]))
+                grade["student"] = {
+                    field: student[field] for field in self.embedded["student"]
+                } if student["student_id"] is not None else None
+            if self._course_keys:
+                if len(row) > course_start:
+                    course = dict(zip(self._course_keys, row[course_start:]))
+                else:
+                    course_row = courses.get(values["course_code"])
+                    course = dict(zip(COURSE_FIELDS, course_row)) if course_row else {"course_code": None}
+                grade["course"] = {
+                    field: course[field] for field in self.embedded["course"]
+                } if course["course_code"] is not None else None
+            result.append(grade)
+        return result
+
+    @staticmethod
+    def tags(row):
+        """grade_tags for a row of query()"""
+        return grade_tags({"id": row[0], "student_id": row[1], "course_code": row[2]})
+
+def compact_grades(grades):
+    """Grades without embedded objects, plus each distinct student and course once, keyed by ID.
+
+    A page of one course's grades otherwise repeats the same course object,
+    description included, in every row.
+    """
+    items, students, courses = [], {}, {}
+    for grade in grades:
+        student = grade.pop("student", None)
+        course = grade.pop("course", None)
+        if student is not None:
+            students[student["student_id"]] = student
+        if course is not None:
+            courses[course["course_code"]] = course
+        items.append(grade)
+    return {"items": items, "students": students, "courses": courses}
+
+def grade_tags(grade_data):
+    """Cache tags for an entry embedding this grade and its student/course details"""
+    return [
+        f"grades:{grade_data['id']}",
+        # Bulk upserts cannot tell which ids they overwrote
+        "grades:entries",
+        f"students:{grade_data['student_id']}",
+        f"courses:{grade_data['course_code']}",
+    ]
+
+async def invalidate_grade(grade_id=None, student_id=None, course_code=None):
+    """Drop cached grade lists plus the entry, transcript and course stats touched by one grade"""
+    tags = ["grades:list"]
+    if grade_id is not None:
+        tags.append(f"grades:{grade_id}")
+    if student_id:
+        tags.append(f"transcripts:{student_id}")
+    if course_code:
+        tags.extend([f"stats:{course_code}", "stats:departments"])
+    # Bumped first: a read that loaded before the write then fails to store, see cache.store
+    await cache.bump("grades")
+    await cache.invalidate(*tags)
+
 @router.get("/", response_model=List[GradeSchema])
-def list_grades(
+async def list_grades(
+    request: Request,
     student_id: Optional[str] = Query(None),
     course_code: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    semester: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description="Return grades with id after this cursor"),
+    include_total: bool = Query(False),
+    compact: bool = Query(False, description=(
+        "Return {items, students, courses}: grades without embedded objects, "
+        "and each student and course once, keyed by ID"
+    )),
+    fields: Optional[str] = Query(None, description=(
+        "Comma-separated GradeSchema fields to return, e.g. grade,semester; "
+        "student.<field> or course.<field> embeds just those fields of the student or course"
+    )),
+    include: Optional[str] = Query(None, description="student, course or both: embed these objects"),
+    db: ReadDBSession = Depends(get_read_db_session),
 ):
+    fieldset = GradeFieldset.from_query(fields, include)
+    etag, not_modified = await check_not_modified(request, "grades", "grades", "students", "courses")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("grades", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("grades", etag))
+        return cached
+
+    criteria = []
+    if student_id:
+        criteria.append(Grade.student_id == student_id)
+    if course_code:
+        criteria.append(Grade.course_code == course_code)
+    if semester:
+        criteria.append(Grade.semester == semester)
+
+    def load(session):
+        total = None
+        if include_total:
+            # Count on the bare grades table, not the joined read query
+            count_query = session.query(Grade.grade_id).filter(*criteria)
+            total = count_rows(session, count_query, Grade.__tablename__, filtered=bool(criteria))
+        if fieldset is None:
+            q = grade_rows_query(session).filter(*criteria)
+            rows, next_cursor = keyset_paginate(q, Grade.grade_id, after, limit)
+            grades = grade_rows_to_dicts(session, rows)
+        else:
+            rows, next_cursor = keyset_paginate(fieldset.query(session).filter(*criteria), Grade.grade_id, after, limit)
+            grades = fieldset.rows_to_dicts(session, rows)
+        return compact_grades(grades) if compact else grades, next_cursor, total
+
+    async def build(db):
+        grades_data, next_cursor, total = await db.run(load)
+        headers = page_headers(next_cursor, total)
+        body = dumps(grades_data)
+        # Embedded student/course details go stale when any of them changes
+        await cache.store(cache_key, body, "grades",
+                    tags=["grades:list", "students:list", "courses:list"], headers=headers)
+        return body, headers
+
     try:
-        q = db.query(Grade).options(
-            joinedload(Grade.student),
-            joinedload(Grade.course)
-        )
-        if student_id:
-            q = q.filter(Grade.student_id == student_id)
-        if course_code:
-            q = q.filter(Grade.course_code == course_code)
-        
-        grades = q.all()
-        return [grade_to_dict(grade) for grade in grades]
+        body, headers = await coalesced("grades", cache_key, db, build)
+        return json_response(body, headers={**headers, **validators("grades", etag)})
     except Exception as e:
         logger.error(f"Error listing grades: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.post("/", response_model=GradeSchema, status_code=status.HTTP_201_CREATED)
-def create_grade(grade_in: GradeCreate, db: Session = Depends(get_db)):
+@router.get("/export")
+@cost_class("stream")
+async def export_grades(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    student_id: Optional[str] = Query(None),
+    course_code: Optional[str] = Query(None),
+    semester: Optional[str] = Query(None),
+):
+    """Stream every matching grade as flat NDJSON or CSV rows, without embedded student/course objects"""
+    statement = select(Grade.__table__).order_by(Grade.grade_id)
+    if student_id:
+        statement = statement.where(Grade.student_id == student_id)
+    if course_code:
+        statement = statement.where(Grade.course_code == course_code)
+    if semester:
+        statement = statement.where(Grade.semester == semester)
+    from export import export_response  # rarely used; kept out of startup
+
+    return export_response(statement, fmt, "grades")
+
+@router.post(
+    "/",
+    response_model=GradeSchema,
+    status_code=status.HTTP_201_CREATED,
+    responses={200: {"model": GradeSchema, "description": "Existing grade for this student, course and semester updated"}},
+)
+async def create_grade(
+    grade_in: GradeCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: DBSession = Depends(get_db_session),
+):
+    """Record a grade, replacing the one the student already has for this course and semester.
+
+    Answers 201 when the grade is new and 200 when it replaced one. Repeating a
+    request with the same Idempotency-Key replays the first response.
+    """
+    payload = grade_in.model_dump()
+    if not 0 <= payload["grade"] <= 100:
+        raise HTTPException(status_code=422, detail="Grade must be between 0 and 100")
+    replayed, record = await idempotency.begin("grades", idempotency_key, payload)
+    if replayed is not None:
+        return replayed
+
+    def upsert(session):
+        row, inserted = upsert_grade(session, payload, grade_rows_query)
+        return grade_rows_to_dicts(session, [row])[0], inserted
+
     try:
-        # Map incoming field names to model field names
-        grade_data = grade_in.model_dump()
-        if 'grade' in grade_data:
-            grade_data['grade_value'] = grade_data.pop('grade')
-        if 'date' in grade_data:
-            grade_data['grade_date'] = grade_data.pop('date')
-            
-        new_grade = Grade(**grade_data)
-        db.add(new_grade)
-        db.commit()
-        db.refresh(new_grade)
-        
-        # Load relationships
-        db.query(Grade).options(
-            joinedload(Grade.student),
-            joinedload(Grade.course)
-        ).filter(Grade.grade_id == new_grade.grade_id).first()
-        
-        return grade_to_dict(new_grade)
+        grade, inserted = await db.run(upsert)
+    except UnknownReference as e:
+        await idempotency.abandon(record)
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await idempotency.abandon(record)
+        await db.rollback()
         logger.error(f"Error creating grade: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/{grade_id}", response_model=GradeSchema)
-def get_grade(grade_id: int, db: Session = Depends(get_db)):
+    # A replaced grade may sit in cached entries under its id
+    await invalidate_grade(None if inserted else grade["id"], grade["student_id"], grade["course_code"])
+    body = dumps(grade)
+    status_code = status.HTTP_201_CREATED if inserted else status.HTTP_200_OK
+    await idempotency.finish(record, status_code, body)
+    return json_response(body, status_code=status_code)
+
+@router.post("/bulk")
+@cost_class("stream")
+async def bulk_upsert_grades(request: Request, db: DBSession = Depends(get_db_session)):
+    """Upsert grades from a JSON array, NDJSON or CSV body on (student_id, course_code, semester).
+
+    The body is parsed as a stream and written in chunks of BULK_CHUNK_SIZE rows,
+    each in its own transaction, so memory stays bounded for any upload size.
+    Invalid rows are reported by 1-based row number and do not stop the load.
+    """
+    # Imported on first upload: the parsers are not needed to start a pod or serve reads
+    from grade_service.bulk import (
+        BULK_CHUNK_SIZE, BULK_MAX_REPORTED_ERRORS, BulkFormatError, parser_for, validate_row, load_chunk,
+    )
+
+    parse = parser_for(request.headers.get("content-type"))
+    if parse is None:
+        raise HTTPException(status_code=415, detail="Use application/json, application/x-ndjson or text/csv")
+
+    report = {"received": 0, "inserted": 0, "updated": 0, "written": 0, "failed": 0, "chunks": 0, "errors": []}
+    affected_students = set()
+    affected_courses = set()
+
+    def add_errors(errors):
+        report["failed"] += len(errors)
+        room = BULK_MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"].extend(errors[:max(room, 0)])
+
+    async def flush(chunk):
+        try:
+            inserted, updated, written, errors, students, courses = await db.run(load_chunk, chunk)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error loading grade chunk: {e}")
+            add_errors([{"row": row_number, "error": "Chunk rejected by database"} for row_number, _ in chunk])
+            return
+        report["chunks"] += 1
+        report["written"] += written
+        if inserted is None:
+            report["inserted"] = report["updated"] = None
+        elif report["inserted"] is not None:
+            report["inserted"] += inserted
+            report["updated"] += updated
+        add_errors(errors)
+        affected_students.update(students)
+        affected_courses.update(courses)
+
+    chunk = []
+    try:
+        async for raw in parse(request.stream()):
+            report["received"] += 1
+            values, error = validate_row(raw)
+            if error:
+                add_errors([{"row": report["received"], "error": error}])
+                continue
+            chunk.append((report["received"], values))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk)
+    except BulkFormatError as e:
+        if not report["received"]:
+            raise HTTPException(status_code=400, detail=str(e))
+        if chunk:
+            await flush(chunk)
+        report["aborted"] = f"{e} after row {report['received']}"
+
+    if report["written"]:
+        await cache.bump("grades")
+        await cache.invalidate(
+            "grades:list", "grades:entries", "stats:departments",
+            *(f"transcripts:{sid}" for sid in affected_students),
+            *(f"stats:{code}" for code in affected_courses),
+        )
+    return report
+
+@router.get("/changes")
+@cost_class(None)
+async def grade_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="`next` from the previous call; omit to get the current head"),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=CHANGES_MAX_WAIT, description="Seconds to wait for an event when there is none yet"),
+):
+    """Grade creates, updates and deletes after `since`, as a JSON page, a long-poll or Server-Sent Events.
+
+    Events carry the grade's own fields; embedded students and courses change in their own feeds.
+    """
+    return await changes_response(request, ["grades"], since, limit, wait)
+
+@router.post("/batch", response_model=GradeBatch)
+@cost_class("point")
+async def get_grades_batch(batch: GradeBatchRequest, db: ReadDBSession = Depends(get_read_db_session)):
+    """Fetch many grades in one query, in request order, listing the IDs that do not exist"""
+    def load(session):
+        rows, missing = fetch_batch(session, grade_rows_query(session), Grade.grade_id, batch.ids)
+        return {"items": grade_rows_to_dicts(session, rows), "missing": missing}
+
     try:
-        g = db.query(Grade).options(
-            joinedload(Grade.student),
-            joinedload(Grade.course)
-        ).filter(Grade.grade_id == grade_id).first()
-        
-        if not g:
+        return json_response(await db.run(load))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting grades batch: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/{grade_id}", response_model=GradeSchema)
+async def get_grade(
+    grade_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description=(
+        "Comma-separated GradeSchema fields to return, e.g. grade,semester; "
+        "student.<field> or course.<field> embeds just those fields of the student or course"
+    )),
+    include: Optional[str] = Query(None, description="student, course or both: embed these objects"),
+    db: ReadDBSession = Depends(get_read_db_session),
+):
+    fieldset = GradeFieldset.from_query(fields, include)
+    etag, not_modified = await check_not_modified(request, "grades", "grades", "students", "courses")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("grades", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("grades", etag))
+        return cached
+
+    def load(session):
+        if fieldset is not None:
+            row = fieldset.query(session).filter(Grade.grade_id == grade_id).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Grade not found")
+            return fieldset.rows_to_dicts(session, [row])[0], fieldset.tags(row)
+        row = grade_rows_query(session).filter(Grade.grade_id == grade_id).first()
+        if not row:
             raise HTTPException(status_code=404, detail="Grade not found")
-        return grade_to_dict(g)
+        grade_data = grade_rows_to_dicts(session, [row])[0]
+        return grade_data, grade_tags(grade_data)
+
+    async def build(db):
+        grade_data, tags = await db.run(load)
+        body = dumps(grade_data)
+        await cache.store(cache_key, body, "grades", tags=tags)
+        return body
+
+    try:
+        body = await coalesced("grades", cache_key, db, build)
+        return json_response(body, headers=validators("grades", etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -113,65 +571,87 @@ def get_grade(grade_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.put("/{grade_id}", response_model=GradeSchema)
-def update_grade(grade_id: int, grade_in: GradeUpdate, db: Session = Depends(get_db)):
-    try:
-        g = db.query(Grade).filter(Grade.grade_id == grade_id).first()
-        if not g:
+async def update_grade(grade_id: int, grade_in: GradeUpdate, db: DBSession = Depends(get_db_session)):
+    changes = grade_in.model_dump(exclude_unset=True)
+    if changes.get("grade") is not None and not 0 <= changes["grade"] <= 100:
+        raise HTTPException(status_code=422, detail="Grade must be between 0 and 100")
+
+    def update(session):
+        row = update_grade_by_id(session, grade_id, changes, grade_rows_query)
+        if row is None:
             raise HTTPException(status_code=404, detail="Grade not found")
-        
-        # Map incoming field names to model field names
-        update_data = grade_in.model_dump(exclude_unset=True)
-        if 'grade' in update_data:
-            update_data['grade_value'] = update_data.pop('grade')
-        if 'date' in update_data:
-            update_data['grade_date'] = update_data.pop('date')
-        
-        for field, value in update_data.items():
-            setattr(g, field, value)
-        db.commit()
-        db.refresh(g)
-        
-        # Load relationships
-        g = db.query(Grade).options(
-            joinedload(Grade.student),
-            joinedload(Grade.course)
-        ).filter(Grade.grade_id == grade_id).first()
-        
-        return grade_to_dict(g)
+        return grade_rows_to_dicts(session, [row])[0]
+
+    try:
+        grade = await db.run(update)
+        await invalidate_grade(grade_id, grade["student_id"], grade["course_code"])
+        return json_response(grade)
     except HTTPException:
         raise
+    except DuplicateGrade as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error updating grade: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.delete("/{grade_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_grade(grade_id: int, db: Session = Depends(get_db)):
-    try:
-        g = db.query(Grade).filter(Grade.grade_id == grade_id).first()
-        if not g:
+async def delete_grade(grade_id: int, db: DBSession = Depends(get_db_session)):
+    def delete(session):
+        deleted = delete_grade_by_id(session, grade_id)
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Grade not found")
-        db.delete(g)
-        db.commit()
+        return deleted
+
+    try:
+        student_id, course_code = await db.run(delete)
+        await invalidate_grade(grade_id, student_id, course_code)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting grade: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/student/{student_id}/transcript", response_model=List[GradeSchema])
-def get_student_transcript(student_id: str, db: Session = Depends(get_db)):
-    """Get all grades for a specific student (transcript)"""
-    try:
-        grades = db.query(Grade).options(
-            joinedload(Grade.student),
-            joinedload(Grade.course)
-        ).filter(Grade.student_id == student_id).all()
-        
-        return [grade_to_dict(grade) for grade in grades]
-    except Exception as e:
-        logger.error(f"Error getting transcript for student {student_id}: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+@router.get("/student/{student_id}/transcript", response_model=Transcript)
+async def get_student_transcript(
+    student_id: str, request: Request, db: ReadDBSession = Depends(get_read_db_session),
+):
+    """Get a student's transcript: grades grouped by semester with credit-weighted GPA.
+
+    Served read-only from the precomputed student_transcripts row, which every grade
+    write rebuilds in its own transaction.
+    """
+    etag, not_modified = await check_not_modified(request, "transcripts", "grades", "students", "courses")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("transcripts", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("transcripts", etag))
+        return cached
+
+    async def build(db):
+        try:
+            document = await db.run(read_transcript, student_id)
+        except Exception as e:
+            logger.error(f"Error getting transcript for student {student_id}: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        if document is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        await cache.store(cache_key, document, "transcripts",
+                    tags=[f"transcripts:{student_id}", f"students:{student_id}", "courses:list"])
+        return document
+
+    document = await coalesced("transcripts", cache_key, db, build)
+    return Response(content=document, media_type="application/json", headers=validators("transcripts", etag))
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+@app.get("/db/pool")
+def db_pool():
+    return pool_status()
 
 app.include_router(router)
@@ -0,0 +1,107 @@
+# grade_service/rollups.py
+"""Per course/semester grade distributions, maintained incrementally on grade writes.
+
+Each course_grade_rollups row counts the grades with one score in one course
+and semester, so the course service can compute histograms, percentiles and
+pass rates without scanning grades. Rebuild or verify from scratch with:
+
+    python -m grade_service.rollups [--check]
+"""
+from collections import Counter
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+import argparse
+import sys
+
+from grade_service.models import Grade, CourseGradeRollup
+
+def rollup_key(grade):
+    """The rollup row a Grade object is counted in"""
+    return grade.course_code, grade.semester, grade.grade_value
+
+def apply_deltas(session, deltas):
+    """Add each {(course_code, semester, score): delta} to the rollups inside the caller's transaction.
+
+    One upsert for the whole batch; rows are written in key order so
+    concurrent writers lock them in the same order.
+    """
+    rows = [
+        {"course_code": course_code, "semester": semester, "grade": score, "count": delta}
+        for (course_code, semester, score), delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+    table = CourseGradeRollup.__table__
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.course_code, table.c.semester, table.c.grade],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    session.execute(stmt)
+
+def record_change(session, removed=(), added=()):
+    """Move rollup counts for grades leaving (`removed`) and entering (`added`) the given keys"""
+    deltas = Counter()
+    for key in added:
+        deltas[key] += 1
+    for key in removed:
+        deltas[key] -= 1
+    apply_deltas(session, deltas)
+
+def _aggregate():
+    return select(
+        Grade.course_code, Grade.semester, Grade.grade_value, func.count()
+    ).group_by(Grade.course_code, Grade.semester, Grade.grade_value)
+
+def rebuild_rollups(session):
+    """Regenerate every rollup row from grades; returns the number of rows written"""
+    if session.bind.dialect.name == "postgresql":
+        # Hold off grade writes so no delta lands between the delete and the reinsert
+        session.execute(text("LOCK TABLE grades IN SHARE MODE"))
+    table = CourseGradeRollup.__table__
+    session.execute(table.delete())
+    result = session.execute(table.insert().from_select(
+        [table.c.course_code, table.c.semester, table.c.grade, table.c.count], _aggregate()
+    ))
+    return result.rowcount
+
+def check_rollups(session):
+    """Compare the rollups with a fresh aggregation; returns [(key, stored, actual)] for every mismatch"""
+    actual = {(c, s, g): n for c, s, g, n in session.execute(_aggregate())}
+    stored = {
+        (r.course_code, r.semester, r.grade): r.count
+        for r in session.query(CourseGradeRollup).filter(CourseGradeRollup.count != 0)
+    }
+    return [
+        (key, stored.get(key, 0), actual.get(key, 0))
+        for key in sorted(set(actual) | set(stored))
+        if stored.get(key, 0) != actual.get(key, 0)
+    ]
+
+def main():
+    from database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Regenerate course_grade_rollups from the grades table")
+    parser.add_argument("--check", action="store_true",
+                        help="only report rollup rows that differ from the grades table")
+    args = parser.parse_args()
+
+    CourseGradeRollup.__table__.create(bind=engine, checkfirst=True)
+    session = SessionLocal()
+    try:
+        if args.check:
+            mismatches = check_rollups(session)
+            for (course_code, semester, score), stored, actual in mismatches:
+                print(f"{course_code} {semester} score {score}: rollup {stored}, grades {actual}")
+            print(f"{len(mismatches)} mismatched rollup rows")
+            return 1 if mismatches else 0
+        written = rebuild_rollups(session)
+        session.commit()
+        print(f"Rebuilt {written} rollup rows")
+        return 0
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
 # grade_service/schemas.py
 from pydantic import BaseModel
 from datetime import date as DateType
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 
 class GradeBase(BaseModel):
     student_id: str
@@ -47,6 +48,13 @@ class GradeSchema(GradeBase):
     class Config:
         orm_mode = True
 
+class GradeBatchRequest(BaseModel):
+    ids: List[int]
+
+class GradeBatch(BaseModel):
+    items: List[GradeSchema]
+    missing: List[int]
+
 # Schema for transcript entries (keeping existing for compatibility)
 class TranscriptEntry(BaseModel):
     id: int  # Changed from grade_id to id for frontend compatibility
@@ -56,4 +64,18 @@ class TranscriptEntry(BaseModel):
     course: CourseDetails
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Precomputed transcript: one student header, grades grouped by semester
+class TranscriptSemester(BaseModel):
+    semester: str
+    grades: List[TranscriptEntry]
+    credits: int
+    gpa: Optional[float] = None
+
+class Transcript(BaseModel):
+    student: StudentDetails
+    semesters: List[TranscriptSemester]
+    total_credits: int
+    gpa: Optional[float] = None
+    updated_at: datetime
\ No newline at end of file
@@ -0,0 +1,141 @@
+# grade_service/transcripts.py
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+import json
+
+from grade_service.models import Grade, Student, StudentTranscript
+from grading import grade_points, semester_sort_key
+
+def weighted_gpa(rows):
+    """Credit-weighted GPA and credit total for (score, credits) pairs"""
+    credits = sum(c for _, c in rows)
+    if not credits:
+        return None, 0
+    return round(sum(grade_points(score) * c for score, c in rows) / credits, 2), credits
+
+def _grades_by_student(session, student_ids):
+    """Each student's Grade objects, with their courses loaded, in one query"""
+    by_student = {}
+    for g in session.query(Grade).options(
+        joinedload(Grade.course)
+    ).filter(Grade.student_id.in_(student_ids)):
+        by_student.setdefault(g.student_id, []).append(g)
+    return by_student
+
+def _document(student, grades):
+    """The Transcript document for `student` from their Grade objects"""
+    by_semester = {}
+    for g in grades:
+        by_semester.setdefault(g.semester, []).append(g)
+
+    semesters = []
+    all_rows = []
+    for semester in sorted(by_semester, key=semester_sort_key):
+        entries = sorted(by_semester[semester], key=lambda g: g.course_code)
+        rows = [(g.grade_value, g.course.credits) for g in entries if g.course]
+        gpa, credits = weighted_gpa(rows)
+        all_rows.extend(rows)
+        semesters.append({
+            "semester": semester,
+            "grades": [
+                {
+                    "id": g.grade_id,
+                    "semester": g.semester,
+                    "grade": g.grade_value,
+                    "date": g.grade_date,
+                    "course": {
+                        "course_code": g.course.course_code,
+                        "name": g.course.name,
+                        "credits": g.course.credits,
+                        "department": g.course.department,
+                        "description": g.course.description,
+                    },
+                }
+                for g in entries if g.course
+            ],
+            "credits": credits,
+            "gpa": gpa,
+        })
+
+    gpa, total_credits = weighted_gpa(all_rows)
+    return {
+        "student": {
+            "student_id": student.student_id,
+            "first_name": student.first_name,
+            "last_name": student.last_name,
+            "email": student.email,
+        },
+        "semesters": semesters,
+        "total_credits": total_credits,
+        "gpa": gpa,
+        "updated_at": datetime.utcnow(),
+    }
+
+def _encode(document):
+    return json.dumps(jsonable_encoder(document), separators=(",", ":"))
+
+def build_transcript(session, student_id):
+    """Compute the Transcript document for one student, or None if the student does not exist"""
+    student = session.query(Student).filter(Student.student_id == student_id).first()
+    if not student:
+        return None
+    return _document(student, _grades_by_student(session, [student_id]).get(student_id, []))
+
+def lock_students(session, student_ids):
+    """Lock the rows of `student_ids` in id order; returns the Student objects by id.
+
+    FOR NO KEY UPDATE does not conflict with the FK checks of grade inserts,
+    but makes grade writes for the same student run one after another, so
+    the last to refresh a transcript sees every grade. Grade writers lock
+    the students before any grade row.
+    """
+    return {
+        student.student_id: student
+        for student in session.query(Student).filter(
+            Student.student_id.in_(sorted(set(student_ids)))
+        ).order_by(Student.student_id).with_for_update(key_share=True)
+    }
+
+def refresh_transcripts(session, students):
+    """Rebuild and store the transcripts of `students` ({id: Student} from lock_students) in the caller's transaction.
+
+    Call after the grade writes: the grades are read in one query and the
+    documents written in one upsert, however many students there are.
+    """
+    if not students:
+        return
+    grades = _grades_by_student(session, list(students))
+    rows = []
+    for student_id, student in students.items():
+        document = _document(student, grades.get(student_id, []))
+        rows.append({
+            "student_id": student_id,
+            "document": _encode(document),
+            "gpa": document["gpa"],
+            "total_credits": document["total_credits"],
+            "updated_at": document["updated_at"],
+        })
+    insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+    table = StudentTranscript.__table__
+    stmt = insert(table).values(rows)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.student_id],
+        set_={name: stmt.excluded[name] for name in ("document", "gpa", "total_credits", "updated_at")},
+    ))
+
+def read_transcript(session, student_id):
+    """Return the stored transcript JSON without writing anything.
+
+    Grade writes keep the row current. Student and course edits delete the
+    rows they affect, and those students get a document built for each read
+    until their next grade write.
+    """
+    row = session.query(StudentTranscript.document).filter(
+        StudentTranscript.student_id == student_id
+    ).first()
+    if row:
+        return row.document
+    document = build_transcript(session, student_id)
+    return None if document is None else _encode(document)
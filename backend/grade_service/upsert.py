@@ -0,0 +1,240 @@
+# grade_service/upsert.py
+"""Grade writes: create-or-update on (student_id, course_code, semester), update by id and delete.
+
+On PostgreSQL the grade, its rollup counts and the response row (with the
+embedded student and course) come from a single INSERT ... ON CONFLICT DO
+UPDATE or UPDATE ... RETURNING statement. Other databases, i.e. SQLite in
+tests and benchmarks, run the same steps one at a time. Every write locks
+the student row before the grade row and rebuilds the student's stored
+transcript before it commits.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from grade_service.models import Grade, Student, Course
+from grade_service.transcripts import lock_students, refresh_transcripts
+from grade_service.rollups import record_change
+from changes import append_change, append_changes
+
+# Columns in main.GRADE_ROW_COLUMNS then COURSE_ROW_COLUMNS order, then whether the row was inserted and the score it replaced
+UPSERT_SQL = text("""
+    WITH previous AS (
+        SELECT grade FROM grades
+        WHERE student_id = :student_id AND course_code = :course_code AND semester = :semester
+        FOR UPDATE
+    ), upserted AS (
+        INSERT INTO grades (student_id, course_code, grade, semester, date)
+        VALUES (:student_id, :course_code, :grade, :semester, :date)
+        ON CONFLICT (student_id, course_code, semester)
+        DO UPDATE SET grade = EXCLUDED.grade, date = EXCLUDED.date
+        RETURNING id, student_id, course_code, grade, semester, date, (xmax = 0) AS inserted
+    ), deltas AS (
+        SELECT course_code, semester, grade, 1 AS delta FROM upserted
+        UNION ALL
+        SELECT u.course_code, u.semester, p.grade, -1 FROM upserted u CROSS JOIN previous p WHERE NOT u.inserted
+    ), rolled_up AS (
+        INSERT INTO course_grade_rollups (course_code, semester, grade, count)
+        SELECT course_code, semester, grade, SUM(delta) FROM deltas
+        GROUP BY course_code, semester, grade
+        HAVING SUM(delta) <> 0
+        -- Same lock order as rollups.apply_deltas
+        ORDER BY course_code, semester, grade
+        ON CONFLICT (course_code, semester, grade)
+        DO UPDATE SET count = course_grade_rollups.count + EXCLUDED.count
+    )
+    SELECT u.student_id, u.course_code, u.grade, u.semester, u.date, u.id,
+           s.student_id, s.first_name, s.last_name, s.email,
+           c.course_code, c.name, c.department, c.credits, c.description,
+           u.inserted, (SELECT grade FROM previous) AS previous_grade
+    FROM upserted u
+    LEFT JOIN students s ON s.student_id = u.student_id
+    LEFT JOIN courses c ON c.course_code = u.course_code
+""")
+
+# Same result columns as UPSERT_SQL, without the flags; NULL parameters keep the stored value
+UPDATE_SQL = text("""
+    WITH previous AS (
+        SELECT id, course_code, semester, grade FROM grades WHERE id = :grade_id
+        FOR UPDATE
+    ), updated AS (
+        UPDATE grades g
+        SET grade = COALESCE(:grade, p.grade), semester = COALESCE(:semester, p.semester),
+            date = COALESCE(:date, g.date)
+        FROM previous p
+        WHERE g.id = p.id
+        RETURNING g.id, g.student_id, g.course_code, g.grade, g.semester, g.date
+    ), deltas AS (
+        SELECT course_code, semester, grade, 1 AS delta FROM updated
+        UNION ALL
+        SELECT p.course_code, p.semester, p.grade, -1 FROM previous p JOIN updated u ON u.id = p.id
+    ), rolled_up AS (
+        INSERT INTO course_grade_rollups (course_code, semester, grade, count)
+        SELECT course_code, semester, grade, SUM(delta) FROM deltas
+        GROUP BY course_code, semester, grade
+        HAVING SUM(delta) <> 0
+        -- Same lock order as rollups.apply_deltas
+        ORDER BY course_code, semester, grade
+        ON CONFLICT (course_code, semester, grade)
+        DO UPDATE SET count = course_grade_rollups.count + EXCLUDED.count
+    )
+    SELECT u.student_id, u.course_code, u.grade, u.semester, u.date, u.id,
+           s.student_id, s.first_name, s.last_name, s.email,
+           c.course_code, c.name, c.department, c.credits, c.description
+    FROM updated u
+    LEFT JOIN students s ON s.student_id = u.student_id
+    LEFT JOIN courses c ON c.course_code = u.course_code
+""")
+
+# GradeSchema's scalar fields, in order: the document a grade's change events carry
+GRADE_EVENT_FIELDS = ("student_id", "course_code", "grade", "semester", "date", "id")
+
+def record_grade_changes(session, changes):
+    """Append (op, row) grade changes to the change feed, each row's values in GRADE_EVENT_FIELDS order"""
+    append_changes(session, "grades", [
+        (row[5], op, dict(zip(GRADE_EVENT_FIELDS, row))) for op, row in changes
+    ])
+
+class UnknownReference(LookupError):
+    """The grade names a student or course that does not exist"""
+
+class DuplicateGrade(ValueError):
+    """The student already has another grade for this course and semester"""
+
+def _lock_student(session, student_id):
+    """lock_students for one student; returns {id: Student} for refresh_transcripts"""
+    students = lock_students(session, [student_id])
+    if not students:
+        raise UnknownReference("Student not found")
+    return students
+
+def _lock_grade_student(session, grade_id):
+    """_lock_student for the owner of grade `grade_id`, or None when there is no such grade"""
+    owner = session.query(Grade.student_id).filter(Grade.grade_id == grade_id).scalar_subquery()
+    student = session.query(Student).filter(Student.student_id == owner).with_for_update(key_share=True).first()
+    return {student.student_id: student} if student else None
+
+def _upsert_postgresql(session, values):
+    students = _lock_student(session, values["student_id"])
+    try:
+        row = session.execute(UPSERT_SQL, values).one()
+    except IntegrityError:
+        # The student exists and the score was range-checked by the route, leaving the course key
+        session.rollback()
+        raise UnknownReference("Course not found")
+    if not row.inserted and row.previous_grade is None:
+        # Created by a concurrent writer after our snapshot: the replaced score
+        # is unknown, so run again in a fresh transaction that can see it
+        session.rollback()
+        return None
+    record_grade_changes(session, [("create" if row.inserted else "update", tuple(row)[:6])])
+    refresh_transcripts(session, students)
+    return tuple(row)[:15], row.inserted
+
+def _upsert_portable(session, values):
+    students = _lock_student(session, values["student_id"])
+    if session.query(Course.course_code).filter(Course.course_code == values["course_code"]).first() is None:
+        raise UnknownReference("Course not found")
+    grade = session.query(Grade).filter(
+        Grade.student_id == values["student_id"],
+        Grade.course_code == values["course_code"],
+        Grade.semester == values["semester"],
+    ).with_for_update().first()
+    inserted = grade is None
+    removed = []
+    if inserted:
+        grade = Grade(student_id=values["student_id"], course_code=values["course_code"], semester=values["semester"])
+        session.add(grade)
+    else:
+        removed.append((grade.course_code, grade.semester, grade.grade_value))
+    grade.grade_value = values["grade"]
+    grade.grade_date = values["date"]
+    session.flush()
+    record_change(session, removed=removed, added=[(grade.course_code, grade.semester, grade.grade_value)])
+    record_grade_changes(session, [("create" if inserted else "update", (
+        grade.student_id, grade.course_code, grade.grade_value, grade.semester, grade.grade_date, grade.grade_id,
+    ))])
+    refresh_transcripts(session, students)
+    return grade.grade_id, inserted
+
+def upsert_grade(session, values, rows_query):
+    """Insert or update one grade and commit; returns (grade row as main.grade_row_to_dict takes it, inserted).
+
+    `values` holds student_id, course_code, grade, semester and date.
+    `rows_query(session)` builds the joined read query for the portable path.
+    Raises UnknownReference for a missing student or course.
+    """
+    if session.bind.dialect.name == "postgresql":
+        for _ in range(2):
+            result = _upsert_postgresql(session, values)
+            if result is not None:
+                break
+        else:
+            raise RuntimeError("Grade was rewritten concurrently twice; retry the request")
+        session.commit()
+        return result
+
+    grade_id, inserted = _upsert_portable(session, values)
+    session.commit()
+    return rows_query(session).filter(Grade.grade_id == grade_id).one(), inserted
+
+def update_grade_by_id(session, grade_id, changes, rows_query):
+    """Change a grade's score, semester and/or date and commit; returns the grade row as upsert_grade does.
+
+    Fields missing from `changes`, or None, keep their value. Returns None
+    when there is no grade `grade_id`; raises DuplicateGrade when the new
+    semester already holds the student's grade for the course.
+    """
+    students = _lock_grade_student(session, grade_id)
+    if students is None:
+        return None
+    values = {"grade_id": grade_id, **{field: changes.get(field) for field in ("grade", "semester", "date")}}
+
+    if session.bind.dialect.name == "postgresql":
+        try:
+            row = session.execute(UPDATE_SQL, values).first()
+        except IntegrityError:
+            # The grade row is locked and its student and course are unchanged, leaving the unique key
+            session.rollback()
+            raise DuplicateGrade("Student already has a grade for this course and semester")
+        if row is None:
+            return None
+        row = tuple(row)
+    else:
+        before = rows_query(session).filter(Grade.grade_id == grade_id).with_for_update(of=Grade).first()
+        if before is None:
+            return None
+        grade, semester, grade_date = (
+            before[i] if values[field] is None else values[field]
+            for i, field in ((2, "grade"), (3, "semester"), (4, "date"))
+        )
+        try:
+            session.query(Grade).filter(Grade.grade_id == grade_id).update(
+                {Grade.grade_value: grade, Grade.semester: semester, Grade.grade_date: grade_date},
+                synchronize_session=False,
+            )
+        except IntegrityError:
+            session.rollback()
+            raise DuplicateGrade("Student already has a grade for this course and semester")
+        record_change(session, removed=[(before[1], before[3], before[2])], added=[(before[1], semester, grade)])
+        row = (*before[:2], grade, semester, grade_date, *before[5:])
+    record_grade_changes(session, [("update", row[:6])])
+    refresh_transcripts(session, students)
+    session.commit()
+    return row
+
+def delete_grade_by_id(session, grade_id):
+    """Delete a grade and commit; returns its (student_id, course_code), or None when there is no such grade"""
+    students = _lock_grade_student(session, grade_id)
+    if students is None:
+        return None
+    row = session.query(Grade.student_id, Grade.course_code, Grade.semester, Grade.grade_value).filter(
+        Grade.grade_id == grade_id
+    ).with_for_update().first()
+    if row is None:
+        return None
+    session.query(Grade).filter(Grade.grade_id == grade_id).delete(synchronize_session=False)
+    record_change(session, removed=[(row.course_code, row.semester, row.grade_value)])
+    append_change(session, "grades", grade_id, "delete")
+    refresh_transcripts(session, students)
+    session.commit()
+    return row.student_id, row.course_code
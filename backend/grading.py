@@ -0,0 +1,21 @@
+import os
+import re
+
+# Same letter bands as the frontend transcript page
+GRADE_POINTS = [(90, 4.0), (80, 3.0), (70, 2.0), (60, 1.0)]
+# Lowest score that earns grade points
+PASS_MARK = int(os.getenv("PASS_MARK", "60"))
+TERM_ORDER = {"winter": 0, "spring": 1, "summer": 2, "fall": 3}
+
+def grade_points(score):
+    for threshold, points in GRADE_POINTS:
+        if score >= threshold:
+            return points
+    return 0.0
+
+def semester_sort_key(semester):
+    """Order "Fall 2023" style semesters chronologically, anything else after them by name"""
+    match = re.match(r"^\s*(\w+)\s+(\d{4})\s*$", semester)
+    if match and match.group(1).lower() in TERM_ORDER:
+        return (0, int(match.group(2)), TERM_ORDER[match.group(1).lower()], semester)
+    return (1, 0, 0, semester)
@@ -0,0 +1,102 @@
+from sqlalchemy.orm import configure_mappers
+import asyncio
+import logging
+import os
+import time
+
+import database
+from serialization import json_response
+
+logger = logging.getLogger(__name__)
+
+# Pooled connections opened before a replica reports ready (capped at DB_POOL_SIZE)
+READY_WARM_CONNECTIONS = int(os.getenv("READY_WARM_CONNECTIONS", str(database.DB_POOL_SIZE)))
+# Process start to ready; slower starts are logged as warnings
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+
+_service_name = "app"
+_ready = False
+_last_error = None
+_warm_lock = None
+_warm_task = None
+# Milliseconds for each startup phase, filled in as the process gets there
+_timing = {}
+
+
+def process_age_ms():
+    """Milliseconds since this process started, from /proc; None where that is unavailable"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks since boot; the command name before it may contain spaces
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        return round((time.clock_gettime(time.CLOCK_BOOTTIME) - started) * 1000, 1)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def startup_report():
+    report = {"service": _service_name, "ready": _ready, "budget_ms": STARTUP_BUDGET_MS, **_timing}
+    if _last_error and not _ready:
+        report["error"] = _last_error
+    return report
+
+
+async def _warm_up():
+    """Configure mappers and fill the pool once; later calls return straight away"""
+    global _ready, _last_error, _warm_lock
+    if _ready:
+        return True
+    if _warm_lock is None:
+        _warm_lock = asyncio.Lock()
+    async with _warm_lock:
+        if _ready:
+            return True
+        start = time.perf_counter()
+        try:
+            # Otherwise the first query of the first request pays for it
+            configure_mappers()
+            await database.warm_pool(READY_WARM_CONNECTIONS)
+        except Exception as e:
+            _last_error = f"{type(e).__name__}: {e}"
+            logger.warning("Not ready, database warm-up failed: %s", _last_error)
+            return False
+        _timing["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _timing["ready_ms"] = process_age_ms()
+        _ready = True
+        ready_ms = _timing["ready_ms"]
+        if ready_ms is not None and ready_ms > STARTUP_BUDGET_MS:
+            logger.warning("Startup over budget: %s", startup_report())
+        else:
+            logger.info("Startup: %s", startup_report())
+        return True
+
+
+def setup_health(app, service):
+    """Serve GET /healthz (liveness) and GET /ready (readiness), and warm the pool at startup.
+
+    Warm-up starts in the background as soon as the app starts, so it
+    usually has finished by the first readiness probe. Until it succeeds
+    /ready answers 503 and retries it; afterwards /ready no longer touches
+    the database, so a database outage does not take every replica out of
+    the Service at once.
+    """
+    global _service_name
+    _service_name = service
+
+    async def start_warm_up():
+        global _warm_task
+        # Interpreter start to serving: imports, app construction and the server's own startup
+        _timing["imports_ms"] = process_age_ms()
+        _warm_task = asyncio.get_running_loop().create_task(_warm_up())
+
+    app.router.add_event_handler("startup", start_warm_up)
+
+    @app.get("/healthz", include_in_schema=False)
+    def healthz():
+        return {"status": "ok"}
+
+    @app.get("/ready", include_in_schema=False)
+    async def ready():
+        if await _warm_up():
+            return json_response(startup_report())
+        return json_response(startup_report(), status_code=503, headers={"Cache-Control": "no-store"})
@@ -0,0 +1,66 @@
+from fastapi import HTTPException
+import hashlib
+import json
+import os
+
+from cache import cache
+from serialization import dumps, json_response
+
+# Seconds a completed write's response is replayed for its Idempotency-Key
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Seconds a key stays claimed by a request that has not finished; a crashed request frees it after this
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "60"))
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(payload):
+    return hashlib.blake2b(dumps(payload), digest_size=16).hexdigest()
+
+
+async def begin(scope, key, payload):
+    """Claim `key` for one write; returns (replayed Response or None, record to finish or None).
+
+    A key seen before with the same payload replays the stored response; with
+    a different payload it is a 422, and while the first request is still
+    running a 409. Without a key, or while the cache is unavailable, the write
+    just runs: it is an upsert, so repeating it leaves the same data.
+    """
+    if key is None:
+        return None, None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    record = f"idempotency:{scope}:{key}"
+    digest = fingerprint(payload)
+    claimed = await cache.claim(record, json.dumps({"fingerprint": digest}), IDEMPOTENCY_PENDING_TTL)
+    if claimed is None:
+        return None, None
+    if claimed:
+        return None, (record, digest)
+
+    raw = await cache.read(record)
+    if raw is None:
+        # Expired between the claim and the read: treat as a request of its own
+        return await begin(scope, key, payload)
+    stored = json.loads(raw)
+    if stored["fingerprint"] != digest:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    if "status" not in stored:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return json_response(
+        stored["body"].encode("utf-8"), status_code=stored["status"], headers={"Idempotent-Replayed": "true"},
+    ), None
+
+
+async def finish(record, status_code, body):
+    """Store the response of a completed write for replay"""
+    if record is None:
+        return
+    key, digest = record
+    value = {"fingerprint": digest, "status": status_code, "body": body.decode("utf-8")}
+    await cache.write(key, json.dumps(value), IDEMPOTENCY_TTL)
+
+
+async def abandon(record):
+    """Release the key of a write that failed, so the client can retry it"""
+    if record is not None:
+        await cache.forget(record[0])
@@ -0,0 +1,362 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter as StatementCounter
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+import logging
+import os
+import re
+import threading
+import time
+
+from admission import admission_controller
+from cache import cache
+import database
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, shared by the request and query histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+# A request running the same SQL statement this many times is flagged as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "3"))
+
+SELECT_TABLE = re.compile(r"^\s*SELECT\b.*?\bFROM\s+([\w.\"]+)", re.IGNORECASE | re.DOTALL)
+WRITE_TABLE = re.compile(r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+([\w.\"]+)", re.IGNORECASE)
+LIMIT_TAIL = re.compile(r"\bLIMIT\b(?:[^()]|%\(\w+\)s)*$", re.IGNORECASE)
+NAMED_PLACEHOLDER = re.compile(r"%\((\w+)\)s")
+POSITIONAL_PLACEHOLDER = re.compile(r"\?|%s|\$\d+")
+
+UNMATCHED_ROUTE = "<unmatched>"
+BACKGROUND_ROUTE = "<background>"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labels: (list(b), s, c) for labels, (b, s, c) in self._series.items()}
+        for labels, (bucket_counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield "_bucket", _labels(self.labelnames, labels, [("le", _number(bound))]), cumulative
+            yield "_sum", _labels(self.labelnames, labels), total
+            yield "_count", _labels(self.labelnames, labels), count
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            yield "_total", _labels(self.labelnames, labels), value
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template and status code",
+    ("service", "method", "route", "status"),
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Duration of each SQL statement, by the route that issued it",
+    ("service", "route"),
+)
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per request",
+    ("service", "route"), buckets=QUERY_COUNT_BUCKETS,
+)
+N_PLUS_ONE = Counter(
+    "db_n_plus_one_requests",
+    "Requests flagged for repeated_statement (one statement run METRICS_N_PLUS_ONE_THRESHOLD+ times) "
+    "or repeated_read (the same SELECT with the same parameters run twice)",
+    ("service", "route", "pattern"),
+)
+COALESCED_REQUESTS = Counter(
+    "http_coalesced_requests",
+    "Cacheable reads that ran their load (leader), shared a concurrent identical one's (follower), "
+    "or stopped waiting for it after COALESCE_WAIT_TIMEOUT and ran their own (timeout)",
+    ("service", "resource", "outcome"),
+)
+
+
+def _read_key(statement, parameters):
+    """(table, parameters) identifying the rows a SELECT reads, ignoring its LIMIT/OFFSET values"""
+    match = SELECT_TABLE.match(statement)
+    if not match:
+        return None
+    tail = LIMIT_TAIL.search(statement)
+    if tail and parameters:
+        if isinstance(parameters, dict):
+            paging = set(NAMED_PLACEHOLDER.findall(tail.group()))
+            parameters = {k: v for k, v in parameters.items() if k not in paging}
+        else:
+            parameters = tuple(parameters)[:len(parameters) - len(POSITIONAL_PLACEHOLDER.findall(tail.group()))]
+    return match.group(1), repr(parameters)
+
+
+class RequestQueries:
+    """SQL statements and their durations issued while serving one request"""
+
+    def __init__(self):
+        self.durations = []
+        self.statements = StatementCounter()
+        self.reads = StatementCounter()
+
+    def record(self, statement, parameters, elapsed):
+        self.durations.append(elapsed)
+        self.statements[statement] += 1
+        key = _read_key(statement, parameters)
+        if key is not None:
+            self.reads[key] += 1
+            return
+        # Reading rows back after changing them is not a repeat
+        written = WRITE_TABLE.match(statement)
+        if written:
+            for key in [key for key in self.reads if key[0] == written.group(1)]:
+                del self.reads[key]
+
+
+_current_queries = ContextVar("current_queries", default=None)
+_service_name = "app"
+_instrumented_engines = set()
+# (route, pattern) pairs already logged; the counter keeps counting, the log stays quiet
+_reported = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    queries = _current_queries.get()
+    if queries is not None:
+        queries.record(statement, parameters, elapsed)
+    else:
+        QUERY_LATENCY.observe((_service_name, BACKGROUND_ROUTE), elapsed)
+
+
+def instrument_engine(engine):
+    """Time every statement executed through `engine`, a sync Engine or the Engine class itself"""
+    if id(engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(engine))
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_template(scope):
+    route = scope.get("route")
+    if route is not None:
+        path = scope["path"]
+        path_regex = getattr(route, "path_regex", None)
+        if path_regex is not None and not path_regex.match(path):
+            # A router included under a prefix can report its unprefixed route; put the prefix back
+            for i in range(1, len(path)):
+                if path[i] == "/" and path_regex.match(path[i:]):
+                    return path[:i] + route.path
+        return getattr(route, "path", UNMATCHED_ROUTE)
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request, including streamed bodies, and its SQL statements.
+
+    Routes are labelled by their template ("/{grade_id}"), not the raw path,
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, service):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        queries = RequestQueries()
+        token = _current_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_queries.reset(token)
+            self._record(scope, status_code, elapsed, queries)
+
+    def _record(self, scope, status_code, elapsed, queries):
+        route = _route_template(scope)
+        REQUEST_LATENCY.observe((self.service, scope["method"], route, str(status_code)), elapsed)
+        labels = (self.service, route)
+        QUERIES_PER_REQUEST.observe(labels, len(queries.durations))
+        for duration in queries.durations:
+            QUERY_LATENCY.observe(labels, duration)
+        if not queries.statements:
+            return
+        endpoint = f"{scope['method']} {route}"
+        statement, repeats = queries.statements.most_common(1)[0]
+        if repeats >= N_PLUS_ONE_THRESHOLD:
+            self._flag(labels, "repeated_statement", f"{endpoint} ran one statement {repeats} times: "
+                       f"{' '.join(statement.split())[:200]}")
+        reread = sorted({table for (table, _), count in queries.reads.items() if count > 1})
+        if reread:
+            self._flag(labels, "repeated_read", f"{endpoint} read the same rows more than once from {', '.join(reread)}")
+
+    def _flag(self, labels, pattern, message):
+        N_PLUS_ONE.inc(labels + (pattern,))
+        if (labels, pattern) not in _reported:
+            _reported.add((labels, pattern))
+            logger.warning(f"Possible N+1: {message}")
+
+
+@contextmanager
+def background_queries():
+    """Count the statements run inside as background work instead of the current request's.
+
+    For requests that keep querying while they are open, such as long-polls
+    and event streams: per request their statements would pile up for the
+    life of the connection and read as an N+1.
+    """
+    token = _current_queries.set(None)
+    try:
+        yield
+    finally:
+        _current_queries.reset(token)
+
+
+def count_coalesced(resource, outcome):
+    COALESCED_REQUESTS.inc((_service_name, resource, outcome))
+
+
+def _gauge_lines(name, documentation, kind, value, service):
+    return [
+        f"# HELP {name} {documentation}",
+        f"# TYPE {name} {kind}",
+        f"{name}{_labels(('service',), (service,))} {_number(value)}",
+    ]
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in (REQUEST_LATENCY, QUERY_LATENCY, QUERIES_PER_REQUEST, N_PLUS_ONE, COALESCED_REQUESTS):
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples():
+            lines.append(f"{metric.name}{suffix}{labels} {_number(value)}")
+
+    pool = database.pool_status()
+    for key, name, documentation, kind in (
+        ("size", "db_pool_size", "Base size of the connection pool", "gauge"),
+        ("checked_out", "db_pool_checked_out", "Connections currently checked out", "gauge"),
+        ("overflow", "db_pool_overflow", "Overflow connections currently open", "gauge"),
+        ("checkouts", "db_pool_checkouts_total", "Successful pool checkouts", "counter"),
+        ("timeouts", "db_pool_checkout_timeouts_total", "Pool checkouts that timed out", "counter"),
+    ):
+        if key in pool:
+            lines.extend(_gauge_lines(name, documentation, kind, pool[key], _service_name))
+
+    lanes = admission_controller.lanes
+    for name, documentation, kind, labelnames, samples in (
+        ("http_admission_in_flight", "Requests running, by cost class", "gauge", ("service", "cost"),
+         [((cost,), lane.active) for cost, lane in lanes.items()]),
+        ("http_admission_queue_depth", "Requests waiting for admission, by cost class", "gauge", ("service", "cost"),
+         [((cost,), lane.queued) for cost, lane in lanes.items()]),
+        ("http_admission_shed_total", "Requests answered 503 because the class's queue was full (queue_full) "
+         "or they waited past its deadline (deadline)", "counter", ("service", "cost", "reason"),
+         [((cost, reason), count) for cost, lane in lanes.items() for reason, count in lane.shed.items()]),
+    ):
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for values, value in samples:
+            lines.append(f"{name}{_labels(labelnames, (_service_name,) + values)} {_number(value)}")
+
+    stats = cache.stats()
+    for key, name, documentation in (
+        ("hits", "cache_hits_total", "Response cache hits"),
+        ("misses", "cache_misses_total", "Response cache misses"),
+        ("errors", "cache_errors_total", "Response cache backend errors"),
+    ):
+        lines.extend(_gauge_lines(name, documentation, "counter", stats[key], _service_name))
+    return "\n".join(lines) + "\n"
+
+
+def setup_metrics(app, service):
+    """Instrument `app` and the database engines, and serve GET /metrics"""
+    global _service_name
+    _service_name = service
+    # Class-level listeners cover the engines database.py creates on first use, async ones included
+    instrument_engine(Engine)
+    app.add_middleware(MetricsMiddleware, service=service)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
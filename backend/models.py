@@ -0,0 +1,96 @@
+# models.py
+"""ORM models for every table, shared by all services.
+
+Each table is declared once on the shared Base, so the student, course and
+grade routers can be imported into one process (see gateway/main.py). The
+per-service models modules re-export what they use.
+"""
+from sqlalchemy import (
+    BigInteger, Column, Integer, String, Date, DateTime, Float, Text, CheckConstraint, ForeignKey, Index, UniqueConstraint, text,
+)
+from sqlalchemy.orm import relationship
+from database import Base
+
+class Student(Base):
+    __tablename__ = "students"
+
+    student_id = Column(String(10), primary_key=True)
+    first_name = Column(String(50), nullable=False)
+    last_name = Column(String(50), nullable=False)
+    email = Column(String(100), unique=True, nullable=False)
+    date_of_birth = Column(Date, nullable=False)
+    address = Column(Text)
+    phone = Column(String(20))
+    enrollment_date = Column(Date, nullable=False, index=True)
+
+class Course(Base):
+    __tablename__ = "courses"
+
+    course_code = Column(String(10), primary_key=True)
+    name = Column(String(100), nullable=False)
+    department = Column(String(50), nullable=False, index=True)
+    credits = Column(Integer, nullable=False)
+    description = Column(Text)
+
+class Grade(Base):
+    __tablename__ = "grades"
+
+    # map the Python attr `grade_id` to the DB column `id`
+    grade_id = Column('id', Integer, primary_key=True, index=True)
+    student_id = Column(String, ForeignKey('students.student_id'), index=True, nullable=False)
+    course_code = Column(String, ForeignKey('courses.course_code'), index=True, nullable=False)
+    # map `grade_value` → column `grade`
+    grade_value = Column('grade', Integer, nullable=False)
+    semester = Column(String, nullable=False, index=True)
+    # map `grade_date` → column `date`
+    grade_date = Column('date', Date, nullable=False)
+
+    student = relationship("Student", foreign_keys=[student_id], lazy='select')
+    course = relationship("Course", foreign_keys=[course_code], lazy='select')
+
+    __table_args__ = (
+        CheckConstraint('grade >= 0 AND grade <= 100', name='check_grade_range'),
+        # Same name Postgres gives the UNIQUE clause in scripts.sql
+        UniqueConstraint('student_id', 'course_code', 'semester', name='grades_student_id_course_code_semester_key'),
+    )
+
+class StudentTranscript(Base):
+    """Read-optimised transcript document, maintained on every grade write"""
+    __tablename__ = "student_transcripts"
+    student_id = Column(String(10), ForeignKey('students.student_id', ondelete='CASCADE'), primary_key=True)
+    document = Column(Text, nullable=False)   # Serialized Transcript schema
+    gpa = Column(Float)
+    total_credits = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class CourseGradeRollup(Base):
+    """How many grades have each score, per course and semester; maintained on every grade write"""
+    __tablename__ = "course_grade_rollups"
+    course_code = Column(String(10), ForeignKey('courses.course_code', ondelete='CASCADE'), primary_key=True)
+    semester = Column(String(20), primary_key=True)
+    grade = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+class ChangeEvent(Base):
+    """One create, update or delete, written in the transaction that made it (see changes.py)"""
+    __tablename__ = "change_events"
+    # Insert order; SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # Feed position, assigned once the event is committed; NULL until then
+    seq = Column(BigInteger, unique=True)
+    resource = Column(String(20), nullable=False)
+    key = Column(String(50), nullable=False)
+    op = Column(String(10), nullable=False)
+    data = Column(Text)   # The resource's JSON document after the change; NULL for deletes
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_change_events_pending", "id", postgresql_where=text("seq IS NULL"), sqlite_where=text("seq IS NULL")),
+        Index("idx_change_events_key", "resource", "key", "seq"),
+    )
+
+class ChangeFeed(Base):
+    """Single row: the highest seq retention has removed from change_events"""
+    __tablename__ = "change_feed"
+    id = Column(Integer, primary_key=True)
+    horizon = Column(BigInteger, nullable=False)
@@ -0,0 +1,110 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import any_, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+import os
+
+# Page size limits for the list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Below this many rows an exact COUNT(*) is cheap enough to run instead of the planner estimate
+EXACT_COUNT_THRESHOLD = int(os.getenv("EXACT_COUNT_THRESHOLD", "100000"))
+
+# Most IDs a single batch lookup may ask for
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+
+# Search pages are ranked, not keyed, so they page by offset up to a fixed depth
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+MAX_SEARCH_PAGE_SIZE = int(os.getenv("MAX_SEARCH_PAGE_SIZE", "100"))
+MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "1000"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def keyset_paginate(query, key_column, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Return (rows, next_cursor) for one page of `query` ordered by `key_column`.
+
+    Seeks past `after` on the key instead of using OFFSET, so every page costs
+    one index range scan regardless of how deep into the table it is.
+    """
+    if after is not None:
+        query = query.filter(key_column > after)
+    rows = query.order_by(key_column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], key_column.key)
+    return rows, next_cursor
+
+
+def parse_offset_cursor(cursor):
+    """Offset encoded in a search cursor; 400 unless it is one this API could have issued"""
+    if cursor is None:
+        return 0
+    if not cursor.isdigit() or int(cursor) >= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return int(cursor)
+
+
+def next_offset_cursor(offset, limit, has_more):
+    """Cursor for the page after one starting at `offset`, or None past the last or deepest page"""
+    if not has_more or offset + limit >= MAX_SEARCH_RESULTS:
+        return None
+    return str(offset + limit)
+
+
+def count_rows(db, query, table_name, filtered):
+    """Count the rows matched by `query`.
+
+    Unfiltered counts on PostgreSQL use the planner's row estimate from
+    pg_class, falling back to an exact count for small or never-analyzed tables.
+    """
+    if not filtered and db.bind.dialect.name == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+            {"name": table_name},
+        ).scalar()
+        if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate
+    return query.order_by(None).count()
+
+
+def page_headers(next_cursor=None, total=None):
+    """Build the next-page cursor and optional total count response headers"""
+    headers = {}
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    if total is not None:
+        headers[TOTAL_COUNT_HEADER] = str(total)
+    return headers
+
+
+def set_page_headers(response: Response, next_cursor=None, total=None):
+    """Expose the next-page cursor and the optional total count as response headers"""
+    headers = page_headers(next_cursor, total)
+    response.headers.update(headers)
+    return headers
+
+
+def fetch_batch(db, query, key_column, ids):
+    """Return (rows, missing_ids) for the rows of `query` whose `key_column` is in `ids`.
+
+    Runs a single query no matter how many IDs are asked for. Rows come back
+    in the order of `ids` with duplicates dropped. On PostgreSQL the IDs are
+    bound as one array (`= ANY(:ids)`), so the statement text stays the same
+    for every batch size.
+    """
+    if len(ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per batch")
+    wanted = list(dict.fromkeys(ids))
+    if not wanted:
+        return [], []
+
+    if db.bind.dialect.name == "postgresql":
+        condition = key_column == any_(bindparam("batch_ids", wanted, type_=ARRAY(key_column.type)))
+    else:
+        condition = key_column.in_(wanted)
+    found = {getattr(row, key_column.key): row for row in query.filter(condition)}
+    return [found[i] for i in wanted if i in found], [i for i in wanted if i not in found]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Compare the per-row cost of the grade list read path before and after column rows + orjson.
+
+"orm" is the previous path: joinedload ORM objects, grade_to_dict, response_model
+validation and JSONResponse rendering. "columns" is the current path: one joined
+column select, grade_rows_to_dicts and serialization.dumps. Runs against in-memory
+SQLite so only Python-side cost is measured.
+
+Usage (from backend/): python scripts/bench_serialization.py [rows] [repeats]
+"""
+import os
+import sys
+import time
+from datetime import date
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from grade_service.main import grade_to_dict, grade_rows_to_dicts, grade_rows_query
+from grade_service.models import Grade, Student, Course
+from grade_service.schemas import GradeSchema
+from serialization import dumps
+
+
+def seed(session, rows):
+    students = [
+        Student(student_id=f"S{i:05d}", first_name="First", last_name=f"Last{i}", email=f"s{i}@example.edu",
+                date_of_birth=date(2000, 1, 1), enrollment_date=date(2020, 9, 1))
+        for i in range(max(rows // 10, 1))
+    ]
+    courses = [
+        Course(course_code=f"C{i:03d}", name=f"Course {i}", department="Engineering", credits=3,
+               description="Lorem ipsum dolor sit amet")
+        for i in range(50)
+    ]
+    session.add_all(students + courses)
+    session.add_all(
+        Grade(student_id=students[i % len(students)].student_id, course_code=courses[i % 50].course_code,
+              grade_value=50 + i % 50, semester=f"Fall {2000 + i}", grade_date=date(2023, 12, 15))
+        for i in range(rows)
+    )
+    session.commit()
+
+
+def orm_path(session, adapter):
+    grades = session.query(Grade).options(
+        joinedload(Grade.student),
+        joinedload(Grade.course)
+    ).order_by(Grade.grade_id).all()
+    data = [grade_to_dict(g) for g in grades]
+    validated = adapter.validate_python(data)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def columns_path(session, adapter):
+    rows = grade_rows_query(session).order_by(Grade.grade_id).all()
+    return dumps(grade_rows_to_dicts(session, rows))
+
+
+def best_of(fn, session, adapter, repeats):
+    timings = []
+    for _ in range(repeats):
+        session.expunge_all()
+        start = time.perf_counter()
+        body = fn(session, adapter)
+        timings.append(time.perf_counter() - start)
+    return min(timings), body
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, rows)
+    adapter = TypeAdapter(List[GradeSchema])
+
+    orm_time, orm_body = best_of(orm_path, session, adapter, repeats)
+    col_time, col_body = best_of(columns_path, session, adapter, repeats)
+    print(f"rows={rows} repeats={repeats} identical_bodies={orm_body == col_body}")
+    for name, elapsed in (("orm", orm_time), ("columns", col_time)):
+        print(f"{name:8s} {elapsed * 1000:9.2f} ms/page  {elapsed / rows * 1e6:7.2f} us/row")
+    print(f"speedup  {orm_time / col_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
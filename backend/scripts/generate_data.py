@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Generate a large, deterministic data set and bulk-load it into PostgreSQL.
+
+Faker rows are produced by a process pool in fixed-size chunks of students
+(each chunk carries that block of students' grades) and streamed in order
+into COPY FROM STDIN on one connection. Each chunk is seeded from --seed
+and its index, so the same arguments load the same rows whatever the
+worker count.
+
+The whole load is a single transaction: truncate, drop the indexes and
+constraints on students, courses and grades, COPY, recreate them, then
+ANALYZE. A failure anywhere rolls back to the previous data and schema.
+The course grade rollups are rebuilt afterwards.
+
+Usage (from backend/):
+    python scripts/generate_data.py --students 1000000 --grades-per-student 50 --workers 8
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+DEPARTMENTS = {
+    "CSC": "Computer Science", "MTH": "Mathematics", "PHY": "Physics", "CHM": "Chemistry",
+    "BIO": "Biology", "ENG": "Engineering", "BUS": "Business", "ECO": "Economics",
+    "PSY": "Psychology", "HIS": "History",
+}
+FIRST_YEAR = 2019
+LAST_YEAR = 2024
+TERM_ENDS = {"Spring": (5, 20), "Fall": (12, 15)}
+SEMESTERS = [f"{term} {year}" for year in range(FIRST_YEAR, LAST_YEAR + 1) for term in ("Spring", "Fall")]
+
+LOADED_TABLES = ("students", "courses", "grades")
+STUDENT_COLUMNS = "student_id, first_name, last_name, email, date_of_birth, address, phone, enrollment_date"
+COURSE_COLUMNS = "course_code, name, department, credits, description"
+GRADE_COLUMNS = "student_id, course_code, grade, semester, date"
+
+
+def copy_line(values):
+    """One row in COPY text format"""
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append("\\N")
+        else:
+            fields.append(str(value).replace("\\", "\\\\").replace("\t", "\\t")
+                          .replace("\n", "\\n").replace("\r", "\\r"))
+    return "\t".join(fields) + "\n"
+
+
+def _faker(seed):
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    return fake
+
+
+def student_id(number):
+    return f"S{number:07d}"
+
+
+def course_codes(count):
+    """Unique codes: department prefix plus a running number, e.g. CSC1000, MTH1001"""
+    prefixes = list(DEPARTMENTS)
+    return [f"{prefixes[i % len(prefixes)]}{1000 + i}" for i in range(count)]
+
+
+def generate_courses(seed, count):
+    fake = _faker(seed)
+    buffer = io.StringIO()
+    for code in course_codes(count):
+        buffer.write(copy_line((
+            code, fake.catch_phrase()[:100], DEPARTMENTS[code[:3]], fake.random_int(3, 6),
+            fake.text(max_nb_chars=200),
+        )))
+    return buffer.getvalue().encode()
+
+
+_chunk_settings = {}
+
+
+def _init_worker(seed, codes, grades_per_student):
+    _chunk_settings.update(seed=seed, codes=codes, grades_per_student=grades_per_student)
+
+
+def generate_chunk(bounds):
+    """COPY data for students [start, stop) and their grades: (students, grades, grade count)"""
+    start, stop = bounds
+    seed, codes, per_student = (_chunk_settings[k] for k in ("seed", "codes", "grades_per_student"))
+    # Seeded by position, not by worker, so output does not depend on --workers
+    fake = _faker(seed * 1_000_003 + start)
+    rng = random.Random(seed * 1_000_003 + start)
+    students = io.StringIO()
+    grades = io.StringIO()
+    grade_count = 0
+    for number in range(start, stop):
+        first, last = fake.first_name(), fake.last_name()
+        enrolled_year = rng.randint(FIRST_YEAR, LAST_YEAR)
+        sid = student_id(number)
+        students.write(copy_line((
+            sid, first, last,
+            # Numbered, so unique without cross-process coordination
+            f"{first}.{last}.{number}@example.edu".lower(),
+            date(enrolled_year - rng.randint(18, 25), 1, 1) + timedelta(days=rng.randrange(365)),
+            fake.address(), fake.numerify("###-###-####"),
+            date(enrolled_year, 9, 1) - timedelta(days=rng.randrange(30)),
+        )))
+        terms = [s for s in SEMESTERS if int(s.split()[1]) >= enrolled_year] or SEMESTERS[-1:]
+        taken = rng.randint(per_student - per_student // 2, per_student + per_student // 2)
+        for code in rng.sample(codes, min(taken, len(codes))):
+            semester = rng.choice(terms)
+            term, year = semester.split()
+            month, day = TERM_ENDS[term]
+            grades.write(copy_line((
+                sid, code, max(0, min(100, round(rng.gauss(74, 12)))), semester, date(int(year), month, day),
+            )))
+            grade_count += 1
+    return students.getvalue().encode(), grades.getvalue().encode(), grade_count
+
+
+def _copy(cursor, table, columns, data):
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", io.BytesIO(data))
+
+
+def capture_schema(cursor):
+    """(constraints, indexes) on the loaded tables and on foreign keys pointing at them, as DDL"""
+    cursor.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid), contype
+        FROM pg_constraint
+        WHERE contype IN ('p', 'u', 'f')
+          AND (conrelid::regclass::text = ANY(%(tables)s) OR confrelid::regclass::text = ANY(%(tables)s))
+    """, {"tables": list(LOADED_TABLES)})
+    # Primary and unique keys first on the way back, since foreign keys depend on them
+    constraints = sorted(cursor.fetchall(), key=lambda c: c[3] == "f")
+    cursor.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid::regclass::text = ANY(%(tables)s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, {"tables": list(LOADED_TABLES)})
+    return constraints, cursor.fetchall()
+
+
+def drop_schema(cursor, constraints, indexes):
+    for table, name, _, _ in reversed(constraints):
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+
+
+def restore_schema(cursor, constraints, indexes):
+    for table, name, definition, _ in constraints:
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+    for _, definition in indexes:
+        cursor.execute(definition)
+
+
+def report(name, start, rows=None):
+    """Print a phase's duration and throughput; returns the start time for the next phase"""
+    elapsed = time.perf_counter() - start
+    rate = f"  {rows / elapsed:,.0f} rows/s" if rows and elapsed else ""
+    print(f"{name:24s} {elapsed:9.1f} s{rate}", flush=True)
+    return time.perf_counter()
+
+
+def load(conn, args):
+    cursor = conn.cursor()
+    cursor.execute(f"SET LOCAL maintenance_work_mem = '{args.maintenance_work_mem}'")
+    started = t = time.perf_counter()
+
+    constraints, indexes = capture_schema(cursor)
+    cursor.execute("TRUNCATE student_transcripts, course_grade_rollups, grades, students, courses "
+                   "RESTART IDENTITY CASCADE")
+    if not args.keep_indexes:
+        drop_schema(cursor, constraints, indexes)
+    t = report("truncate + drop indexes", t)
+
+    codes = course_codes(args.courses)
+    _copy(cursor, "courses", COURSE_COLUMNS, generate_courses(args.seed, args.courses))
+    t = report("courses", t, args.courses)
+
+    chunks = [(start, min(start + args.chunk_size, args.students))
+              for start in range(0, args.students, args.chunk_size)]
+    students_loaded = grades_loaded = 0
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.workers, initializer=_init_worker,
+                      initargs=(args.seed, codes, args.grades_per_student)) as pool:
+        # A bounded window of chunks in flight: workers stay busy without outrunning COPY in memory,
+        # and chunks are written in order, so rows (and grade ids) land the same way on every run
+        remaining = iter(chunks)
+        pending = deque()
+
+        def submit():
+            bounds = next(remaining, None)
+            if bounds is not None:
+                pending.append((bounds, pool.apply_async(generate_chunk, (bounds,))))
+
+        for _ in range(args.workers * 2):
+            submit()
+        while pending:
+            (start, stop), result = pending.popleft()
+            students, grades, grade_count = result.get()
+            submit()
+            _copy(cursor, "students", STUDENT_COLUMNS, students)
+            _copy(cursor, "grades", GRADE_COLUMNS, grades)
+            students_loaded += stop - start
+            grades_loaded += grade_count
+            elapsed = time.perf_counter() - t
+            print(f"  {students_loaded:,} students, {grades_loaded:,} grades "
+                  f"({(students_loaded + grades_loaded) / elapsed:,.0f} rows/s)", flush=True)
+    t = report("students + grades", t, students_loaded + grades_loaded)
+
+    if not args.keep_indexes:
+        restore_schema(cursor, constraints, indexes)
+        t = report("recreate indexes", t)
+    cursor.execute(f"ANALYZE {', '.join(LOADED_TABLES)}")
+    t = report("analyze", t)
+    conn.commit()
+    total_rows = args.courses + students_loaded + grades_loaded
+    report("total load", started, total_rows)
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load generated students, courses and grades")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--grades-per-student", type=int, default=10, help="average; each student varies by half")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=10000, help="students per generated chunk")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"),
+                        help="defaults to $DATABASE_URL, else the DB_* settings in database.py")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="load with indexes and constraints in place (slower, for comparison)")
+    parser.add_argument("--maintenance-work-mem", default="1GB", help="memory for rebuilding indexes")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    import psycopg2
+    from database import DATABASE_URL, SessionLocal
+    from grade_service.rollups import rebuild_rollups
+
+    if not DATABASE_URL.startswith("postgresql"):
+        parser.error("COPY needs PostgreSQL; use `python -m bench seed` for SQLite")
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        load(conn, args)
+    finally:
+        conn.close()
+
+    start = time.perf_counter()
+    session = SessionLocal()
+    try:
+        written = rebuild_rollups(session)
+        session.commit()
+    finally:
+        session.close()
+    report("rollups", start, written)
+
+
+if __name__ == "__main__":
+    main()
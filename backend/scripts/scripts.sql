@@ -30,8 +30,59 @@ CREATE TABLE grades (
     UNIQUE(student_id, course_code, semester)
 );
 
+-- Create Transcripts Table (precomputed per student, refreshed on grade writes)
+CREATE TABLE student_transcripts (
+    student_id VARCHAR(10) PRIMARY KEY REFERENCES students(student_id) ON DELETE CASCADE,
+    document TEXT NOT NULL,
+    gpa DOUBLE PRECISION,
+    total_credits INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+-- Create Course Grade Rollups Table (grade counts per course, semester and score, updated on grade writes)
+CREATE TABLE course_grade_rollups (
+    course_code VARCHAR(10) REFERENCES courses(course_code) ON DELETE CASCADE,
+    semester VARCHAR(20) NOT NULL,
+    grade INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (course_code, semester, grade)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_student_id ON students(student_id);
 CREATE INDEX idx_course_code ON courses(course_code);
 CREATE INDEX idx_grade_student ON grades(student_id);
-CREATE INDEX idx_grade_course ON grades(course_code);
\ No newline at end of file
+CREATE INDEX idx_grade_course ON grades(course_code);
+CREATE INDEX idx_student_enrollment_date ON students(enrollment_date);
+CREATE INDEX idx_course_department ON courses(department);
+CREATE INDEX idx_grade_semester ON grades(semester);
+
+-- Search indexes (student_service/search.py and course_service/search.py query these exact expressions)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_student_search_trgm ON students
+    USING gin (lower(first_name || ' ' || last_name || ' ' || email) gin_trgm_ops);
+-- Prefixes of one or two characters, which the trigram index cannot serve
+CREATE INDEX idx_student_last_name_prefix ON students (lower(last_name) text_pattern_ops);
+CREATE INDEX idx_student_first_name_prefix ON students (lower(first_name) text_pattern_ops);
+CREATE INDEX idx_course_search_tsv ON courses
+    USING gin ((setweight(to_tsvector('english', name), 'A') || setweight(to_tsvector('english', coalesce(description, '')), 'B')));
+
+-- Create Change Events Table (outbox written with every create, update and delete; served by /changes)
+CREATE TABLE change_events (
+    id BIGSERIAL PRIMARY KEY,
+    seq BIGINT UNIQUE,
+    resource VARCHAR(20) NOT NULL,
+    key VARCHAR(50) NOT NULL,
+    op VARCHAR(10) NOT NULL,
+    data TEXT,
+    created_at TIMESTAMP NOT NULL
+);
+CREATE INDEX idx_change_events_pending ON change_events(id) WHERE seq IS NULL;
+CREATE INDEX idx_change_events_key ON change_events(resource, key, seq);
+
+-- Create Change Feed Table (one row: the highest seq retention has removed)
+CREATE TABLE change_feed (
+    id INTEGER PRIMARY KEY,
+    horizon BIGINT NOT NULL
+);
+INSERT INTO change_feed (id, horizon) VALUES (1, 0);
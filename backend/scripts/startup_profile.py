@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Measure how long each service app takes to start, and where the time goes.
+
+Each app is imported in a fresh interpreter, as a new pod would, followed by
+mapper configuration: the work done before the first request, minus
+connecting to the database (see GET /ready for that on a running pod). The
+best of --repeats runs is compared with --budget-ms. One extra run with
+`-X importtime` attributes the import time to top-level packages.
+
+Exits 1 when an app is over budget or creates its database engine at import.
+
+Usage (from backend/):
+    python scripts/startup_profile.py [app ...] [--budget-ms 1000] [--repeats 3] [--top 10]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APPS = ["student_service.main", "course_service.main", "grade_service.main", "gateway.main"]
+
+# Runs in the child: import the app, configure mappers, report, and exit without interpreter teardown
+CHILD = """
+import importlib, json, os, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+from sqlalchemy.orm import configure_mappers
+configure_mappers()
+configured = time.perf_counter()
+import database
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "mappers_ms": (configured - imported) * 1000,
+    "engine_at_import": "engine" in vars(database),
+}), flush=True)
+os._exit(0)
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run_child(app, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD, app]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=BACKEND, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode:
+        sys.exit(f"{app} failed to start:\n{result.stderr}")
+    return elapsed, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def import_breakdown(stderr):
+    """Self import time in ms per top-level package, largest first"""
+    by_package = defaultdict(float)
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            by_package[match.group(4).split(".")[0]] += int(match.group(1)) / 1000
+    return sorted(by_package.items(), key=lambda item: -item[1])
+
+
+def profile(app, repeats):
+    runs = [run_child(app) for _ in range(repeats)]
+    startup_ms, child, _ = min(runs, key=lambda run: run[0])
+    _, _, stderr = run_child(app, importtime=True)
+    return {"app": app, "startup_ms": startup_ms, **child, "packages": import_breakdown(stderr)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time per service app, against a budget")
+    parser.add_argument("apps", nargs="*", default=APPS)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1000")),
+                        help="process start to app ready for its first request, per app")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="packages listed per app")
+    args = parser.parse_args()
+
+    failed = []
+    for app in args.apps:
+        result = profile(app, args.repeats)
+        over = result["startup_ms"] > args.budget_ms
+        print(f"{app}: {result['startup_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)"
+              f"{'  OVER BUDGET' if over else ''}")
+        print(f"  import {result['import_ms']:.0f} ms, mappers {result['mappers_ms']:.1f} ms")
+        total = sum(ms for _, ms in result["packages"]) or 1
+        for package, ms in result["packages"][:args.top]:
+            print(f"  {package:28s} {ms:8.1f} ms  {ms / total:5.1%}")
+        if result["engine_at_import"]:
+            print("  database engine created at import; it should be created on first use")
+        if over or result["engine_at_import"]:
+            failed.append(app)
+    if failed:
+        sys.exit(f"failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
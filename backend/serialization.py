@@ -0,0 +1,28 @@
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt, this keeps dev setups working
+    orjson = None
+
+
+def dumps(content):
+    """Encode `content` to JSON bytes, identical to FastAPI's JSONResponse output.
+
+    Values must already be JSON-native or dates/datetimes (which both encoders
+    render as ISO 8601). orjson is used when installed; the stdlib fallback
+    uses the same compact, non-ASCII-escaping settings as JSONResponse.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def json_response(content, status_code=200, headers=None):
+    """Return pre-encoded JSON, bypassing response_model re-validation"""
+    body = content if isinstance(content, bytes) else dumps(content)
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
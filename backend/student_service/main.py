@@ -1,65 +1,291 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Depends
-from typing import List
-from sqlalchemy.orm import Session
-from student_service.schemas import Student as StudentSchema, StudentCreate, StudentUpdate
+from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Query, Request
+from typing import List, Literal, Optional
+from datetime import date
+from sqlalchemy import select, text
+from student_service.schemas import (
+    Student as StudentSchema, StudentCreate, StudentUpdate, StudentBatchRequest, StudentBatch,
+)
 from student_service.models import Student
-from database import get_db
+from student_service import search
+from database import (
+    DBSession, ReadDBSession, ReadYourWritesMiddleware, get_db_session, get_read_db_session, pool_status,
+)
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE,
+    keyset_paginate, count_rows, page_headers, fetch_batch, parse_offset_cursor, next_offset_cursor,
+)
+from cache import cache
+from serialization import dumps, json_response
+from conditional import check_not_modified, validators
+from coalesce import coalesced
+from fieldsets import parse_fieldset, schema_fields
+from admission import AdmissionRoute, cost_class, setup_admission
+from changes import (
+    CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE, CHANGES_MAX_WAIT, append_change, changes_response, setup_changes,
+)
+from metrics import setup_metrics
+from health import setup_health
+from compression import setup_compression
 
 app = FastAPI()
-router = APIRouter(tags=["students"])
+setup_metrics(app, "student-service")
+setup_health(app, "student-service")
+setup_changes(app)
+setup_admission(app)
+app.add_middleware(ReadYourWritesMiddleware)
+setup_compression(app)
+router = APIRouter(tags=["students"], route_class=AdmissionRoute)
+
+# Columns in Student schema field order; read paths select these instead of hydrating ORM objects
+STUDENT_COLUMNS = [
+    Student.student_id, Student.first_name, Student.last_name, Student.email,
+    Student.date_of_birth, Student.address, Student.phone, Student.enrollment_date,
+]
+STUDENT_FIELDS = [c.key for c in STUDENT_COLUMNS]
+STUDENT_FIELD_COLUMNS = dict(zip(STUDENT_FIELDS, STUDENT_COLUMNS))
+
+def student_fieldset(fields):
+    """Columns to select and a row -> response dict function for ?fields=, checked against StudentSchema.
+
+    student_id is always selected: keyset pages and batch lookups key on it.
+    """
+    names = parse_fieldset(fields, schema_fields(StudentSchema))
+    if names is None:
+        return STUDENT_COLUMNS, lambda row: dict(zip(STUDENT_FIELDS, row))
+    keys = ["student_id"] + [name for name in names if name != "student_id"]
+    return [STUDENT_FIELD_COLUMNS[key] for key in keys], lambda row: {
+        key: value for key, value in zip(keys, row) if key in names
+    }
+
+def student_to_dict(student):
+    """Convert Student SQLAlchemy object to a response dictionary"""
+    return {
+        "student_id": student.student_id,
+        "first_name": student.first_name,
+        "last_name": student.last_name,
+        "email": student.email,
+        "date_of_birth": student.date_of_birth,
+        "address": student.address,
+        "phone": student.phone,
+        "enrollment_date": student.enrollment_date,
+    }
+
+async def invalidate_student(student_id=None):
+    """Drop cached student lists and, if given, the entry for one student"""
+    tags = ["students:list"]
+    if student_id:
+        tags.append(f"students:{student_id}")
+    # Bumped first: a read that loaded before the write then fails to store, see cache.store
+    await cache.bump("students")
+    await cache.invalidate(*tags)
+    search.fallback_index.invalidate()
 
 @router.get("/", response_model=List[StudentSchema])
-def list_students(db: Session = Depends(get_db)):
-    students = db.query(Student).all()
-    # Explicitly convert SQLAlchemy models to dictionaries
-    students_data = []
-    for student in students:
-        students_data.append({
-            "student_id": student.student_id,
-            "first_name": student.first_name,
-            "last_name": student.last_name,
-            "email": student.email,
-            "date_of_birth": student.date_of_birth,
-            "address": student.address,
-            "phone": student.phone,
-            "enrollment_date": student.enrollment_date,
-        })
-    return students_data
+async def list_students(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Return students with student_id after this cursor"),
+    enrolled_from: Optional[date] = Query(None),
+    enrolled_to: Optional[date] = Query(None),
+    include_total: bool = Query(False),
+    fields: Optional[str] = Query(None, description="Comma-separated Student fields to return, e.g. first_name,last_name"),
+    db: ReadDBSession = Depends(get_read_db_session),
+):
+    columns, to_dict = student_fieldset(fields)
+    etag, not_modified = await check_not_modified(request, "students", "students")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("students", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("students", etag))
+        return cached
+
+    def load(session):
+        q = session.query(*columns)
+        if enrolled_from:
+            q = q.filter(Student.enrollment_date >= enrolled_from)
+        if enrolled_to:
+            q = q.filter(Student.enrollment_date <= enrolled_to)
+
+        total = None
+        if include_total:
+            total = count_rows(session, q, Student.__tablename__, filtered=bool(enrolled_from or enrolled_to))
+        rows, next_cursor = keyset_paginate(q, Student.student_id, after, limit)
+        return [to_dict(row) for row in rows], next_cursor, total
+
+    async def build(db):
+        students_data, next_cursor, total = await db.run(load)
+        headers = page_headers(next_cursor, total)
+        body = dumps(students_data)
+        await cache.store(cache_key, body, "students", tags=["students:list"], headers=headers)
+        return body, headers
+
+    body, headers = await coalesced("students", cache_key, db, build)
+    return json_response(body, headers={**headers, **validators("students", etag)})
+
+@router.get("/export")
+@cost_class("stream")
+async def export_students(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    enrolled_from: Optional[date] = Query(None),
+    enrolled_to: Optional[date] = Query(None),
+):
+    """Stream every matching student as NDJSON or CSV"""
+    statement = select(Student.__table__).order_by(Student.student_id)
+    if enrolled_from:
+        statement = statement.where(Student.enrollment_date >= enrolled_from)
+    if enrolled_to:
+        statement = statement.where(Student.enrollment_date <= enrolled_to)
+    from export import export_response  # rarely used; kept out of startup
+
+    return export_response(statement, fmt, "students")
+
+@router.get("/search", response_model=List[StudentSchema])
+async def search_students(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    mode: Literal["match", "prefix"] = Query("match", description="prefix for autocomplete as the user types"),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated Student fields to return, e.g. first_name,last_name"),
+    db: ReadDBSession = Depends(get_read_db_session),
+):
+    """Match names and emails, best matches first"""
+    offset = parse_offset_cursor(cursor)
+    columns, to_dict = student_fieldset(fields)
+    etag, not_modified = await check_not_modified(request, "students", "students")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("students", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("students", etag))
+        return cached
+
+    def load(session):
+        rows, has_more = search.search_students(session, columns, q, mode, limit, offset)
+        return [to_dict(row) for row in rows], next_offset_cursor(offset, limit, has_more)
+
+    async def build(db):
+        students_data, next_cursor = await db.run(load)
+        headers = page_headers(next_cursor)
+        body = dumps(students_data)
+        await cache.store(cache_key, body, "students", tags=["students:list"], headers=headers)
+        return body, headers
+
+    body, headers = await coalesced("students", cache_key, db, build)
+    return json_response(body, headers={**headers, **validators("students", etag)})
+
+@router.get("/changes")
+@cost_class(None)
+async def student_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="`next` from the previous call; omit to get the current head"),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=CHANGES_MAX_WAIT, description="Seconds to wait for an event when there is none yet"),
+):
+    """Student creates, updates and deletes after `since`, as a JSON page, a long-poll or Server-Sent Events"""
+    return await changes_response(request, ["students"], since, limit, wait)
+
+@router.post("/batch", response_model=StudentBatch)
+@cost_class("point")
+async def get_students_batch(batch: StudentBatchRequest, db: ReadDBSession = Depends(get_read_db_session)):
+    """Fetch many students in one query, in request order, listing the IDs that do not exist"""
+    def load(session):
+        rows, missing = fetch_batch(session, session.query(*STUDENT_COLUMNS), Student.student_id, batch.ids)
+        return {"items": [dict(zip(STUDENT_FIELDS, row)) for row in rows], "missing": missing}
+
+    return json_response(await db.run(load))
 
 @router.post("/", response_model=StudentSchema, status_code=status.HTTP_201_CREATED)
-def create_student(student: StudentCreate, db: Session = Depends(get_db)):
-    db_student = Student(**student.model_dump())
-    db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
-    return db_student
+async def create_student(student: StudentCreate, db: DBSession = Depends(get_db_session)):
+    def create(session):
+        db_student = Student(**student.model_dump())
+        session.add(db_student)
+        session.flush()
+        student_data = student_to_dict(db_student)
+        append_change(session, "students", db_student.student_id, "create", student_data)
+        session.commit()
+        return student_data
+
+    student_data = await db.run(create)
+    await invalidate_student()
+    return student_data
 
 @router.get("/{student_id}", response_model=StudentSchema)
-def get_student(student_id: str, db: Session = Depends(get_db)):
-    student = db.query(Student).filter(Student.student_id == student_id).first()
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    return student
+async def get_student(
+    student_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated Student fields to return, e.g. first_name,last_name"),
+    db: ReadDBSession = Depends(get_read_db_session),
+):
+    columns, to_dict = student_fieldset(fields)
+    etag, not_modified = await check_not_modified(request, "students", "students")
+    if not_modified is not None:
+        return not_modified
+    cache_key = cache.key_for("students", request)
+    cached = await cache.lookup(cache_key)
+    if cached is not None:
+        cached.headers.update(validators("students", etag))
+        return cached
+
+    def load(session):
+        row = session.query(*columns).filter(Student.student_id == student_id).first()
+        return to_dict(row) if row else None
+
+    async def build(db):
+        student_data = await db.run(load)
+        if not student_data:
+            raise HTTPException(status_code=404, detail="Student not found")
+        body = dumps(student_data)
+        await cache.store(cache_key, body, "students", tags=[f"students:{student_id}"])
+        return body
+
+    body = await coalesced("students", cache_key, db, build)
+    return json_response(body, headers=validators("students", etag))
 
 @router.put("/{student_id}", response_model=StudentSchema)
-def update_student(student_id: str, student: StudentUpdate, db: Session = Depends(get_db)):
-    db_student = db.query(Student).filter(Student.student_id == student_id).first()
-    if not db_student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    for key, value in student.model_dump(exclude_unset=True).items():
-        setattr(db_student, key, value)
-    db.commit()
-    db.refresh(db_student)
-    return db_student
+async def update_student(student_id: str, student: StudentUpdate, db: DBSession = Depends(get_db_session)):
+    def update(session):
+        db_student = session.query(Student).filter(Student.student_id == student_id).first()
+        if not db_student:
+            raise HTTPException(status_code=404, detail="Student not found")
+        for key, value in student.model_dump(exclude_unset=True).items():
+            setattr(db_student, key, value)
+        # The grade service builds the transcript per read until the student's next grade write
+        session.execute(text("DELETE FROM student_transcripts WHERE student_id = :student_id"),
+                        {"student_id": student_id})
+        student_data = student_to_dict(db_student)
+        append_change(session, "students", student_id, "update", student_data)
+        session.commit()
+        return student_data
+
+    student_data = await db.run(update)
+    await invalidate_student(student_id)
+    return student_data
 
 @router.delete("/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_student(student_id: str, db: Session = Depends(get_db)):
-    student = db.query(Student).filter(Student.student_id == student_id).first()
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    db.delete(student)
-    db.commit()
+async def delete_student(student_id: str, db: DBSession = Depends(get_db_session)):
+    def delete(session):
+        student = session.query(Student).filter(Student.student_id == student_id).first()
+        if not student:
+            raise HTTPException(status_code=404, detail="Student not found")
+        session.delete(student)
+        append_change(session, "students", student_id, "delete")
+        session.commit()
+
+    await db.run(delete)
+    await invalidate_student(student_id)
     return
 
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+@app.get("/db/pool")
+def db_pool():
+    return pool_status()
+
 # Mount the router
 app.include_router(router)
\ No newline at end of file
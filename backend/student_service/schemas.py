@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 class StudentBase(BaseModel):
     student_id: str
@@ -24,4 +24,11 @@ class StudentUpdate(BaseModel):
 
 class Student(StudentBase):
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class StudentBatchRequest(BaseModel):
+    ids: List[str]
+
+class StudentBatch(BaseModel):
+    items: List[Student]
+    missing: List[str]
@@ -0,0 +1,64 @@
+# student_service/search.py
+"""Name and email search over students.
+
+On PostgreSQL this runs against the pg_trgm index from scripts.sql
+(idx_student_search_trgm); the expression below must stay identical to the
+indexed one or the planner falls back to a sequential scan. Prefixes too
+short to hold a trigram match name starts only, through the lower(last_name)
+and lower(first_name) text_pattern_ops indexes. Other databases (SQLite in
+tests) use an in-process TrigramIndex instead.
+"""
+from sqlalchemy import func, literal_column, or_, text
+
+from student_service.models import Student
+from pagination import fetch_batch
+from trigram_index import SIMILARITY_THRESHOLD, TrigramIndex, like_prefix
+
+# Literal separators keep the expression matchable against the index even with server-side binds
+SEARCH_TEXT = func.lower(
+    Student.first_name + literal_column("' '") + Student.last_name + literal_column("' '") + Student.email
+)
+
+def _load_entries(session):
+    rows = session.query(
+        Student.student_id, Student.first_name, Student.last_name, Student.email
+    ).order_by(Student.student_id)
+    return [(student_id, [f"{first} {last}", last, first, email]) for student_id, first, last, email in rows]
+
+# pg_trgm extracts no trigram from a shorter LIKE prefix, so the GIN index cannot serve it
+MIN_TRIGRAM_PREFIX = 3
+
+fallback_index = TrigramIndex(_load_entries)
+
+def search_students(session, columns, q, mode, limit, offset):
+    """One page of matching student rows, best first, and whether more follow"""
+    if session.bind.dialect.name != "postgresql":
+        ids, has_more = fallback_index.search(session, q, mode, limit, offset)
+        rows, _ = fetch_batch(session, session.query(*columns), Student.student_id, ids)
+        return rows, has_more
+
+    query = session.query(*columns)
+    if mode == "prefix":
+        pattern = like_prefix(q)
+        last_name_match = func.lower(Student.last_name).like(pattern, escape="\\")
+        first_name_match = func.lower(Student.first_name).like(pattern, escape="\\")
+        if len(q.strip()) < MIN_TRIGRAM_PREFIX:
+            # Anchored at the start of the first or last name, two btree range scans
+            query = query.filter(or_(last_name_match, first_name_match))
+        else:
+            # Anchored at the start of any word: first name, last name or email
+            query = query.filter(or_(SEARCH_TEXT.like(pattern, escape="\\"), SEARCH_TEXT.like("% " + pattern, escape="\\")))
+        query = query.order_by(
+            last_name_match.desc(), first_name_match.desc(),
+            Student.last_name, Student.first_name, Student.student_id,
+        )
+    else:
+        # Transaction-scoped, so safe behind a transaction-pooling PgBouncer
+        session.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                        {"threshold": str(SIMILARITY_THRESHOLD)})
+        needle = q.lower()
+        query = query.filter(SEARCH_TEXT.op("%>")(needle)).order_by(
+            func.word_similarity(needle, SEARCH_TEXT).desc(), Student.student_id
+        )
+    rows = query.offset(offset).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
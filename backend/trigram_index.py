@@ -0,0 +1,84 @@
+import os
+import re
+import threading
+
+# Minimum word similarity for "match" searches, here and in pg_trgm
+SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.3"))
+
+WORD = re.compile(r"[^\W_]+")
+
+
+def words(text):
+    return WORD.findall((text or "").lower())
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word lower-cased and padded with two leading and one trailing space"""
+    grams = set()
+    for word in words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """In-process search index for databases without pg_trgm, i.e. SQLite in tests.
+
+    `loader(session)` returns (key, [field, ...]) for every searchable row and
+    is called again on the first search after `invalidate()`. "match" ranks
+    rows by the share of the query's trigrams they contain, like pg_trgm's
+    word_similarity; "prefix" finds rows where a whole field starts with the
+    query or every query word starts a word of one field, earlier fields
+    ranking first.
+    """
+
+    def __init__(self, loader, threshold=SIMILARITY_THRESHOLD):
+        self._loader = loader
+        self._threshold = threshold
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+
+    def _load(self, session):
+        with self._lock:
+            if self._entries is None:
+                self._entries = []
+                for key, fields in self._loader(session):
+                    fields = [(f or "").lower() for f in fields]
+                    self._entries.append((key, [(f, words(f)) for f in fields], trigrams(" ".join(fields))))
+            return self._entries
+
+    def search(self, session, q, mode, limit, offset=0):
+        """Return (keys ranked best first, has_more) for one page of results"""
+        entries = self._load(session)
+        q = q.strip().lower()
+        scored = []
+        if mode == "prefix":
+            terms = words(q)
+            for key, fields, _ in entries:
+                for position, (field, field_words) in enumerate(fields):
+                    if field.startswith(q) or terms and all(
+                        any(w.startswith(t) for w in field_words) for t in terms
+                    ):
+                        scored.append((position, key))
+                        break
+        else:
+            query_grams = trigrams(q)
+            if not query_grams:
+                return [], False
+            for key, _, grams in entries:
+                score = len(query_grams & grams) / len(query_grams)
+                if score >= self._threshold:
+                    scored.append((-score, key))
+        scored.sort()
+        page = scored[offset:offset + limit + 1]
+        return [key for _, key in page[:limit]], len(page) > limit
+
+
+def like_prefix(q):
+    """Lower-cased LIKE pattern matching strings that start with `q`, escaping wildcards with a backslash"""
+    escaped = q.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
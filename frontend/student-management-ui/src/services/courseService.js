@@ -1,13 +1,13 @@
 import axios from 'axios';
 import endpoints from '../utils/api-config';
+import { getAllPages } from './pagination';
 
 // Course service functions
 const courseService = {
   // Get all courses
   getAllCourses: async () => {
     try {
-      const response = await axios.get(endpoints.courses.getAll);
-      return response.data;
+      return await getAllPages(endpoints.courses.getAll);
     } catch (error) {
       console.error('Error fetching courses:', error);
       throw error;
@@ -1,12 +1,12 @@
 import axios from 'axios';
 import endpoints from '../utils/api-config';
+import { getAllPages } from './pagination';
 
 // Grade service functions
 const gradeService = {  // Get all grades
   getAllGrades: async () => {
     try {
-      const response = await axios.get(endpoints.grades.getAll);
-      return response.data;
+      return await getAllPages(endpoints.grades.getAll);
     } catch (error) {
       console.error('Error fetching grades:', error);
       throw error;
@@ -26,8 +26,7 @@ const gradeService = {  // Get all grades
   // Get grades by student ID
   getGradesByStudentId: async (studentId) => {
     try {
-      const response = await axios.get(endpoints.grades.getByStudentId(studentId));
-      return response.data;
+      return await getAllPages(endpoints.grades.getByStudentId(studentId));
     } catch (error) {
       console.error(`Error fetching grades for student ${studentId}:`, error);
       throw error;
@@ -48,8 +47,7 @@ const gradeService = {  // Get all grades
   // Get grades by course code
   getGradesByCourseCode: async (courseCode) => {
     try {
-      const response = await axios.get(endpoints.grades.getByCourseCode(courseCode));
-      return response.data;
+      return await getAllPages(endpoints.grades.getByCourseCode(courseCode));
     } catch (error) {
       console.error(`Error fetching grades for course ${courseCode}:`, error);
       throw error;
@@ -59,10 +57,9 @@ const gradeService = {  // Get all grades
   // Get grades by student ID and course code
   getGradesByStudentAndCourse: async (studentId, courseCode) => {
     try {
-      const response = await axios.get(
+      return await getAllPages(
         endpoints.grades.getByStudentAndCourse(studentId, courseCode)
       );
-      return response.data;
     } catch (error) {
       console.error(`Error fetching grades for student ${studentId} and course ${courseCode}:`, error);
       throw error;
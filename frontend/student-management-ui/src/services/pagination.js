@@ -0,0 +1,14 @@
+import axios from 'axios';
+
+// List endpoints return one page at a time; X-Next-Cursor is the `after`
+// value for the next page and is absent on the last one.
+export const getAllPages = async (url) => {
+  const items = [];
+  let after = null;
+  do {
+    const response = await axios.get(url, { params: after === null ? {} : { after } });
+    items.push(...response.data);
+    after = response.headers['x-next-cursor'] ?? null;
+  } while (after !== null);
+  return items;
+};
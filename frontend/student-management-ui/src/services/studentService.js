@@ -1,13 +1,13 @@
 import axios from 'axios';
 import endpoints from '../utils/api-config';
+import { getAllPages } from './pagination';
 
 // Student service functions
 const studentService = {
   // Get all students
   getAllStudents: async () => {
     try {
-      const response = await axios.get(endpoints.students.getAll);
-      return response.data;
+      return await getAllPages(endpoints.students.getAll);
     } catch (error) {
       console.error('Error fetching students:', error);
       throw error;
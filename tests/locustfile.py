@@ -83,7 +83,35 @@ class StudentManagementUser(HttpUser):
             # If you intended to get all grades for the student associated with this grade entry:
             # elif grade and 'student_id' in grade:
             #     self.client.get(f"/api/grades?student_id={grade['student_id']}")
-    
-    
 
-    
\ No newline at end of file
+    @task(1)
+    def view_students_batch(self):
+        """Fetch several students in one batched request instead of one request each"""
+        if self.students:
+            sample = random.sample(self.students, min(10, len(self.students)))
+            self.client.post("/api/students/batch", json={"ids": [s['student_id'] for s in sample]})
+
+    @task(2)
+    def search_students(self):
+        """Autocomplete a student name the way the search box does, one keystroke at a time"""
+        if self.students:
+            name = random.choice(self.students)['last_name']
+            for length in range(2, min(len(name), 5) + 1):
+                self.client.get("/api/students/search", params={"q": name[:length], "mode": "prefix"},
+                                name="/api/students/search?mode=prefix")
+
+    @task(1)
+    def view_course_grades(self):
+        """Page through a course's grades, as an instructor's gradebook does"""
+        if self.courses:
+            course = random.choice(self.courses)
+            self.client.get("/api/grades", params={"course_code": course['course_code'], "limit": 500},
+                            name="/api/grades?course_code")
+
+    @task(1)
+    def view_course_grades_compact(self):
+        """Same page with each student and course sent once instead of embedded in every grade"""
+        if self.courses:
+            course = random.choice(self.courses)
+            self.client.get("/api/grades", params={"course_code": course['course_code'], "limit": 500, "compact": "true"},
+                            name="/api/grades?course_code&compact")
@@ -0,0 +1,69 @@
+"""PUT /grades/{id} against a throwaway SQLite database: python -m pytest tests"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "grades.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+from grade_service.main import app
+from grade_service.models import Course, CourseGradeRollup, Grade, Student
+
+
+@pytest.fixture()
+def client():
+    database.Base.metadata.drop_all(bind=database.engine)
+    database.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    session.add(Student(student_id="S1", first_name="Ada", last_name="Byron", email="ada@example.com",
+                        date_of_birth=date(2000, 1, 1), enrollment_date=date(2020, 9, 1)))
+    session.add(Course(course_code="CS101", name="Intro", department="CS", credits=3))
+    session.commit()
+    session.close()
+    return TestClient(app)
+
+
+def post_grade(client, semester, grade):
+    response = client.post("/", json={
+        "student_id": "S1", "course_code": "CS101", "grade": grade, "semester": semester, "date": "2021-01-15",
+    })
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_update_changes_grade(client):
+    grade_id = post_grade(client, "Fall 2020", 70)
+
+    response = client.put(f"/{grade_id}", json={"grade": 85})
+
+    assert response.status_code == 200
+    assert response.json()["grade"] == 85
+    assert response.json()["semester"] == "Fall 2020"
+
+
+def test_update_into_taken_semester_conflicts(client):
+    post_grade(client, "Fall 2020", 70)
+    grade_id = post_grade(client, "Spring 2021", 90)
+
+    response = client.put(f"/{grade_id}", json={"semester": "Fall 2020"})
+
+    assert response.status_code == 409
+    session = database.SessionLocal()
+    try:
+        # Rolled back: the grade and the rollup counts are untouched
+        assert session.query(Grade.semester).filter(Grade.grade_id == grade_id).scalar() == "Spring 2021"
+        counts = {(r.semester, r.grade): r.count for r in session.query(CourseGradeRollup) if r.count}
+        assert counts == {("Fall 2020", 70): 1, ("Spring 2021", 90): 1}
+    finally:
+        session.close()
+
+
+def test_update_missing_grade(client):
+    assert client.put("/999", json={"grade": 50}).status_code == 404